@@ -4,7 +4,7 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 {
     'name': 'Account Financial Reports',
-    'version': '11.0.2.1.0',
+    'version': '11.0.2.2.0',
     'category': 'Reporting',
     'summary': 'OCA Financial Reports',
     'author': 'Camptocamp SA,'
@@ -19,6 +19,12 @@
         'report_xlsx',
     ],
     'data': [
+        'security/ir.model.access.csv',
+        'security/account_financial_report_job_security.xml',
+        'data/account_period_balance_data.xml',
+        'data/account_group_closure_data.xml',
+        'data/account_reconcile_timeline_data.xml',
+        'data/account_financial_report_job_data.xml',
         'wizard/aged_partner_balance_wizard_view.xml',
         'wizard/general_ledger_wizard_view.xml',
         'wizard/journal_ledger_wizard_view.xml',
@@ -35,6 +41,7 @@
         'report/templates/trial_balance.xml',
         'report/templates/vat_report.xml',
         'view/account_view.xml',
+        'view/account_financial_report_job_view.xml',
         'view/report_template.xml',
         'view/report_general_ledger.xml',
         'view/report_journal_ledger.xml',
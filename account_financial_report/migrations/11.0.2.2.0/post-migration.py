@@ -0,0 +1,17 @@
+# Copyright 2018 Tecnativa
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import SUPERUSER_ID, api
+
+
+def migrate(cr, version):
+    """ Fill the tables maintained by hooks from the existing records.
+
+    The data files only fill them on install.
+    """
+    if not version:
+        return
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env['account.period.balance']._rebuild()
+    env['account.group.closure']._rebuild()
+    env['account.reconcile.timeline']._rebuild()
@@ -1,2 +1,11 @@
 from . import account
+from . import account_financial_report_cache
+from . import account_financial_report_job
+from . import account_financial_report_storage
 from . import account_group
+from . import account_group_closure
+from . import account_ledger_change
+from . import account_move
+from . import account_period_balance
+from . import account_reconcile_timeline
+from . import res_partner
@@ -1,6 +1,6 @@
 # © 2011 Guewen Baconnier (Camptocamp)
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).-
-from odoo import models, fields
+from odoo import api, models, fields
 
 
 class AccountAccount(models.Model):
@@ -11,3 +11,26 @@ class AccountAccount(models.Model):
         help="If flagged, no details will be displayed in "
              "the General Ledger report (the webkit one only), "
              "only centralized amounts per period.")
+
+    @api.model
+    def create(self, vals):
+        account = super(AccountAccount, self).create(vals)
+        self.env['account.group']._update_accounts_groups(account.ids)
+        self.env['account.ledger.change']._add_changes(
+            account.company_id.ids)
+        return account
+
+    @api.multi
+    def write(self, vals):
+        res = super(AccountAccount, self).write(vals)
+        if 'code' in vals:
+            self.env['account.group']._update_accounts_groups(self.ids)
+        self.env['account.ledger.change']._add_changes(
+            self.mapped('company_id').ids)
+        return res
+
+    @api.multi
+    def unlink(self):
+        self.env['account.ledger.change']._add_changes(
+            self.mapped('company_id').ids)
+        return super(AccountAccount, self).unlink()
@@ -0,0 +1,191 @@
+# Copyright 2018 Tecnativa
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import hashlib
+import json
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+# Reports whose results are reused while the ledger doesn't change
+CACHED_REPORT_MODELS = (
+    'report_general_ledger',
+    'report_open_items',
+    'report_trial_balance',
+)
+
+
+class AccountFinancialReportCache(models.Model):
+    """ Results of the computed reports, reused by identical requests.
+
+    An entry is keyed on a fingerprint of the report values (as returned by
+    the wizards `_prepare_report_*`), the user and the language. It points
+    either to the computed report rows or, if `report_type` is set, to the
+    rendered file.
+
+    The entry is valid as long as the ledger watermark of the companies
+    didn't change: the number of changes of their journal items, moves
+    state, reconciliations, accounts and account groups logged in
+    account.ledger.change. Entries expire after the time to live and the
+    least recently used ones are evicted beyond the cache size.
+    """
+
+    _name = 'account.financial.report.cache'
+    _description = 'Financial Report Cache'
+    _order = 'last_used desc, id desc'
+
+    fingerprint = fields.Char(
+        required=True,
+        readonly=True,
+        index=True,
+    )
+    report_model = fields.Char(
+        required=True,
+        readonly=True,
+    )
+    report_type = fields.Char(readonly=True)
+    report_id = fields.Integer(readonly=True)
+    attachment_id = fields.Many2one(
+        comodel_name='ir.attachment',
+        readonly=True,
+        ondelete='set null',
+    )
+    company_id = fields.Many2one(
+        comodel_name='res.company',
+        readonly=True,
+        ondelete='cascade',
+    )
+    watermark = fields.Char(readonly=True)
+    last_used = fields.Datetime(
+        readonly=True,
+        default=fields.Datetime.now,
+    )
+
+    @api.model
+    def _get_config(self):
+        """ Return the time to live (in minutes) and the size of the cache.
+
+        A time to live of 0 disables the cache.
+        """
+        get_param = self.env['ir.config_parameter'].sudo().get_param
+        return (
+            int(get_param('account_financial_report.cache_ttl', default=60)),
+            int(get_param('account_financial_report.cache_size', default=100)),
+        )
+
+    @api.model
+    def _is_enabled(self, report_model):
+        return bool(self._get_config()[0]) and \
+            report_model in CACHED_REPORT_MODELS
+
+    @api.model
+    def _get_fingerprint(self, report_model, vals, report_type=False):
+        key = json.dumps(
+            [report_model, vals, report_type, self.env.uid, self.env.lang],
+            sort_keys=True,
+        )
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    @api.model
+    def _get_company_ids(self, vals):
+        """ Return the ids of the companies read by the report of `vals`:
+        its company and the consolidated ones.
+        """
+        company_ids = [vals.get('company_id')]
+        for command in vals.get('consolidation_company_ids') or []:
+            if command[0] == 6:
+                company_ids += command[2]
+            elif command[0] == 4:
+                company_ids.append(command[1])
+        return company_ids
+
+    @api.model
+    def _get_watermark(self, company_ids):
+        return self.env['account.ledger.change']._get_watermark(company_ids)
+
+    @api.model
+    def _lookup(self, report_model, vals, report_type=False):
+        """ Return the valid entry of the report values, if any. """
+        if not self._is_enabled(report_model):
+            return self.browse()
+        ttl = self._get_config()[0]
+        fingerprint = self._get_fingerprint(report_model, vals, report_type)
+        limit = fields.Datetime.to_string(
+            fields.Datetime.from_string(fields.Datetime.now()) -
+            timedelta(minutes=ttl)
+        )
+        entry = self.sudo().search([
+            ('fingerprint', '=', fingerprint),
+            ('create_date', '>=', limit),
+        ], order='id desc', limit=1)
+        if not entry or entry.watermark != self._get_watermark(
+                self._get_company_ids(vals)):
+            return self.browse()
+        entry.last_used = fields.Datetime.now()
+        return entry
+
+    @api.model
+    def _store(self, report_model, vals, watermark, report=None,
+               attachment=None, report_type=False):
+        """ Add an entry for the report rows or for the rendered file. """
+        if not self._is_enabled(report_model):
+            return self.browse()
+        fingerprint = self._get_fingerprint(report_model, vals, report_type)
+        if attachment:
+            attachment = attachment.sudo().copy({
+                'res_model': self._name,
+                'res_id': False,
+            })
+        entry = self.sudo().create({
+            'fingerprint': fingerprint,
+            'report_model': report_model,
+            'report_type': report_type,
+            'report_id': report.id if report else False,
+            'attachment_id': attachment.id if attachment else False,
+            'company_id': vals.get('company_id'),
+            'watermark': watermark,
+        })
+        if attachment:
+            attachment.res_id = entry.id
+        self._evict()
+        self.env['account.ledger.change']._compact()
+        return entry
+
+    @api.model
+    def _evict(self):
+        """ Remove the expired entries and the least recently used ones
+        beyond the cache size.
+        """
+        ttl, size = self._get_config()
+        limit = fields.Datetime.to_string(
+            fields.Datetime.from_string(fields.Datetime.now()) -
+            timedelta(minutes=ttl)
+        )
+        cache = self.sudo()
+        entries = cache.search([('create_date', '<', limit)])
+        entries |= cache.search(
+            [], order='last_used desc, id desc', offset=size)
+        attachments = entries.mapped('attachment_id')
+        entries.unlink()
+        attachments.unlink()
+
+    @api.model
+    def _get_report(self, report_model, vals):
+        """ Return the report computed from `vals`, reusing the report rows
+        of an identical request if the ledger didn't change since.
+        """
+        if not self._is_enabled(report_model):
+            report = self.env[report_model].create(vals)
+            report.compute_data_for_report()
+            return report
+        entry = self._lookup(report_model, vals)
+        report = self.env[report_model].browse(entry.report_id).exists()
+        if report:
+            return report
+        # Taken before the computation, so that the journal items changed
+        # meanwhile invalidate the entry
+        watermark = self._get_watermark(self._get_company_ids(vals))
+        report = self.env[report_model].create(vals)
+        report.compute_data_for_report()
+        self._store(report_model, vals, watermark, report=report)
+        return report
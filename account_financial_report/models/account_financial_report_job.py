@@ -0,0 +1,223 @@
+# Copyright 2018 Tecnativa
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import base64
+import json
+import logging
+import traceback
+
+from odoo import _, api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+
+class AccountFinancialReportJob(models.Model):
+    """ Financial report computed and exported in background.
+
+    The wizards enqueue a job with the values of the report to create.
+    The job runner (a scheduled action) computes the report, renders it and
+    attaches the file to the job, then the requesting user is notified on
+    the job thread.
+    """
+
+    _name = 'account.financial.report.job'
+    _description = 'Financial Report Job'
+    _inherit = ['mail.thread']
+    _order = 'id desc'
+
+    name = fields.Char(
+        required=True,
+        readonly=True,
+    )
+    user_id = fields.Many2one(
+        comodel_name='res.users',
+        required=True,
+        readonly=True,
+        index=True,
+        default=lambda self: self.env.user,
+    )
+    company_id = fields.Many2one(
+        comodel_name='res.company',
+        readonly=True,
+        default=lambda self: self.env.user.company_id,
+    )
+    report_model = fields.Char(
+        required=True,
+        readonly=True,
+    )
+    report_vals = fields.Text(
+        required=True,
+        readonly=True,
+        help="Values of the report to compute, in JSON.",
+    )
+    report_type = fields.Selection(
+        selection=[
+            ('qweb-pdf', 'PDF'),
+            ('xlsx', 'XLSX'),
+        ],
+        required=True,
+        readonly=True,
+    )
+    state = fields.Selection(
+        selection=[
+            ('pending', 'Pending'),
+            ('running', 'Running'),
+            ('done', 'Done'),
+            ('failed', 'Failed'),
+        ],
+        required=True,
+        readonly=True,
+        index=True,
+        default='pending',
+    )
+    progress = fields.Float(readonly=True)
+    progress_step = fields.Char(
+        string='Current Step',
+        readonly=True,
+    )
+    date_start = fields.Datetime(readonly=True)
+    date_end = fields.Datetime(readonly=True)
+    attachment_id = fields.Many2one(
+        comodel_name='ir.attachment',
+        string='File',
+        readonly=True,
+    )
+    error = fields.Text(readonly=True)
+
+    @api.model
+    def _report_progress(self, step, progress=None):
+        """ Record the step computed by the job of the context, if any.
+
+        The job transaction is committed once the file is attached, so the
+        progress is written on its own cursor to be visible meanwhile.
+        """
+        job_id = self.env.context.get('report_job_id')
+        if not job_id:
+            return
+        with self.pool.cursor() as cr:
+            cr.execute("""
+                UPDATE account_financial_report_job
+                SET progress_step = %s, progress = COALESCE(%s, progress)
+                WHERE id = %s
+            """, (step, progress, job_id))
+
+    @api.multi
+    def _execute(self):
+        """ Compute the report as the requesting user, render it and return
+        the attachment of the file.
+
+        The file rendered by an identical job is reused if the ledger didn't
+        change since.
+        """
+        self.ensure_one()
+        job = self.with_context(report_job_id=self.id)
+        user_env = job.sudo(self.user_id).with_context(
+            lang=self.user_id.lang,
+            tz=self.user_id.tz,
+        ).env
+        cache = user_env['account.financial.report.cache']
+        vals = json.loads(self.report_vals)
+        entry = cache._lookup(self.report_model, vals, self.report_type)
+        if entry.attachment_id:
+            return entry.attachment_id.sudo().copy({
+                'res_model': self._name,
+                'res_id': self.id,
+            })
+        watermark = cache._is_enabled(self.report_model) and \
+            cache._get_watermark(cache._get_company_ids(vals))
+        job._report_progress(_('Computing'), 10.0)
+        report = cache._get_report(self.report_model, vals)
+        job._report_progress(_('Rendering'), 70.0)
+        action = report.print_report(self.report_type)
+        report_action = user_env['ir.actions.report'].search([
+            ('report_name', '=', action['report_name']),
+            ('report_type', '=', action['report_type']),
+        ], limit=1)
+        content, extension = report_action.render(report.ids)
+        filename = '%s.%s' % (report_action.name, extension)
+        attachment = self.env['ir.attachment'].create({
+            'name': filename,
+            'datas_fname': filename,
+            'datas': base64.b64encode(content),
+            'res_model': self._name,
+            'res_id': self.id,
+        })
+        cache._store(self.report_model, vals, watermark,
+                     attachment=attachment, report_type=self.report_type)
+        return attachment
+
+    @api.multi
+    def _run(self):
+        """ Execute the job and commit its result.
+
+        On failure, the report computation is rolled back and the error is
+        stored on the job.
+        """
+        # pylint: disable=invalid-commit
+        self.ensure_one()
+        self.write({
+            'state': 'running',
+            'date_start': fields.Datetime.now(),
+            'progress': 0.0,
+            'progress_step': False,
+            'error': False,
+        })
+        self.env.cr.commit()
+        try:
+            attachment = self._execute()
+            self.env.cr.commit()
+        except Exception:
+            self.env.cr.rollback()
+            _logger.exception("Financial report job %s failed", self.id)
+            self.invalidate_cache()
+            self.write({
+                'state': 'failed',
+                'date_end': fields.Datetime.now(),
+                'error': traceback.format_exc(),
+            })
+            self._notify_user(
+                _("The report %s could not be computed.") % self.name)
+        else:
+            # Reread the progress written by the other cursor
+            self.invalidate_cache()
+            self.write({
+                'state': 'done',
+                'date_end': fields.Datetime.now(),
+                'progress': 100.0,
+                'progress_step': False,
+                'attachment_id': attachment.id,
+            })
+            self._notify_user(
+                _("The report %s is ready.") % self.name, attachment)
+        self.env.cr.commit()
+
+    @api.multi
+    def _notify_user(self, body, attachment=None):
+        self.ensure_one()
+        self.message_post(
+            body=body,
+            subtype='mail.mt_comment',
+            partner_ids=self.user_id.partner_id.ids,
+            attachment_ids=attachment.ids if attachment else [],
+        )
+
+    @api.model
+    def _cron_run_jobs(self):
+        """ Run the pending jobs, oldest first.
+
+        The jobs are locked while they are started, so several runners
+        don't execute the same job.
+        """
+        while True:
+            self.env.cr.execute("""
+                SELECT id
+                FROM account_financial_report_job
+                WHERE state = 'pending'
+                ORDER BY id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            """)
+            row = self.env.cr.fetchone()
+            if not row:
+                break
+            self.browse(row[0])._run()
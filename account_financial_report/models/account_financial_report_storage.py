@@ -0,0 +1,189 @@
+# Copyright 2018 Tecnativa
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import io
+import logging
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+# Number of rows sent by COPY statement
+COPY_BATCH_SIZE = 10000
+
+# Escaping of the COPY text format
+COPY_ESCAPES = str.maketrans({
+    '\\': '\\\\',
+    '\t': '\\t',
+    '\n': '\\n',
+    '\r': '\\r',
+})
+
+
+class AccountFinancialReportStorage(models.AbstractModel):
+    """ Storage mode of the tables of the computed reports.
+
+    The report rows are throwaway data: if the system parameter
+    `account_financial_report.unlogged_report_tables` is set, the tables of
+    the `report_*` transient models and their many2many relations are made
+    UNLOGGED. Their rows are then neither written to the WAL nor shipped to
+    the replicas, and PostgreSQL empties the tables after a crash.
+
+    The storage mode is applied when the registry is loaded.
+
+    `_copy_rows` bulk loads the rows computed in Python into these tables:
+    the aging buckets of the Aged Partner Balance and the rows fetched by
+    the parallel workers of the General Ledger.
+    """
+
+    _name = 'account.financial.report.storage'
+    _description = 'Financial Reports Storage'
+
+    def _register_hook(self):
+        res = super(AccountFinancialReportStorage, self)._register_hook()
+        unlogged = bool(self.env['ir.config_parameter'].sudo().get_param(
+            'account_financial_report.unlogged_report_tables'))
+        self._set_report_tables_unlogged(unlogged)
+        return res
+
+    @api.model
+    def _get_report_tables(self):
+        """ Return the tables of the report transient models, and of their
+        many2many relations.
+        """
+        tables = set()
+        for name, model in self.env.registry.models.items():
+            if not (name.startswith('report_') and model._transient):
+                continue
+            tables.add(model._table)
+            tables.update(
+                field.relation for field in model._fields.values()
+                if field.type == 'many2many' and field.store)
+        return tables
+
+    @api.model
+    def _set_report_tables_unlogged(self, unlogged=True):
+        """ Make the report tables UNLOGGED, or back to LOGGED.
+
+        A logged table can't reference an unlogged one, so the referencing
+        tables are altered first when making them unlogged, and the
+        referenced tables first when making them logged. The tables
+        referenced by another logged table are left logged.
+        """
+        tables = self._get_report_tables()
+        self._cr.execute("""
+            SELECT relname, relpersistence
+            FROM pg_class
+            WHERE relkind = 'r' AND relname IN %s
+        """, (tuple(tables),))
+        persistence = dict(self._cr.fetchall())
+        self._cr.execute("""
+            SELECT
+                c.relname, c.relpersistence, fc.relname, fc.relpersistence
+            FROM pg_constraint con
+            INNER JOIN pg_class c ON con.conrelid = c.oid
+            INNER JOIN pg_class fc ON con.confrelid = fc.oid
+            WHERE con.contype = 'f' AND (c.relname IN %s OR fc.relname IN %s)
+        """, (tuple(tables), tuple(tables)))
+        foreign_keys = []
+        for table, table_persistence, foreign_table, foreign_persistence \
+                in self._cr.fetchall():
+            persistence.setdefault(table, table_persistence)
+            persistence.setdefault(foreign_table, foreign_persistence)
+            if table != foreign_table:
+                foreign_keys.append((table, foreign_table))
+        target = 'u' if unlogged else 'p'
+        todo = {
+            table for table in tables
+            if table in persistence and persistence[table] != target
+        }
+        while todo:
+            if unlogged:
+                ready = {
+                    table for table in todo
+                    if all(persistence[t] == 'u'
+                           for t, ft in foreign_keys if ft == table)
+                }
+            else:
+                ready = {
+                    table for table in todo
+                    if all(persistence[ft] == 'p'
+                           for t, ft in foreign_keys if t == table)
+                }
+            if not ready:
+                _logger.warning(
+                    "Storage of report tables %s can't be changed, they are "
+                    "referenced by logged tables", ', '.join(sorted(todo)))
+                break
+            for table in sorted(ready):
+                self._cr.execute('ALTER TABLE "%s" SET %s' % (
+                    table, 'UNLOGGED' if unlogged else 'LOGGED'))
+                persistence[table] = target
+            todo -= ready
+
+    @api.model
+    def _format_copy_value(self, value):
+        if value is None:
+            return '\\N'
+        if isinstance(value, bool):
+            return 't' if value else 'f'
+        return str(value).translate(COPY_ESCAPES)
+
+    @api.model
+    def _copy_rows(self, table, columns, rows, batch_size=COPY_BATCH_SIZE):
+        """ Insert `rows`, an iterable of tuples of `columns` values (None
+        for NULL), into `table` with COPY FROM STDIN, by batches of
+        `batch_size` rows.
+
+        The log access columns of the model tables are filled. If the table
+        has an `id` column, the ids are taken from its sequence beforehand
+        and returned in the order of the rows.
+
+        The rows are not validated by the ORM and the cache is not
+        invalidated: the values must be ready to be stored.
+        """
+        self._cr.execute("""
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = %s
+        """, (table,))
+        table_columns = {row[0] for row in self._cr.fetchall()}
+        columns = list(columns)
+        extra_values = []
+        now = fields.Datetime.now()
+        for column, value in (('create_uid', self.env.uid),
+                              ('create_date', now),
+                              ('write_uid', self.env.uid),
+                              ('write_date', now)):
+            if column in table_columns and column not in columns:
+                columns.append(column)
+                extra_values.append(value)
+        with_ids = 'id' in table_columns and 'id' not in columns
+        if with_ids:
+            columns.insert(0, 'id')
+        query = 'COPY "%s" (%s) FROM STDIN' % (
+            table, ', '.join('"%s"' % column for column in columns))
+        ids = []
+        rows = iter(rows)
+        while True:
+            batch = [row for _i, row in zip(range(batch_size), rows)]
+            if not batch:
+                break
+            if with_ids:
+                self._cr.execute("""
+                    SELECT nextval(pg_get_serial_sequence(%s, 'id'))
+                    FROM generate_series(1, %s)
+                """, (table, len(batch)))
+                batch_ids = [row[0] for row in self._cr.fetchall()]
+                ids += batch_ids
+                batch = [(batch_id,) + tuple(row)
+                         for batch_id, row in zip(batch_ids, batch)]
+            data = io.StringIO()
+            for row in batch:
+                data.write('\t'.join(
+                    self._format_copy_value(value)
+                    for value in tuple(row) + tuple(extra_values)))
+                data.write('\n')
+            data.seek(0)
+            self._cr.copy_expert(query, data)
+        return ids
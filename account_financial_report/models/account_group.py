@@ -1,6 +1,10 @@
 # © 2018 Forest and Biomass Romania SA
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
+from bisect import bisect_left
+
+from psycopg2.extras import execute_values
+
 from odoo import api, fields, models
 
 
@@ -11,6 +15,10 @@ class AccountGroup(models.Model):
         comodel_name='account.group',
         inverse_name='parent_id',
         string='Child Groups')
+    parent_path = fields.Char(
+        compute='_compute_parent_path',
+        store=True,
+        index=True)
     level = fields.Integer(
         string='Level',
         compute='_compute_level',
@@ -24,25 +32,97 @@ class AccountGroup(models.Model):
         compute='_compute_group_accounts',
         string="Accounts", store=True)
 
+    @api.model
+    def create(self, vals):
+        group = super(AccountGroup, self).create(vals)
+        self.env['account.group.closure']._add_groups(group.ids)
+        # The groups are shared by all the companies
+        self.env['account.ledger.change']._add_changes()
+        return group
+
+    @api.multi
+    def write(self, vals):
+        res = super(AccountGroup, self).write(vals)
+        if 'parent_id' in vals:
+            self.env['account.group.closure']._move_groups(self.ids)
+        self.env['account.ledger.change']._add_changes()
+        return res
+
+    @api.multi
+    def unlink(self):
+        self.env['account.ledger.change']._add_changes()
+        return super(AccountGroup, self).unlink()
+
     @api.multi
-    @api.depends('parent_id')
+    @api.depends('parent_id.parent_path')
+    def _compute_parent_path(self):
+        """ Ids of the ancestors of the group and of the group, from the
+        root, each followed by a slash.
+        """
+        for group in self:
+            group.parent_path = '%s%s/' % (
+                group.parent_id.parent_path or '', group.id)
+
+    @api.multi
+    @api.depends('parent_path')
     def _compute_level(self):
         for group in self:
-            level = 0
-            new_group = group
-            while new_group.parent_id:
-                level += 1
-                new_group = new_group.parent_id
-            group.level = level
+            group.level = (group.parent_path or '/').count('/') - 1
 
     @api.multi
-    @api.depends('code_prefix', 'account_ids', 'account_ids.code',
-                 'group_child_ids', 'group_child_ids.account_ids.code')
+    @api.depends('code_prefix', 'name')
     def _compute_group_accounts(self):
-        account_obj = self.env['account.account']
-        accounts = account_obj.search([])
+        """ Bisect the sorted account codes for the first one starting with
+        the prefix of each group, the matching codes follow it.
+
+        The changes of the account codes are applied by
+        `_update_accounts_groups`.
+        """
+        self.env.cr.execute("SELECT code, id FROM account_account")
+        accounts = sorted(self.env.cr.fetchall())
+        codes = [code for code, _account_id in accounts]
         for group in self:
-            prefix = group.code_prefix if group.code_prefix else group.name
-            gr_acc = accounts.filtered(
-                lambda a: a.code.startswith(prefix)).ids
-            group.compute_account_ids = [(6, 0, gr_acc)]
+            prefix = group.code_prefix or group.name or ''
+            account_ids = []
+            index = bisect_left(codes, prefix)
+            while index < len(codes) and codes[index].startswith(prefix):
+                account_ids.append(accounts[index][1])
+                index += 1
+            group.compute_account_ids = [(6, 0, account_ids)]
+
+    @api.model
+    def _update_accounts_groups(self, account_ids):
+        """ Link the given accounts to the groups whose prefix starts their
+        code, in place of their former groups.
+
+        The groups are looked up by the prefixes of each account code,
+        instead of matching all the groups.
+        """
+        if not account_ids:
+            return
+        field = self._fields['compute_account_ids']
+        self.env.cr.execute("""
+            SELECT COALESCE(code_prefix, name), id FROM account_group
+        """)
+        prefix_groups = {}
+        for prefix, group_id in self.env.cr.fetchall():
+            prefix_groups.setdefault(prefix, []).append(group_id)
+        self.env.cr.execute("""
+            SELECT id, code FROM account_account WHERE id IN %s
+        """, (tuple(account_ids),))
+        rows = []
+        for account_id, code in self.env.cr.fetchall():
+            for length in range(1, len(code) + 1):
+                rows += [(group_id, account_id)
+                         for group_id in prefix_groups.get(code[:length], [])]
+        # pylint: disable=sql-injection
+        self.env.cr.execute("""
+            DELETE FROM "{relation}" WHERE "{column2}" IN %s
+        """.format(relation=field.relation, column2=field.column2),
+            (tuple(account_ids),))
+        if rows:
+            execute_values(self.env.cr, """
+                INSERT INTO "{relation}" ("{column1}", "{column2}") VALUES %s
+            """.format(relation=field.relation, column1=field.column1,
+                       column2=field.column2), rows)
+        self.invalidate_cache(['compute_account_ids'])
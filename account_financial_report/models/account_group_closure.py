@@ -0,0 +1,205 @@
+# Copyright 2018 Tecnativa
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import api, fields, models
+
+
+class AccountGroupClosure(models.Model):
+    """ Closure of the account groups hierarchy.
+
+    There is one row per group and ancestor, the group itself included
+    (depth 0), so the rollups of the groups are a join on `descendant_id`
+    grouped by `ancestor_id`, instead of a recursive walk of `parent_id`.
+
+    The rows are maintained from the account.group hooks.
+    """
+
+    _name = 'account.group.closure'
+    _description = 'Account Groups Hierarchy Closure'
+    _order = 'ancestor_id, depth'
+
+    ancestor_id = fields.Many2one(
+        comodel_name='account.group',
+        required=True,
+        readonly=True,
+        index=True,
+        ondelete='cascade',
+    )
+    descendant_id = fields.Many2one(
+        comodel_name='account.group',
+        required=True,
+        readonly=True,
+        index=True,
+        ondelete='cascade',
+    )
+    depth = fields.Integer(readonly=True)
+
+    @api.model_cr
+    def init(self):
+        res = super(AccountGroupClosure, self).init()
+        self._cr.execute("""
+            SELECT indexname FROM pg_indexes
+            WHERE indexname = 'account_group_closure_key_uniq'
+        """)
+        if not self._cr.fetchone():
+            self._cr.execute("""
+                CREATE UNIQUE INDEX account_group_closure_key_uniq
+                ON account_group_closure (descendant_id, ancestor_id)
+            """)
+        return res
+
+    @api.model
+    def _add_groups(self, group_ids):
+        """ Add the rows of the given groups, whose parents rows exist.
+
+        The groups must be given parents first.
+        """
+        for group_id in group_ids:
+            self.env.cr.execute("""
+INSERT INTO
+    account_group_closure
+    (
+    create_uid,
+    create_date,
+    write_uid,
+    write_date,
+    ancestor_id,
+    descendant_id,
+    depth
+    )
+SELECT
+    %(user_id)s,
+    NOW(),
+    %(user_id)s,
+    NOW(),
+    gc.ancestor_id,
+    g.id,
+    gc.depth + 1
+FROM
+    account_group g
+INNER JOIN
+    account_group_closure gc ON g.parent_id = gc.descendant_id
+WHERE
+    g.id = %(group_id)s
+UNION ALL
+SELECT
+    %(user_id)s,
+    NOW(),
+    %(user_id)s,
+    NOW(),
+    %(group_id)s,
+    %(group_id)s,
+    0
+            """, {'user_id': self.env.uid, 'group_id': group_id})
+
+    @api.model
+    def _move_groups(self, group_ids):
+        """ Update the rows of the subtrees of the given groups, whose
+        parent changed.
+
+        The groups are moved one by one, so a group moved along with one of
+        its ancestors is attached to the up to date rows of its new parent.
+        """
+        for group_id in group_ids:
+            params = {
+                'user_id': self.env.uid,
+                'group_id': group_id,
+            }
+            # Detach the subtree from its former ancestors
+            self.env.cr.execute("""
+DELETE FROM
+    account_group_closure gc
+USING
+    account_group_closure sub
+WHERE
+    sub.ancestor_id = %(group_id)s
+AND
+    gc.descendant_id = sub.descendant_id
+AND
+    gc.ancestor_id NOT IN (
+        SELECT subtree.descendant_id
+        FROM account_group_closure subtree
+        WHERE subtree.ancestor_id = %(group_id)s
+    )
+            """, params)
+            # Attach it to the ancestors of its new parent
+            self.env.cr.execute("""
+INSERT INTO
+    account_group_closure
+    (
+    create_uid,
+    create_date,
+    write_uid,
+    write_date,
+    ancestor_id,
+    descendant_id,
+    depth
+    )
+SELECT
+    %(user_id)s,
+    NOW(),
+    %(user_id)s,
+    NOW(),
+    parent.ancestor_id,
+    sub.descendant_id,
+    parent.depth + sub.depth + 1
+FROM
+    account_group g
+INNER JOIN
+    account_group_closure parent ON g.parent_id = parent.descendant_id
+INNER JOIN
+    account_group_closure sub ON sub.ancestor_id = g.id
+WHERE
+    g.id = %(group_id)s
+            """, params)
+        self.invalidate_cache()
+
+    @api.model
+    def _rebuild(self):
+        """ Recompute the whole closure from the groups hierarchy. """
+        self.env.cr.execute("""
+DELETE FROM
+    account_group_closure
+        """)
+        self.env.cr.execute("""
+WITH RECURSIVE closure (ancestor_id, descendant_id, depth) AS (
+    SELECT
+        g.id,
+        g.id,
+        0
+    FROM
+        account_group g
+    UNION ALL
+    SELECT
+        c.ancestor_id,
+        g.id,
+        c.depth + 1
+    FROM
+        closure c
+    INNER JOIN
+        account_group g ON g.parent_id = c.descendant_id
+)
+INSERT INTO
+    account_group_closure
+    (
+    create_uid,
+    create_date,
+    write_uid,
+    write_date,
+    ancestor_id,
+    descendant_id,
+    depth
+    )
+SELECT
+    %(user_id)s,
+    NOW(),
+    %(user_id)s,
+    NOW(),
+    ancestor_id,
+    descendant_id,
+    depth
+FROM
+    closure
+        """, {'user_id': self.env.uid})
+        self.invalidate_cache()
+        return True
@@ -0,0 +1,149 @@
+# Copyright 2018 Tecnativa
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import api, fields, models
+
+# Setting local to the transactions having changed the ledger
+PENDING_CHANGES_FLAG = 'account_financial_report.pending_ledger_changes'
+
+
+class AccountLedgerChange(models.Model):
+    """ Log of the changes of the ledger, used as watermark of the cached
+    reports.
+
+    A row is inserted by each change of the journal items, moves state,
+    reconciliations, accounts and account groups, with the company it
+    impacts, or without company for all of them. The watermark of a company
+    is the sum of its `change_count`: the rows only become visible when
+    their transaction is committed, so a change committed after a report
+    was computed always changes the watermark of the report.
+
+    The rows are only inserted, so the concurrent changes don't wait for
+    each other. They are compacted in one row per company by
+    `_compact`, which keeps the sums.
+    """
+
+    _name = 'account.ledger.change'
+    _description = 'Ledger Changes'
+
+    company_id = fields.Many2one(
+        comodel_name='res.company',
+        readonly=True,
+        index=True,
+        ondelete='cascade',
+    )
+    change_count = fields.Integer(readonly=True)
+
+    @api.model
+    def _add_changes(self, company_ids=None):
+        """ Log a change of the given companies, or of all of them, and
+        flag the current transaction as changing the ledger (see
+        `_has_pending_changes`).
+        """
+        if company_ids is None:
+            company_ids = [None]
+        self.env.cr.execute("""
+SELECT set_config(%(flag)s, '1', TRUE);
+INSERT INTO
+    account_ledger_change
+    (
+    create_uid,
+    create_date,
+    write_uid,
+    write_date,
+    company_id,
+    change_count
+    )
+SELECT
+    %(user_id)s,
+    NOW(),
+    %(user_id)s,
+    NOW(),
+    c.company_id,
+    1
+FROM
+    UNNEST(%(company_ids)s::integer[]) AS c (company_id)
+        """, {
+            'flag': PENDING_CHANGES_FLAG,
+            'user_id': self.env.uid,
+            'company_ids': list(set(company_ids)),
+        })
+
+    @api.model
+    def _has_pending_changes(self):
+        """ Return True if the current transaction changed the ledger: the
+        other database connections don't see its changes yet.
+
+        The flag is a setting local to the transaction. It is read from
+        pg_settings, which doesn't fail if it was never set.
+        """
+        self.env.cr.execute("""
+SELECT
+    setting
+FROM
+    pg_settings
+WHERE
+    name = %s
+        """, (PENDING_CHANGES_FLAG,))
+        row = self.env.cr.fetchone()
+        return bool(row and row[0])
+
+    @api.model
+    def _get_watermark(self, company_ids):
+        """ Return the number of changes of the given companies. """
+        self.env.cr.execute("""
+SELECT
+    COALESCE(SUM(change_count), 0)
+FROM
+    account_ledger_change
+WHERE
+    company_id IN %s
+OR
+    company_id IS NULL
+        """, (tuple(company_ids),))
+        return str(self.env.cr.fetchone()[0])
+
+    @api.model
+    def _compact(self):
+        """ Replace the committed rows by one row per company.
+
+        The rows locked by a concurrent compaction are left for the next
+        one.
+        """
+        self.env.cr.execute("""
+WITH
+    deleted AS (
+        DELETE FROM
+            account_ledger_change
+        WHERE
+            id IN (
+                SELECT id
+                FROM account_ledger_change
+                FOR UPDATE SKIP LOCKED
+            )
+        RETURNING
+            company_id,
+            change_count
+    )
+INSERT INTO
+    account_ledger_change
+    (
+    create_uid,
+    create_date,
+    write_uid,
+    write_date,
+    company_id,
+    change_count
+    )
+SELECT
+    %(user_id)s,
+    NOW(),
+    %(user_id)s,
+    NOW(),
+    company_id,
+    SUM(change_count)
+FROM
+    deleted
+GROUP BY
+    company_id
+        """, {'user_id': self.env.uid})
@@ -0,0 +1,250 @@
+# Copyright 2018 Tecnativa
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import logging
+
+from odoo import api, models
+
+_logger = logging.getLogger(__name__)
+
+# Journal item fields having an impact on account.period.balance
+PERIOD_BALANCE_FIELDS = {
+    'account_id',
+    'partner_id',
+    'currency_id',
+    'debit',
+    'credit',
+    'amount_currency',
+    'move_id',
+}
+
+# Indexes used by the report queries: name, table and definition.
+# The joins on account_partial_reconcile use the indexes of the standard
+# debit_move_id and credit_move_id fields.
+REPORTING_INDEXES = {
+    'account_move_line_account_id_date_index': (
+        'account_move_line', '(account_id, date)'),
+    'account_move_line_account_id_partner_id_date_index': (
+        'account_move_line', '(account_id, partner_id, date)'),
+    'account_move_line_analytic_account_id_date_index': (
+        'account_move_line',
+        '(analytic_account_id, date) WHERE analytic_account_id IS NOT NULL'),
+    'account_move_line_company_id_write_date_index': (
+        'account_move_line', '(company_id, write_date)'),
+    'account_move_line_open_items_index': (
+        'account_move_line',
+        '(account_id, date) WHERE amount_residual != 0'),
+}
+
+
+class AccountMove(models.Model):
+    _inherit = 'account.move'
+
+    @api.model
+    def create(self, vals):
+        if self.env.context.get('skip_period_balance'):
+            return super(AccountMove, self).create(vals)
+        # The journal items are created one by one: add them all at once,
+        # instead of one statement per journal item
+        move = super(AccountMove, self.with_context(
+            skip_period_balance=True)).create(vals)
+        self.env['account.period.balance']._apply_move_lines(
+            move.line_ids.ids, 1)
+        return self.browse(move.id)
+
+    @api.multi
+    def write(self, vals):
+        if self.env.context.get('skip_period_balance') or not (
+                'date' in vals or 'state' in vals or 'line_ids' in vals):
+            res = super(AccountMove, self).write(vals)
+        else:
+            # Remove the lines with their old values, and add them back
+            # once written. The journal items hooks are skipped meanwhile
+            # because all the lines of the moves are handled here.
+            period_balance = self.env['account.period.balance']
+            period_balance._apply_move_lines(self.mapped('line_ids').ids, -1)
+            res = super(AccountMove, self.with_context(
+                skip_period_balance=True)).write(vals)
+            period_balance._apply_move_lines(self.mapped('line_ids').ids, 1)
+        if 'date' in vals:
+            self.env['account.reconcile.timeline']._update_move_lines_dates(
+                self.mapped('line_ids').ids)
+        return res
+
+    @api.multi
+    def button_cancel(self):
+        # The state is written with SQL by the standard method
+        period_balance = self.env['account.period.balance']
+        period_balance._apply_move_lines(self.mapped('line_ids').ids, -1)
+        res = super(AccountMove, self.with_context(
+            skip_period_balance=True)).button_cancel()
+        period_balance._apply_move_lines(self.mapped('line_ids').ids, 1)
+        return res
+
+
+class AccountMoveLine(models.Model):
+    _inherit = 'account.move.line'
+
+    @api.model_cr
+    def init(self):
+        """ Create the reporting indexes.
+
+        If the system parameter
+        `account_financial_report.concurrent_index_creation` is set, they are
+        created once the module update is committed, without locking the
+        journal items against writes.
+        """
+        res = super(AccountMoveLine, self).init()
+        if self.env['ir.config_parameter'].sudo().get_param(
+                'account_financial_report.concurrent_index_creation'):
+            self._cr.after(
+                'commit', self._create_reporting_indexes_concurrently)
+        else:
+            self._create_reporting_indexes()
+        return res
+
+    @api.model
+    def _get_missing_reporting_indexes(self):
+        """ Return the names of the reporting indexes that don't exist, or
+        that are invalid because their concurrent creation failed.
+        """
+        self._cr.execute("""
+            SELECT c.relname
+            FROM pg_class c
+            INNER JOIN pg_index i ON i.indexrelid = c.oid
+            WHERE c.relname IN %s AND i.indisvalid
+        """, (tuple(REPORTING_INDEXES),))
+        existing = {row[0] for row in self._cr.fetchall()}
+        return sorted(set(REPORTING_INDEXES) - existing)
+
+    @api.model
+    def _create_reporting_indexes(self, concurrently=False):
+        """ Create the missing reporting indexes.
+
+        A concurrent creation can't run in a transaction: the cursor must be
+        in autocommit mode.
+        """
+        concurrently = 'CONCURRENTLY' if concurrently else ''
+        for name in self._get_missing_reporting_indexes():
+            table, definition = REPORTING_INDEXES[name]
+            _logger.info("Creating index %s", name)
+            self._cr.execute(
+                "DROP INDEX %s IF EXISTS %s" % (concurrently, name))
+            self._cr.execute("CREATE INDEX %s %s ON %s %s" % (
+                concurrently, name, table, definition))
+
+    @api.model
+    def _create_reporting_indexes_concurrently(self):
+        with self.pool.cursor() as cr:
+            cr.autocommit(True)
+            self.with_env(self.env(cr=cr))._create_reporting_indexes(
+                concurrently=True)
+
+    @api.model
+    def _check_reporting_indexes(self):
+        """ Log and return the reporting indexes that are missing, and the
+        ones that were never used since the statistics were reset.
+        """
+        missing = self._get_missing_reporting_indexes()
+        self._cr.execute("""
+            SELECT indexrelname
+            FROM pg_stat_user_indexes
+            WHERE indexrelname IN %s AND idx_scan = 0
+            ORDER BY indexrelname
+        """, (tuple(REPORTING_INDEXES),))
+        unused = [row[0] for row in self._cr.fetchall()]
+        for name in missing:
+            _logger.warning("Reporting index %s is missing", name)
+        for name in unused:
+            _logger.warning("Reporting index %s is unused", name)
+        return {
+            'missing': missing,
+            'unused': unused,
+        }
+
+    @api.model
+    def _get_taxes_description_query(self, move_line_where):
+        """ Return the common table expressions `line_taxes` and
+        `taxes_descriptions`, without the WITH keyword, describing the taxes
+        of the journal items matching `move_line_where`, a condition on the
+        journal items alias `tml`.
+
+        Join `line_taxes` on `move_line_id`, then `taxes_descriptions` on
+        `tax_ids`: the description is assembled once per distinct set of
+        taxes, instead of once per journal item.
+        """
+        return """
+line_taxes AS (
+    SELECT
+        rel.account_move_line_id AS move_line_id,
+        array_agg(rel.account_tax_id ORDER BY rel.account_tax_id) AS tax_ids
+    FROM
+        account_move_line_account_tax_rel rel
+    INNER JOIN
+        account_move_line tml ON rel.account_move_line_id = tml.id
+    WHERE
+        """ + move_line_where + """
+    GROUP BY
+        rel.account_move_line_id
+),
+taxes_descriptions AS (
+    SELECT
+        s.tax_ids,
+        string_agg(
+            COALESCE(at.description, at.name), ', ' ORDER BY at.id
+        ) AS description
+    FROM
+        (SELECT DISTINCT tax_ids FROM line_taxes) s
+    CROSS JOIN
+        UNNEST(s.tax_ids) AS t (tax_id)
+    INNER JOIN
+        account_tax at ON t.tax_id = at.id
+    GROUP BY
+        s.tax_ids
+)
+        """
+
+    @api.model
+    def create(self, vals, apply_taxes=True):
+        line = super(AccountMoveLine, self).create(
+            vals, apply_taxes=apply_taxes)
+        if not self.env.context.get('skip_period_balance'):
+            self.env['account.period.balance']._apply_move_lines(line.ids, 1)
+        return line
+
+    @api.multi
+    def write(self, vals):
+        if self.env.context.get('skip_period_balance') or \
+                not PERIOD_BALANCE_FIELDS.intersection(vals):
+            return super(AccountMoveLine, self).write(vals)
+        period_balance = self.env['account.period.balance']
+        period_balance._apply_move_lines(self.ids, -1)
+        res = super(AccountMoveLine, self.with_context(
+            skip_period_balance=True)).write(vals)
+        period_balance._apply_move_lines(self.ids, 1)
+        return res
+
+    @api.multi
+    def unlink(self):
+        if not self.env.context.get('skip_period_balance'):
+            self.env['account.period.balance']._apply_move_lines(
+                self.ids, -1)
+        return super(AccountMoveLine, self).unlink()
+
+
+class AccountPartialReconcile(models.Model):
+    _inherit = 'account.partial.reconcile'
+
+    @api.model
+    def create(self, vals):
+        partial = super(AccountPartialReconcile, self).create(vals)
+        self.env['account.reconcile.timeline']._add_partials(partial.ids)
+        self.env['account.ledger.change']._add_changes(
+            partial.company_id.ids)
+        return partial
+
+    @api.multi
+    def unlink(self):
+        self.env['account.ledger.change']._add_changes(
+            self.mapped('company_id').ids)
+        return super(AccountPartialReconcile, self).unlink()
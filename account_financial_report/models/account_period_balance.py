@@ -0,0 +1,275 @@
+# Copyright 2018 Tecnativa
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import api, fields, models
+
+
+class AccountPeriodBalance(models.Model):
+    """ Monthly balance snapshot of the journal items.
+
+    There is one row per company, account, partner, currency, month and
+    posted state. The rows are maintained incrementally from the
+    account.move.line and account.move hooks, so the reports can read the
+    closed months from here instead of summing every journal item since the
+    beginning of time.
+
+    Only plain columns of account_move_line are used (debit, credit, ...)
+    and the date / state are read from account_move, so the snapshot does
+    not depend on the recomputation of the stored related fields.
+    """
+
+    _name = 'account.period.balance'
+    _description = 'Journal Items Monthly Balance'
+    _order = 'date, account_id'
+
+    company_id = fields.Many2one(
+        comodel_name='res.company',
+        required=True,
+        readonly=True,
+        ondelete='cascade',
+    )
+    account_id = fields.Many2one(
+        comodel_name='account.account',
+        required=True,
+        readonly=True,
+        index=True,
+        ondelete='cascade',
+    )
+    partner_id = fields.Many2one(
+        comodel_name='res.partner',
+        readonly=True,
+        ondelete='cascade',
+    )
+    currency_id = fields.Many2one(
+        comodel_name='res.currency',
+        readonly=True,
+    )
+    company_currency_id = fields.Many2one(
+        comodel_name='res.currency',
+        related='company_id.currency_id',
+        readonly=True,
+    )
+    date = fields.Date(
+        string='Month',
+        required=True,
+        readonly=True,
+        index=True,
+        help="First day of the month.",
+    )
+    posted = fields.Boolean(readonly=True)
+    debit = fields.Monetary(
+        currency_field='company_currency_id',
+        readonly=True,
+    )
+    credit = fields.Monetary(
+        currency_field='company_currency_id',
+        readonly=True,
+    )
+    balance = fields.Monetary(
+        currency_field='company_currency_id',
+        readonly=True,
+    )
+    amount_currency = fields.Monetary(
+        currency_field='currency_id',
+        readonly=True,
+    )
+
+    @api.model_cr
+    def init(self):
+        res = super(AccountPeriodBalance, self).init()
+        self._cr.execute("""
+            SELECT indexname FROM pg_indexes
+            WHERE indexname = 'account_period_balance_key_uniq'
+        """)
+        if not self._cr.fetchone():
+            self._cr.execute("""
+                CREATE UNIQUE INDEX account_period_balance_key_uniq
+                ON account_period_balance (
+                    company_id,
+                    account_id,
+                    COALESCE(partner_id, 0),
+                    COALESCE(currency_id, 0),
+                    date,
+                    posted
+                )
+            """)
+        return res
+
+    @api.model
+    def _get_move_line_select_query(self):
+        """ Return the query aggregating journal items into snapshot rows.
+
+        The query must be completed with a WHERE clause on `ml` or `m`.
+        """
+        return """
+SELECT
+    a.company_id,
+    ml.account_id,
+    ml.partner_id,
+    ml.currency_id,
+    DATE_TRUNC('month', m.date)::date AS date,
+    m.state = 'posted' AS posted,
+    %(sign)s * SUM(COALESCE(ml.debit, 0.0)) AS debit,
+    %(sign)s * SUM(COALESCE(ml.credit, 0.0)) AS credit,
+    %(sign)s * SUM(COALESCE(ml.debit, 0.0) - COALESCE(ml.credit, 0.0))
+        AS balance,
+    %(sign)s * SUM(COALESCE(ml.amount_currency, 0.0)) AS amount_currency
+FROM
+    account_move_line ml
+INNER JOIN
+    account_move m ON ml.move_id = m.id
+INNER JOIN
+    account_account a ON ml.account_id = a.id
+        """
+
+    @api.model
+    def _get_move_line_group_by_query(self):
+        return """
+GROUP BY
+    a.company_id,
+    ml.account_id,
+    ml.partner_id,
+    ml.currency_id,
+    DATE_TRUNC('month', m.date)::date,
+    m.state = 'posted'
+        """
+
+    @api.model
+    def _apply_move_lines(self, move_line_ids, sign=1):
+        """ Add (sign=1) or remove (sign=-1) the amounts of the given
+        journal items to/from the snapshot rows.
+        """
+        if not move_line_ids:
+            return
+        query = """
+INSERT INTO
+    account_period_balance
+    (
+    create_uid,
+    create_date,
+    write_uid,
+    write_date,
+    company_id,
+    account_id,
+    partner_id,
+    currency_id,
+    date,
+    posted,
+    debit,
+    credit,
+    balance,
+    amount_currency
+    )
+SELECT
+    %(user_id)s,
+    NOW(),
+    %(user_id)s,
+    NOW(),
+    sub.*
+FROM
+    (
+        """
+        query += self._get_move_line_select_query()
+        query += """
+WHERE
+    ml.id IN %(move_line_ids)s
+        """
+        query += self._get_move_line_group_by_query()
+        # The rows are locked in the same order by all the transactions,
+        # so that concurrent postings wait for each other instead of
+        # deadlocking
+        query += """
+    ) sub
+ORDER BY
+    sub.company_id,
+    sub.account_id,
+    sub.partner_id,
+    sub.currency_id,
+    sub.date,
+    sub.posted
+ON CONFLICT (
+    company_id,
+    account_id,
+    COALESCE(partner_id, 0),
+    COALESCE(currency_id, 0),
+    date,
+    posted
+)
+DO UPDATE SET
+    debit = account_period_balance.debit + EXCLUDED.debit,
+    credit = account_period_balance.credit + EXCLUDED.credit,
+    balance = account_period_balance.balance + EXCLUDED.balance,
+    amount_currency =
+        account_period_balance.amount_currency + EXCLUDED.amount_currency,
+    write_uid = EXCLUDED.write_uid,
+    write_date = EXCLUDED.write_date
+RETURNING
+    company_id
+        """
+        self.env.cr.execute(query, {
+            'sign': sign,
+            'user_id': self.env.uid,
+            'move_line_ids': tuple(move_line_ids),
+        })
+        self.env['account.ledger.change']._add_changes(
+            [row[0] for row in self.env.cr.fetchall()])
+
+    @api.model
+    def _rebuild(self, company_ids=None):
+        """ Recompute the whole snapshot from the journal items. """
+        query_delete = """
+DELETE FROM
+    account_period_balance
+        """
+        query_insert = """
+INSERT INTO
+    account_period_balance
+    (
+    create_uid,
+    create_date,
+    write_uid,
+    write_date,
+    company_id,
+    account_id,
+    partner_id,
+    currency_id,
+    date,
+    posted,
+    debit,
+    credit,
+    balance,
+    amount_currency
+    )
+SELECT
+    %(user_id)s,
+    NOW(),
+    %(user_id)s,
+    NOW(),
+    sub.*
+FROM
+    (
+        """
+        query_insert += self._get_move_line_select_query()
+        if company_ids:
+            query_delete += """
+WHERE
+    company_id IN %(company_ids)s
+            """
+            query_insert += """
+WHERE
+    a.company_id IN %(company_ids)s
+            """
+        query_insert += self._get_move_line_group_by_query()
+        query_insert += """
+    ) sub
+        """
+        params = {
+            'sign': 1,
+            'user_id': self.env.uid,
+            'company_ids': tuple(company_ids or []),
+        }
+        self.env.cr.execute(query_delete, params)
+        self.env.cr.execute(query_insert, params)
+        self.env['account.ledger.change']._add_changes(company_ids or None)
+        self.invalidate_cache()
+        return True
@@ -0,0 +1,201 @@
+# Copyright 2018 Tecnativa
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import api, fields, models
+
+
+class AccountReconcileTimeline(models.Model):
+    """ Reconciliation timeline of the journal items.
+
+    There is one row per partial reconciliation and per side: the amounts
+    of the partial are reconciled with each of its two journal items at
+    the effective date of the partial, the latest date of both journal
+    items.
+
+    The amounts reconciled with a journal item until a date are then a
+    single indexed aggregate, instead of joins of the partial
+    reconciliations with both journal items. The rows are maintained from
+    the account.partial.reconcile and account.move hooks, and removed with
+    their partial reconciliation.
+    """
+
+    _name = 'account.reconcile.timeline'
+    _description = 'Reconciliation Timeline'
+    _order = 'move_line_id, date'
+
+    partial_id = fields.Many2one(
+        comodel_name='account.partial.reconcile',
+        required=True,
+        readonly=True,
+        ondelete='cascade',
+    )
+    move_line_id = fields.Many2one(
+        comodel_name='account.move.line',
+        required=True,
+        readonly=True,
+        ondelete='cascade',
+    )
+    date = fields.Date(
+        required=True,
+        readonly=True,
+        help="Latest date of the reconciled journal items.",
+    )
+    amount = fields.Float(readonly=True)
+    amount_currency = fields.Float(readonly=True)
+    currency_id = fields.Many2one(
+        comodel_name='res.currency',
+        readonly=True,
+    )
+
+    @api.model_cr
+    def init(self):
+        res = super(AccountReconcileTimeline, self).init()
+        for name, definition in (
+                ('account_reconcile_timeline_key_uniq',
+                 'UNIQUE INDEX %s ON account_reconcile_timeline '
+                 '(partial_id, move_line_id)'),
+                ('account_reconcile_timeline_move_line_id_date_index',
+                 'INDEX %s ON account_reconcile_timeline '
+                 '(move_line_id, date)'),
+                ('account_reconcile_timeline_date_index',
+                 'INDEX %s ON account_reconcile_timeline (date)')):
+            self._cr.execute("""
+                SELECT indexname FROM pg_indexes WHERE indexname = %s
+            """, (name,))
+            if not self._cr.fetchone():
+                self._cr.execute('CREATE ' + definition % name)
+        return res
+
+    @api.model
+    def _get_reconciled_amounts_query(self, move_line_alias, date):
+        """ Return a join adding the amounts reconciled with the journal
+        items of `move_line_alias` until the `date` SQL expression, and the
+        date of their last reconciliation (after `date` if they are only
+        reconciled later), aliased `<move_line_alias>_reconciled`:
+        `amount`, `amount_currency` and `max_date`.
+        """
+        return """
+LEFT JOIN LATERAL
+    (
+        SELECT
+            SUM(rt.amount) FILTER (WHERE rt.date <= {date}) AS amount,
+            SUM(rt.amount_currency) FILTER (WHERE rt.date <= {date})
+                AS amount_currency,
+            MAX(rt.date) AS max_date
+        FROM
+            account_reconcile_timeline rt
+        WHERE
+            rt.move_line_id = {alias}.id
+    ) {alias}_reconciled ON TRUE
+        """.format(alias=move_line_alias, date=date)
+
+    @api.model
+    def _get_partial_select_query(self):
+        """ Return the query of the timeline rows of the partial
+        reconciliations.
+
+        The query must be completed with a WHERE clause on `pr`.
+        """
+        return """
+SELECT
+    %(user_id)s,
+    NOW(),
+    %(user_id)s,
+    NOW(),
+    pr.id,
+    side.move_line_id,
+    GREATEST(dml.date, cml.date),
+    pr.amount,
+    pr.amount_currency,
+    pr.currency_id
+FROM
+    account_partial_reconcile pr
+INNER JOIN
+    account_move_line dml ON pr.debit_move_id = dml.id
+INNER JOIN
+    account_move_line cml ON pr.credit_move_id = cml.id
+CROSS JOIN LATERAL
+    (VALUES (pr.debit_move_id), (pr.credit_move_id)) side (move_line_id)
+        """
+
+    @api.model
+    def _get_insert_query(self):
+        return """
+INSERT INTO
+    account_reconcile_timeline
+    (
+    create_uid,
+    create_date,
+    write_uid,
+    write_date,
+    partial_id,
+    move_line_id,
+    date,
+    amount,
+    amount_currency,
+    currency_id
+    )
+        """ + self._get_partial_select_query()
+
+    @api.model
+    def _add_partials(self, partial_ids):
+        """ Add the rows of the given partial reconciliations. """
+        if not partial_ids:
+            return
+        query = self._get_insert_query() + """
+WHERE
+    pr.id IN %(partial_ids)s
+        """
+        self.env.cr.execute(query, {
+            'user_id': self.env.uid,
+            'partial_ids': tuple(partial_ids),
+        })
+
+    @api.model
+    def _update_move_lines_dates(self, move_line_ids):
+        """ Update the dates of the partial reconciliations of the given
+        journal items, whose date changed.
+        """
+        if not move_line_ids:
+            return
+        self.env.cr.execute("""
+UPDATE
+    account_reconcile_timeline rt
+SET
+    date = GREATEST(dml.date, cml.date),
+    write_uid = %(user_id)s,
+    write_date = NOW()
+FROM
+    account_partial_reconcile pr
+INNER JOIN
+    account_move_line dml ON pr.debit_move_id = dml.id
+INNER JOIN
+    account_move_line cml ON pr.credit_move_id = cml.id
+WHERE
+    rt.partial_id = pr.id
+AND
+    (
+        pr.debit_move_id IN %(move_line_ids)s
+        OR pr.credit_move_id IN %(move_line_ids)s
+    )
+AND
+    rt.date != GREATEST(dml.date, cml.date)
+        """, {
+            'user_id': self.env.uid,
+            'move_line_ids': tuple(move_line_ids),
+        })
+        self.invalidate_cache()
+
+    @api.model
+    def _rebuild(self):
+        """ Recompute the whole timeline from the partial reconciliations.
+        """
+        self.env.cr.execute("""
+DELETE FROM
+    account_reconcile_timeline
+        """)
+        self.env.cr.execute(self._get_insert_query(), {
+            'user_id': self.env.uid,
+        })
+        self.invalidate_cache()
+        return True
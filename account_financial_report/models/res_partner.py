@@ -0,0 +1,63 @@
+# Copyright 2018 Tecnativa
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import api, fields, models
+
+
+class ResPartner(models.Model):
+    _inherit = 'res.partner'
+
+    @api.multi
+    def _get_open_balance(self, date_at=None, company=None,
+                          account_type='receivable', only_posted_moves=True,
+                          aging_days=None, aging_date='date_due'):
+        """ Return the open balance of the partners at `date_at` (today by
+        default) on their `account_type` accounts of `company` (the user
+        company by default), with its aging and its open items.
+
+        The amounts are computed by the Open Items report queries without
+        storing report rows, so this is fast enough to be called on the fly
+        for a few partners. The aging is the list of the buckets of
+        `aging_days` (see `report_aged_partner_balance._get_aging_buckets`)
+        with their `amount`, by due date or by document date (`aging_date`
+        is 'date_due' or 'date'). See
+        `report_open_items._get_partners_open_items` for the move lines.
+        """
+        company = company or self.env.user.company_id
+        aged_partner_balance = self.env['report_aged_partner_balance']
+        # Raise ValueError on an invalid aging date, even without accounts
+        aged_partner_balance._get_aging_date_column('ml', aging_date)
+        buckets = aged_partner_balance._get_aging_buckets(aging_days)
+        accounts = self.env['account.account'].search([
+            ('company_id', '=', company.id),
+            ('internal_type', '=', account_type),
+        ])
+        result = {
+            partner_id: {
+                'amount_residual': 0.0,
+                'aging': [dict(bucket, amount=0.0) for bucket in buckets],
+                'move_lines': [],
+            }
+            for partner_id in self.ids
+        }
+        if not self or not accounts:
+            return result
+        report = self.env['report_open_items'].new({
+            'date_at': date_at or fields.Date.context_today(self),
+            'only_posted_moves': only_posted_moves,
+            'company_id': company.id,
+            'filter_account_ids': [(6, 0, accounts.ids)],
+            'filter_partner_ids': [(6, 0, self.ids)],
+        })
+        open_items = report._get_partners_open_items(
+            buckets, aging_date=aging_date)
+        for partner_id, values in open_items.items():
+            result[partner_id].update({
+                'amount_residual': float(values['amount_residual'] or 0.0),
+                'aging': [
+                    dict(bucket, amount=float(amount))
+                    for bucket, amount in zip(buckets, values['aging'])
+                ],
+                'move_lines': values['move_lines'],
+            })
+        return result
@@ -162,12 +162,18 @@ class AbstractReportXslx(models.AbstractModel):
                              self.format_header_center)
         self.row_pos += 1
 
+    def _get_cell_value(self, my_object, column, field_name):
+        """Return the value of `column` for `my_object`, read from the field
+        named by the `field_name` key of the column.
+        """
+        return getattr(my_object, column[field_name])
+
     def write_line(self, line_object):
         """Write a line on current line using all defined columns field name.
         Columns are defined with `_get_report_columns` method.
         """
         for col_pos, column in self.columns.items():
-            value = getattr(line_object, column['field'])
+            value = self._get_cell_value(line_object, column, 'field')
             cell_type = column.get('type', 'string')
             if cell_type == 'many2one':
                 self.sheet.write_string(
@@ -196,7 +202,8 @@ class AbstractReportXslx(models.AbstractModel):
         self.sheet.write(self.row_pos, col_pos_label, label, self.format_right)
         for col_pos, column in self.columns.items():
             if column.get('field_initial_balance'):
-                value = getattr(my_object, column['field_initial_balance'])
+                value = self._get_cell_value(
+                    my_object, column, 'field_initial_balance')
                 cell_type = column.get('type', 'string')
                 if cell_type == 'string':
                     self.sheet.write_string(self.row_pos, col_pos, value or '')
@@ -242,7 +249,8 @@ class AbstractReportXslx(models.AbstractModel):
                          self.format_header_right)
         for col_pos, column in self.columns.items():
             if column.get('field_final_balance'):
-                value = getattr(my_object, column['field_final_balance'])
+                value = self._get_cell_value(
+                    my_object, column, 'field_final_balance')
                 cell_type = column.get('type', 'string')
                 if cell_type == 'string':
                     self.sheet.write_string(self.row_pos, col_pos, value or '',
@@ -1,7 +1,7 @@
 # © 2016 Julien Coux (Camptocamp)
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
-from odoo import models, fields, api
+from odoo import models, fields, api, _
 
 
 class AgedPartnerBalanceReport(models.TransientModel):
@@ -15,6 +15,10 @@ class AgedPartnerBalanceReport(models.TransientModel):
     **** AgedPartnerBalanceReportLine
     **** AgedPartnerBalanceReportMoveLine
             If "show_move_line_details" is selected
+
+    The amounts of the accounts, partner lines and move lines are split
+    into the aging buckets of the report (AgedPartnerBalanceReportBucket) by
+    AgedPartnerBalanceReportAmount rows.
     """
 
     _name = 'report_aged_partner_balance'
@@ -26,6 +30,11 @@ class AgedPartnerBalanceReport(models.TransientModel):
     filter_account_ids = fields.Many2many(comodel_name='account.account')
     filter_partner_ids = fields.Many2many(comodel_name='res.partner')
     show_move_line_details = fields.Boolean()
+    aging_days = fields.Char()
+    aging_date = fields.Selection(
+        selection=[('date_due', 'Due date'), ('date', 'Document date')],
+        default='date_due',
+    )
 
     # Open Items Report Data fields, used as base for compute the data reports
     open_items_id = fields.Many2one(comodel_name='report_open_items')
@@ -35,6 +44,63 @@ class AgedPartnerBalanceReport(models.TransientModel):
         comodel_name='report_aged_partner_balance_account',
         inverse_name='report_id'
     )
+    bucket_ids = fields.One2many(
+        comodel_name='report_aged_partner_balance_bucket',
+        inverse_name='report_id'
+    )
+
+
+class AgedPartnerBalanceReportBucket(models.TransientModel):
+    """ Aging bucket of the report: the amounts whose age in days (from
+    their due or document date to the report date) is between `days_from`
+    and `days_to`, unbounded if empty.
+    """
+
+    _name = 'report_aged_partner_balance_bucket'
+    _order = 'sequence ASC'
+
+    report_id = fields.Many2one(
+        comodel_name='report_aged_partner_balance',
+        ondelete='cascade',
+        index=True
+    )
+    sequence = fields.Integer()
+    name = fields.Char()
+    days_from = fields.Integer()
+    days_to = fields.Integer()
+
+
+class AgedPartnerBalanceReportAmount(models.TransientModel):
+    """ Amount of an account, a partner line or a move line in an aging
+    bucket. Each of them has one amount per bucket of the report.
+    """
+
+    _name = 'report_aged_partner_balance_amount'
+    _order = 'bucket_id ASC'
+
+    bucket_id = fields.Many2one(
+        comodel_name='report_aged_partner_balance_bucket',
+        ondelete='cascade',
+        index=True
+    )
+    report_account_id = fields.Many2one(
+        comodel_name='report_aged_partner_balance_account',
+        ondelete='cascade',
+        index=True
+    )
+    report_line_id = fields.Many2one(
+        comodel_name='report_aged_partner_balance_line',
+        ondelete='cascade',
+        index=True
+    )
+    report_move_line_id = fields.Many2one(
+        comodel_name='report_aged_partner_balance_move_line',
+        ondelete='cascade',
+        index=True
+    )
+
+    amount = fields.Float(digits=(16, 2))
+    percent = fields.Float(digits=(16, 2))
 
 
 class AgedPartnerBalanceReportAccount(models.TransientModel):
@@ -58,21 +124,12 @@ class AgedPartnerBalanceReportAccount(models.TransientModel):
     name = fields.Char()
 
     cumul_amount_residual = fields.Float(digits=(16, 2))
-    cumul_current = fields.Float(digits=(16, 2))
-    cumul_age_30_days = fields.Float(digits=(16, 2))
-    cumul_age_60_days = fields.Float(digits=(16, 2))
-    cumul_age_90_days = fields.Float(digits=(16, 2))
-    cumul_age_120_days = fields.Float(digits=(16, 2))
-    cumul_older = fields.Float(digits=(16, 2))
-
-    percent_current = fields.Float(digits=(16, 2))
-    percent_age_30_days = fields.Float(digits=(16, 2))
-    percent_age_60_days = fields.Float(digits=(16, 2))
-    percent_age_90_days = fields.Float(digits=(16, 2))
-    percent_age_120_days = fields.Float(digits=(16, 2))
-    percent_older = fields.Float(digits=(16, 2))
 
     # Data fields, used to browse report data
+    amount_ids = fields.One2many(
+        comodel_name='report_aged_partner_balance_amount',
+        inverse_name='report_account_id'
+    )
     partner_ids = fields.One2many(
         comodel_name='report_aged_partner_balance_partner',
         inverse_name='report_account_id'
@@ -134,12 +191,12 @@ class AgedPartnerBalanceReportLine(models.TransientModel):
     # Data fields, used for report display
     partner = fields.Char()
     amount_residual = fields.Float(digits=(16, 2))
-    current = fields.Float(digits=(16, 2))
-    age_30_days = fields.Float(digits=(16, 2))
-    age_60_days = fields.Float(digits=(16, 2))
-    age_90_days = fields.Float(digits=(16, 2))
-    age_120_days = fields.Float(digits=(16, 2))
-    older = fields.Float(digits=(16, 2))
+
+    # Data fields, used to browse report data
+    amount_ids = fields.One2many(
+        comodel_name='report_aged_partner_balance_amount',
+        inverse_name='report_line_id'
+    )
 
 
 class AgedPartnerBalanceReportMoveLine(models.TransientModel):
@@ -164,12 +221,12 @@ class AgedPartnerBalanceReportMoveLine(models.TransientModel):
     label = fields.Char()
 
     amount_residual = fields.Float(digits=(16, 2))
-    current = fields.Float(digits=(16, 2))
-    age_30_days = fields.Float(digits=(16, 2))
-    age_60_days = fields.Float(digits=(16, 2))
-    age_90_days = fields.Float(digits=(16, 2))
-    age_120_days = fields.Float(digits=(16, 2))
-    older = fields.Float(digits=(16, 2))
+
+    # Data fields, used to browse report data
+    amount_ids = fields.One2many(
+        comodel_name='report_aged_partner_balance_amount',
+        inverse_name='report_move_line_id'
+    )
 
 
 class AgedPartnerBalanceReportCompute(models.TransientModel):
@@ -229,17 +286,122 @@ class AgedPartnerBalanceReportCompute(models.TransientModel):
         self.open_items_id.compute_data_for_report()
 
         # Compute report data
+        job = self.env['account.financial.report.job']
+        job._report_progress(_('Aged Partner Balance: partners'))
+        self._inject_bucket_values()
         self._inject_account_values()
         self._inject_partner_values()
         self._inject_line_values()
         self._inject_line_values(only_empty_partner_line=True)
         if self.show_move_line_details:
+            job._report_progress(_('Aged Partner Balance: move lines'))
             self._inject_move_line_values()
             self._inject_move_line_values(only_empty_partner_line=True)
+        job._report_progress(_('Aged Partner Balance: totals'))
         self._compute_accounts_cumul()
         # Refresh cache because all data are computed with SQL requests
         self.invalidate_cache()
 
+    @api.model
+    def _get_aging_buckets(self, aging_days=None):
+        """ Return the aging buckets of the `aging_days` boundaries, a comma
+        separated list of days ("30,60,90,120" or the
+        `account_financial_report.aging_days` system parameter by default).
+
+        The buckets are dicts of `sequence`, `name`, `days_from` and
+        `days_to` (None if unbounded): the amounts not due yet, one bucket
+        per boundary and the amounts older than the last boundary.
+        """
+        if not aging_days:
+            aging_days = self.env['ir.config_parameter'].sudo().get_param(
+                'account_financial_report.aging_days', default='30,60,90,120')
+        boundaries = sorted(set(
+            int(days) for days in aging_days.split(',') if days.strip()
+        ))
+        boundaries = [days for days in boundaries if days > 0]
+        buckets = [{
+            'sequence': 0,
+            'name': _('Current'),
+            'days_from': None,
+            'days_to': 0,
+        }]
+        days_from = 1
+        for days_to in boundaries:
+            buckets.append({
+                'sequence': len(buckets),
+                'name': _('%s - %s d.') % (days_from, days_to),
+                'days_from': days_from,
+                'days_to': days_to,
+            })
+            days_from = days_to + 1
+        buckets.append({
+            'sequence': len(buckets),
+            'name': _('> %s d.') % (days_from - 1),
+            'days_from': days_from,
+            'days_to': None,
+        })
+        return buckets
+
+    @api.model
+    def _get_aging_buckets_query(self, buckets):
+        """ Return the query of the given aging buckets, used as a table of
+        `sequence`, `days_from` and `days_to` columns.
+        """
+        values = ', '.join(
+            '({}, {}, {})'.format(*(
+                'NULL' if value is None else int(value)
+                for value in (
+                    bucket['sequence'],
+                    bucket['days_from'],
+                    bucket['days_to'],
+                )
+            ))
+            for bucket in buckets
+        )
+        return """
+            SELECT
+                sequence,
+                days_from::integer AS days_from,
+                days_to::integer AS days_to
+            FROM
+                (VALUES {values}) buckets (sequence, days_from, days_to)
+        """.format(values=values)
+
+    @api.model
+    def _get_aging_date_column(self, alias, aging_date):
+        """ Return the column of `alias` the amounts are aged from, for the
+        `aging_date` option ('date_due' or 'date').
+        """
+        if aging_date not in ('date_due', 'date'):
+            raise ValueError("Invalid aging date: %r" % (aging_date,))
+        return '%s.%s' % (alias, aging_date)
+
+    @api.model
+    def _get_bucket_condition(self, bucket, date_at, date):
+        """ Return the condition matching the `date` SQL expression with the
+        aging bucket of alias `bucket` at the `date_at` SQL expression.
+        """
+        return """
+            int4range({bucket}.days_from, {bucket}.days_to, '[]')
+                @> (DATE {date_at} - {date})
+        """.format(bucket=bucket, date_at=date_at, date=date)
+
+    def _inject_bucket_values(self):
+        """Inject report values for report_aged_partner_balance_bucket"""
+        self.env['account.financial.report.storage']._copy_rows(
+            'report_aged_partner_balance_bucket',
+            ['report_id', 'sequence', 'name', 'days_from', 'days_to'],
+            [
+                (
+                    self.id,
+                    bucket['sequence'],
+                    bucket['name'],
+                    bucket['days_from'],
+                    bucket['days_to'],
+                )
+                for bucket in self._get_aging_buckets(self.aging_days)
+            ])
+
     def _inject_account_values(self):
         """Inject report values for report_aged_partner_balance_account"""
         query_inject_account = """
@@ -308,249 +470,241 @@ AND ra.report_id = %s
         self.env.cr.execute(query_inject_partner, query_inject_partner_params)
 
     def _inject_line_values(self, only_empty_partner_line=False):
-        """ Inject report values for report_aged_partner_balance_line.
+        """ Inject report values for report_aged_partner_balance_line and
+        their report_aged_partner_balance_amount, in one pass on the open
+        items whatever the number of buckets.
 
         The "only_empty_partner_line" value is used
         to compute data without partner.
         """
+        aging_date = self._get_aging_date_column(
+            'rlo', self.aging_date or 'date_due')
         query_inject_line = """
 WITH
-    date_range AS
+    bucket_amounts AS
         (
             SELECT
-                DATE %s AS date_current,
-                DATE %s - INTEGER '30' AS date_less_30_days,
-                DATE %s - INTEGER '60' AS date_less_60_days,
-                DATE %s - INTEGER '90' AS date_less_90_days,
-                DATE %s - INTEGER '120' AS date_less_120_days
+                rp.id AS report_partner_id,
+                rb.id AS bucket_id,
+                SUM(rlo.amount_residual) AS amount_residual
+            FROM
+                report_open_items_move_line rlo
+            INNER JOIN
+                report_open_items_partner rpo
+                    ON rlo.report_partner_id = rpo.id
+            INNER JOIN
+                report_open_items_account rao
+                    ON rpo.report_account_id = rao.id
+            INNER JOIN
+                report_aged_partner_balance_account ra ON rao.code = ra.code
+            INNER JOIN
+                report_aged_partner_balance_partner rp
+                    ON
+                        ra.id = rp.report_account_id
+        """
+        if not only_empty_partner_line:
+            query_inject_line += """
+                    AND rpo.partner_id = rp.partner_id
+            """
+        elif only_empty_partner_line:
+            query_inject_line += """
+                    AND rpo.partner_id IS NULL
+                    AND rp.partner_id IS NULL
+            """
+        query_inject_line += """
+            LEFT JOIN
+                report_aged_partner_balance_bucket rb
+                    ON
+                        rb.report_id = ra.report_id
+                    AND
+        """ + self._get_bucket_condition(
+            'rb', '%(date_at)s', aging_date) + """
+            WHERE
+                rao.report_id = %(open_items_id)s
+            AND ra.report_id = %(report_id)s
+            GROUP BY
+                rp.id,
+                rb.id
+        ),
+    lines AS
+        (
+            INSERT INTO
+                report_aged_partner_balance_line
+                (
+                    report_partner_id,
+                    create_uid,
+                    create_date,
+                    partner,
+                    amount_residual
+                )
+            SELECT
+                rp.id AS report_partner_id,
+                %(user_id)s AS create_uid,
+                NOW() AS create_date,
+                rp.name,
+                SUM(ba.amount_residual) AS amount_residual
+            FROM
+                bucket_amounts ba
+            INNER JOIN
+                report_aged_partner_balance_partner rp
+                    ON ba.report_partner_id = rp.id
+            GROUP BY
+                rp.id
+            RETURNING
+                id,
+                report_partner_id
         )
 INSERT INTO
-    report_aged_partner_balance_line
+    report_aged_partner_balance_amount
     (
-        report_partner_id,
+        report_line_id,
+        bucket_id,
         create_uid,
         create_date,
-        partner,
-        amount_residual,
-        current,
-        age_30_days,
-        age_60_days,
-        age_90_days,
-        age_120_days,
-        older
+        amount
     )
 SELECT
-    rp.id AS report_partner_id,
-    %s AS create_uid,
+    l.id AS report_line_id,
+    rb.id AS bucket_id,
+    %(user_id)s AS create_uid,
     NOW() AS create_date,
-    rp.name,
-    SUM(rlo.amount_residual) AS amount_residual,
-    SUM(
-        CASE
-            WHEN rlo.date_due >= date_range.date_current
-            THEN rlo.amount_residual
-        END
-    ) AS current,
-    SUM(
-        CASE
-            WHEN
-                rlo.date_due >= date_range.date_less_30_days
-                AND rlo.date_due < date_range.date_current
-            THEN rlo.amount_residual
-        END
-    ) AS age_30_days,
-    SUM(
-        CASE
-            WHEN
-                rlo.date_due >= date_range.date_less_60_days
-                AND rlo.date_due < date_range.date_less_30_days
-            THEN rlo.amount_residual
-        END
-    ) AS age_60_days,
-    SUM(
-        CASE
-            WHEN
-                rlo.date_due >= date_range.date_less_90_days
-                AND rlo.date_due < date_range.date_less_60_days
-            THEN rlo.amount_residual
-        END
-    ) AS age_90_days,
-    SUM(
-        CASE
-            WHEN
-                rlo.date_due >= date_range.date_less_120_days
-                AND rlo.date_due < date_range.date_less_90_days
-            THEN rlo.amount_residual
-        END
-    ) AS age_120_days,
-    SUM(
-        CASE
-            WHEN rlo.date_due < date_range.date_less_120_days
-            THEN rlo.amount_residual
-        END
-    ) AS older
+    COALESCE(ba.amount_residual, 0) AS amount
 FROM
-    date_range,
-    report_open_items_move_line rlo
-INNER JOIN
-    report_open_items_partner rpo ON rlo.report_partner_id = rpo.id
-INNER JOIN
-    report_open_items_account rao ON rpo.report_account_id = rao.id
-INNER JOIN
-    report_aged_partner_balance_account ra ON rao.code = ra.code
-INNER JOIN
-    report_aged_partner_balance_partner rp
-        ON
-            ra.id = rp.report_account_id
-        """
-        if not only_empty_partner_line:
-            query_inject_line += """
-        AND rpo.partner_id = rp.partner_id
-            """
-        elif only_empty_partner_line:
-            query_inject_line += """
-        AND rpo.partner_id IS NULL
-        AND rp.partner_id IS NULL
-            """
-        query_inject_line += """
+    lines l
+CROSS JOIN
+    report_aged_partner_balance_bucket rb
+LEFT JOIN
+    bucket_amounts ba
+        ON ba.report_partner_id = l.report_partner_id
+        AND ba.bucket_id = rb.id
 WHERE
-    rao.report_id = %s
-AND ra.report_id = %s
-GROUP BY
-    rp.id
+    rb.report_id = %(report_id)s
         """
-        query_inject_line_params = (self.date_at,) * 5
-        query_inject_line_params += (
-            self.env.uid,
-            self.open_items_id.id,
-            self.id,
-        )
+        query_inject_line_params = {
+            'date_at': self.date_at,
+            'user_id': self.env.uid,
+            'open_items_id': self.open_items_id.id,
+            'report_id': self.id,
+        }
         self.env.cr.execute(query_inject_line, query_inject_line_params)
 
     def _inject_move_line_values(self, only_empty_partner_line=False):
         """ Inject report values for report_aged_partner_balance_move_line
+        and their report_aged_partner_balance_amount.
 
         The "only_empty_partner_line" value is used
         to compute data without partner.
         """
+        aging_date = self._get_aging_date_column(
+            'ml', self.aging_date or 'date_due')
         query_inject_move_line = """
 WITH
-    date_range AS
+    move_lines AS
         (
+            INSERT INTO
+                report_aged_partner_balance_move_line
+                (
+                    report_partner_id,
+                    create_uid,
+                    create_date,
+                    move_line_id,
+                    date,
+                    date_due,
+                    entry,
+                    journal,
+                    account,
+                    partner,
+                    label,
+                    amount_residual
+                )
             SELECT
-                DATE %s AS date_current,
-                DATE %s - INTEGER '30' AS date_less_30_days,
-                DATE %s - INTEGER '60' AS date_less_60_days,
-                DATE %s - INTEGER '90' AS date_less_90_days,
-                DATE %s - INTEGER '120' AS date_less_120_days
+                rp.id AS report_partner_id,
+                %(user_id)s AS create_uid,
+                NOW() AS create_date,
+                rlo.move_line_id,
+                rlo.date,
+                rlo.date_due,
+                rlo.entry,
+                rlo.journal,
+                rlo.account,
+                rlo.partner,
+                rlo.label,
+                rlo.amount_residual AS amount_residual
+            FROM
+                report_open_items_move_line rlo
+            INNER JOIN
+                report_open_items_partner rpo
+                    ON rlo.report_partner_id = rpo.id
+            INNER JOIN
+                report_open_items_account rao
+                    ON rpo.report_account_id = rao.id
+            INNER JOIN
+                report_aged_partner_balance_account ra ON rao.code = ra.code
+            INNER JOIN
+                report_aged_partner_balance_partner rp
+                    ON
+                        ra.id = rp.report_account_id
+        """
+        if not only_empty_partner_line:
+            query_inject_move_line += """
+                    AND rpo.partner_id = rp.partner_id
+            """
+        elif only_empty_partner_line:
+            query_inject_move_line += """
+                    AND rpo.partner_id IS NULL
+                    AND rp.partner_id IS NULL
+            """
+        query_inject_move_line += """
+            WHERE
+                rao.report_id = %(open_items_id)s
+            AND ra.report_id = %(report_id)s
+            RETURNING
+                id,
+                date,
+                date_due,
+                amount_residual
         )
 INSERT INTO
-    report_aged_partner_balance_move_line
+    report_aged_partner_balance_amount
     (
-        report_partner_id,
+        report_move_line_id,
+        bucket_id,
         create_uid,
         create_date,
-        move_line_id,
-        date,
-        date_due,
-        entry,
-        journal,
-        account,
-        partner,
-        label,
-        amount_residual,
-        current,
-        age_30_days,
-        age_60_days,
-        age_90_days,
-        age_120_days,
-        older
+        amount
     )
 SELECT
-    rp.id AS report_partner_id,
-    %s AS create_uid,
+    ml.id AS report_move_line_id,
+    rb.id AS bucket_id,
+    %(user_id)s AS create_uid,
     NOW() AS create_date,
-    rlo.move_line_id,
-    rlo.date,
-    rlo.date_due,
-    rlo.entry,
-    rlo.journal,
-    rlo.account,
-    rlo.partner,
-    rlo.label,
-    rlo.amount_residual AS amount_residual,
-    CASE
-        WHEN rlo.date_due >= date_range.date_current
-        THEN rlo.amount_residual
-    END AS current,
-    CASE
-        WHEN
-            rlo.date_due >= date_range.date_less_30_days
-            AND rlo.date_due < date_range.date_current
-        THEN rlo.amount_residual
-    END AS age_30_days,
-    CASE
-        WHEN
-            rlo.date_due >= date_range.date_less_60_days
-            AND rlo.date_due < date_range.date_less_30_days
-        THEN rlo.amount_residual
-    END AS age_60_days,
     CASE
         WHEN
-            rlo.date_due >= date_range.date_less_90_days
-            AND rlo.date_due < date_range.date_less_60_days
-        THEN rlo.amount_residual
-    END AS age_90_days,
-    CASE
-        WHEN
-            rlo.date_due >= date_range.date_less_120_days
-            AND rlo.date_due < date_range.date_less_90_days
-        THEN rlo.amount_residual
-    END AS age_120_days,
-    CASE
-        WHEN rlo.date_due < date_range.date_less_120_days
-        THEN rlo.amount_residual
-    END AS older
+        """ + self._get_bucket_condition(
+            'rb', '%(date_at)s', aging_date) + """
+        THEN ml.amount_residual
+        ELSE 0
+    END AS amount
 FROM
-    date_range,
-    report_open_items_move_line rlo
-INNER JOIN
-    report_open_items_partner rpo ON rlo.report_partner_id = rpo.id
-INNER JOIN
-    report_open_items_account rao ON rpo.report_account_id = rao.id
-INNER JOIN
-    report_aged_partner_balance_account ra ON rao.code = ra.code
-INNER JOIN
-    report_aged_partner_balance_partner rp
-        ON
-            ra.id = rp.report_account_id
-        """
-        if not only_empty_partner_line:
-            query_inject_move_line += """
-        AND rpo.partner_id = rp.partner_id
-            """
-        elif only_empty_partner_line:
-            query_inject_move_line += """
-        AND rpo.partner_id IS NULL
-        AND rp.partner_id IS NULL
-            """
-        query_inject_move_line += """
+    move_lines ml
+CROSS JOIN
+    report_aged_partner_balance_bucket rb
 WHERE
-    rao.report_id = %s
-AND ra.report_id = %s
+    rb.report_id = %(report_id)s
         """
-        query_inject_move_line_params = (self.date_at,) * 5
-        query_inject_move_line_params += (
-            self.env.uid,
-            self.open_items_id.id,
-            self.id,
-        )
+        query_inject_move_line_params = {
+            'date_at': self.date_at,
+            'user_id': self.env.uid,
+            'open_items_id': self.open_items_id.id,
+            'report_id': self.id,
+        }
         self.env.cr.execute(query_inject_move_line,
                             query_inject_move_line_params)
 
     def _compute_accounts_cumul(self):
         """ Compute cumulative amount for
-        report_aged_partner_balance_account.
+        report_aged_partner_balance_account and its amount and percent of
+        each bucket.
         """
         query_compute_accounts_cumul = """
 WITH
@@ -558,13 +712,7 @@ WITH
         (
             SELECT
                 ra.id AS report_account_id,
-                SUM(rl.amount_residual) AS cumul_amount_residual,
-                SUM(rl.current) AS cumul_current,
-                SUM(rl.age_30_days) AS cumul_age_30_days,
-                SUM(rl.age_60_days) AS cumul_age_60_days,
-                SUM(rl.age_90_days) AS cumul_age_90_days,
-                SUM(rl.age_120_days) AS cumul_age_120_days,
-                SUM(rl.older) AS cumul_older
+                SUM(rl.amount_residual) AS cumul_amount_residual
             FROM
                 report_aged_partner_balance_line rl
             INNER JOIN
@@ -574,55 +722,59 @@ WITH
                 report_aged_partner_balance_account ra
                     ON rp.report_account_id = ra.id
             WHERE
-                ra.report_id = %s
+                ra.report_id = %(report_id)s
             GROUP BY
                 ra.id
         )
 UPDATE
     report_aged_partner_balance_account
 SET
-    cumul_amount_residual = c.cumul_amount_residual,
-    cumul_current = c.cumul_current,
-    cumul_age_30_days = c.cumul_age_30_days,
-    cumul_age_60_days = c.cumul_age_60_days,
-    cumul_age_90_days = c.cumul_age_90_days,
-    cumul_age_120_days = c.cumul_age_120_days,
-    cumul_older = c.cumul_older,
-    percent_current =
-        CASE
-            WHEN c.cumul_amount_residual != 0
-            THEN 100 * c.cumul_current / c.cumul_amount_residual
-        END,
-    percent_age_30_days =
-        CASE
-            WHEN c.cumul_amount_residual != 0
-            THEN 100 * c.cumul_age_30_days / c.cumul_amount_residual
-        END,
-    percent_age_60_days =
-        CASE
-            WHEN c.cumul_amount_residual != 0
-            THEN 100 * c.cumul_age_60_days / c.cumul_amount_residual
-        END,
-    percent_age_90_days =
-        CASE
-            WHEN c.cumul_amount_residual != 0
-            THEN 100 * c.cumul_age_90_days / c.cumul_amount_residual
-        END,
-    percent_age_120_days =
-        CASE
-            WHEN c.cumul_amount_residual != 0
-            THEN 100 * c.cumul_age_120_days / c.cumul_amount_residual
-        END,
-    percent_older =
-        CASE
-            WHEN c.cumul_amount_residual != 0
-            THEN 100 * c.cumul_older / c.cumul_amount_residual
-        END
+    cumul_amount_residual = c.cumul_amount_residual
 FROM
     cumuls c
 WHERE
     id = c.report_account_id
         """
-        params_compute_accounts_cumul = (self.id,)
+        params_compute_accounts_cumul = {
+            'report_id': self.id,
+            'user_id': self.env.uid,
+        }
         self.env.cr.execute(query_compute_accounts_cumul,
                             params_compute_accounts_cumul)
+        query_inject_account_amount = """
+INSERT INTO
+    report_aged_partner_balance_amount
+    (
+        report_account_id,
+        bucket_id,
+        create_uid,
+        create_date,
+        amount,
+        percent
+    )
+SELECT
+    ra.id AS report_account_id,
+    ram.bucket_id,
+    %(user_id)s AS create_uid,
+    NOW() AS create_date,
+    SUM(ram.amount) AS amount,
+    CASE
+        WHEN ra.cumul_amount_residual != 0
+        THEN 100 * SUM(ram.amount) / ra.cumul_amount_residual
+    END AS percent
+FROM
+    report_aged_partner_balance_amount ram
+INNER JOIN
+    report_aged_partner_balance_line rl ON ram.report_line_id = rl.id
+INNER JOIN
+    report_aged_partner_balance_partner rp ON rl.report_partner_id = rp.id
+INNER JOIN
+    report_aged_partner_balance_account ra ON rp.report_account_id = ra.id
+WHERE
+    ra.report_id = %(report_id)s
+GROUP BY
+    ra.id,
+    ram.bucket_id
+        """
+        self.env.cr.execute(query_inject_account_amount,
+                            params_compute_accounts_cumul)
@@ -15,107 +15,51 @@ class AgedPartnerBalanceXslx(models.AbstractModel):
 
     def _get_report_columns(self, report):
         if not report.show_move_line_details:
-            return {
-                0: {'header': _('Partner'), 'field': 'partner', 'width': 70},
-                1: {'header': _('Residual'),
-                    'field': 'amount_residual',
-                    'field_footer_total': 'cumul_amount_residual',
-                    'type': 'amount',
-                    'width': 14},
-                2: {'header': _('Current'),
-                    'field': 'current',
-                    'field_footer_total': 'cumul_current',
-                    'field_footer_percent': 'percent_current',
-                    'type': 'amount',
-                    'width': 14},
-                3: {'header': _(u'Age ≤ 30 d.'),
-                    'field': 'age_30_days',
-                    'field_footer_total': 'cumul_age_30_days',
-                    'field_footer_percent': 'percent_age_30_days',
-                    'type': 'amount',
-                    'width': 14},
-                4: {'header': _(u'Age ≤ 60 d.'),
-                    'field': 'age_60_days',
-                    'field_footer_total': 'cumul_age_60_days',
-                    'field_footer_percent': 'percent_age_60_days',
-                    'type': 'amount',
-                    'width': 14},
-                5: {'header': _(u'Age ≤ 90 d.'),
-                    'field': 'age_90_days',
-                    'field_footer_total': 'cumul_age_90_days',
-                    'field_footer_percent': 'percent_age_90_days',
-                    'type': 'amount',
-                    'width': 14},
-                6: {'header': _(u'Age ≤ 120 d.'),
-                    'field': 'age_120_days',
-                    'field_footer_total': 'cumul_age_120_days',
-                    'field_footer_percent': 'percent_age_120_days',
-                    'type': 'amount',
-                    'width': 14},
-                7: {'header': _('Older'),
-                    'field': 'older',
-                    'field_footer_total': 'cumul_older',
-                    'field_footer_percent': 'percent_older',
-                    'type': 'amount',
-                    'width': 14},
-            }
-        return {
-            0: {'header': _('Date'), 'field': 'date', 'width': 11},
-            1: {'header': _('Entry'), 'field': 'entry', 'width': 18},
-            2: {'header': _('Journal'), 'field': 'journal', 'width': 8},
-            3: {'header': _('Account'), 'field': 'account', 'width': 9},
-            4: {'header': _('Partner'), 'field': 'partner', 'width': 25},
-            5: {'header': _('Ref - Label'), 'field': 'label', 'width': 40},
-            6: {'header': _('Due date'), 'field': 'date_due', 'width': 11},
-            7: {'header': _('Residual'),
-                'field': 'amount_residual',
-                'field_footer_total': 'cumul_amount_residual',
-                'field_final_balance': 'amount_residual',
-                'type': 'amount',
-                'width': 14},
-            8: {'header': _('Current'),
-                'field': 'current',
-                'field_footer_total': 'cumul_current',
-                'field_footer_percent': 'percent_current',
-                'field_final_balance': 'current',
-                'type': 'amount',
-                'width': 14},
-            9: {'header': _(u'Age ≤ 30 d.'),
-                'field': 'age_30_days',
-                'field_footer_total': 'cumul_age_30_days',
-                'field_footer_percent': 'percent_age_30_days',
-                'field_final_balance': 'age_30_days',
-                'type': 'amount',
-                'width': 14},
-            10: {'header': _(u'Age ≤ 60 d.'),
-                 'field': 'age_60_days',
-                 'field_footer_total': 'cumul_age_60_days',
-                 'field_footer_percent': 'percent_age_60_days',
-                 'field_final_balance': 'age_60_days',
-                 'type': 'amount',
-                 'width': 14},
-            11: {'header': _(u'Age ≤ 90 d.'),
-                 'field': 'age_90_days',
-                 'field_footer_total': 'cumul_age_90_days',
-                 'field_footer_percent': 'percent_age_90_days',
-                 'field_final_balance': 'age_90_days',
+            columns = [
+                {'header': _('Partner'), 'field': 'partner', 'width': 70},
+                {'header': _('Residual'),
+                 'field': 'amount_residual',
+                 'field_footer_total': 'cumul_amount_residual',
                  'type': 'amount',
                  'width': 14},
-            12: {'header': _(u'Age ≤ 120 d.'),
-                 'field': 'age_120_days',
-                 'field_footer_total': 'cumul_age_120_days',
-                 'field_footer_percent': 'percent_age_120_days',
-                 'field_final_balance': 'age_120_days',
-                 'type': 'amount',
-                 'width': 14},
-            13: {'header': _('Older'),
-                 'field': 'older',
-                 'field_footer_total': 'cumul_older',
-                 'field_footer_percent': 'percent_older',
-                 'field_final_balance': 'older',
+            ]
+        else:
+            columns = [
+                {'header': _('Date'), 'field': 'date', 'width': 11},
+                {'header': _('Entry'), 'field': 'entry', 'width': 18},
+                {'header': _('Journal'), 'field': 'journal', 'width': 8},
+                {'header': _('Account'), 'field': 'account', 'width': 9},
+                {'header': _('Partner'), 'field': 'partner', 'width': 25},
+                {'header': _('Ref - Label'), 'field': 'label', 'width': 40},
+                {'header': _('Due date'), 'field': 'date_due', 'width': 11},
+                {'header': _('Residual'),
+                 'field': 'amount_residual',
+                 'field_footer_total': 'cumul_amount_residual',
+                 'field_final_balance': 'amount_residual',
                  'type': 'amount',
                  'width': 14},
-        }
+            ]
+        # One column per aging bucket, read from the amounts of the lines
+        for bucket_index, bucket in enumerate(report.bucket_ids):
+            column = {
+                'header': bucket.name,
+                'field': 'amount',
+                'field_footer_total': 'amount',
+                'field_footer_percent': 'percent',
+                'bucket_index': bucket_index,
+                'type': 'amount',
+                'width': 14,
+            }
+            if report.show_move_line_details:
+                column['field_final_balance'] = 'amount'
+            columns.append(column)
+        return dict(enumerate(columns))
+
+    def _get_cell_value(self, my_object, column, field_name):
+        if 'bucket_index' in column:
+            my_object = my_object.amount_ids[column['bucket_index']]
+        return super(AgedPartnerBalanceXslx, self)._get_cell_value(
+            my_object, column, field_name)
 
     def _get_report_filters(self, report):
         return [
@@ -237,7 +181,8 @@ class AgedPartnerBalanceXslx(models.AbstractModel):
                 if col_pos == col_pos_footer_label:
                     value = label
                 else:
-                    value = getattr(account, column[field_name])
+                    value = self._get_cell_value(account, column,
+                                                 field_name)
                 cell_type = column.get('type', 'string')
                 if cell_type == 'string' or col_pos == col_pos_footer_label:
                     self.sheet.write_string(self.row_pos, col_pos, value or '',
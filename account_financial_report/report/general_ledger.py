@@ -2,8 +2,27 @@
 # © 2016 Julien Coux (Camptocamp)
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from dateutil.relativedelta import relativedelta
+
 from odoo import models, fields, api, _
 
+# Number of rows fetched at once from the server-side cursor
+STREAM_BATCH_SIZE = 2000
+
+# Number of lines rendered at once by the HTML view
+HTML_LINES_PAGE_SIZE = 200
+
+# Length of the periods summed by the centralized lines
+CENTRALIZATION_INTERVALS = {
+    'day': '1 day',
+    'week': '1 week',
+    'month': '1 month',
+    'quarter': '3 months',
+}
+
 
 class GeneralLedgerReport(models.TransientModel):
     """ Here, we just define class fields.
@@ -37,6 +56,24 @@ class GeneralLedgerReport(models.TransientModel):
         comodel_name='account.analytic.account'
     )
     centralize = fields.Boolean()
+    centralization_period = fields.Selection(
+        selection='_get_centralization_periods',
+        default='month',
+    )
+    stream_move_lines = fields.Boolean(
+        help="Don't store the not centralized move lines, they are read "
+             "from the journal items when the report is exported."
+    )
+    parallel_workers = fields.Integer(
+        default=lambda self: int(
+            self.env['ir.config_parameter'].sudo().get_param(
+                'account_financial_report.general_ledger_parallel_workers',
+                default=0
+            )
+        ),
+        help="Number of database connections used to compute the account "
+             "and partner amounts. The computation is serial below 2."
+    )
 
     # Flag fields, used for report display
     show_cost_center = fields.Boolean(
@@ -51,6 +88,11 @@ class GeneralLedgerReport(models.TransientModel):
         inverse_name='report_id'
     )
 
+    @api.model
+    def _get_centralization_periods(self):
+        return self.env[
+            'general.ledger.report.wizard']._get_centralization_periods()
+
     # Compute of unaffected earnings account
     @api.depends('company_id')
     def _compute_unaffected_earnings_account(self):
@@ -156,7 +198,8 @@ ORDER BY
         THEN 0
         ELSE 1
     END,
-    "report_general_ledger_partner"."name"
+    "report_general_ledger_partner"."name",
+    "report_general_ledger_partner"."id"
         """
 
 
@@ -230,18 +273,58 @@ class GeneralLedgerReportCompute(models.TransientModel):
     def get_html(self, given_context=None):
         return self._get_html()
 
+    @api.multi
+    def get_html_lines(self, report_account_id, report_partner_id=False,
+                       last_line_id=0, limit=HTML_LINES_PAGE_SIZE):
+        """ Render the lines of an account, or of a partner of an account,
+        following the line `last_line_id`.
+
+        The HTML view only renders the account and partner headers and
+        fetches their lines page by page with this method.
+        """
+        self.ensure_one()
+        domain = [('id', '>', last_line_id)]
+        if report_partner_id:
+            domain += [
+                ('report_partner_id', '=', report_partner_id),
+                ('report_partner_id.report_account_id.report_id', '=',
+                 self.id),
+            ]
+        else:
+            domain += [
+                ('report_account_id', '=', report_account_id),
+                ('report_account_id.report_id', '=', self.id),
+            ]
+        lines = self.env['report_general_ledger_move_line'].search(
+            domain, order='id', limit=limit + 1)
+        page = lines[:limit]
+        html = self.env.ref(
+            'account_financial_report.report_general_ledger_lines_page'
+        ).render({
+            'o': self,
+            'lines': page,
+            'show_cost_center': self.show_cost_center,
+            'foreign_currency': self.foreign_currency,
+        })
+        return {
+            'html': html,
+            'last_line_id': page[-1:].id,
+            'has_more': len(lines) > limit,
+        }
+
     @api.multi
     def compute_data_for_report(self,
                                 with_line_details=True,
                                 with_partners=True):
         self.ensure_one()
+        job = self.env['account.financial.report.job']
         # Compute report data
+        job._report_progress(_('General Ledger: accounts'))
         self._inject_account_values()
 
         if with_partners:
+            job._report_progress(_('General Ledger: partners'))
             self._inject_partner_values()
-            if not self.filter_partner_ids:
-                self._inject_partner_values(only_empty_partner=True)
 
         # Add unaffected earnings account
         if (not self.filter_account_ids or
@@ -249,127 +332,349 @@ class GeneralLedgerReportCompute(models.TransientModel):
                 self.filter_account_ids.ids):
             self._inject_unaffected_earnings_account_values()
 
+        job._report_progress(_('General Ledger: move lines'))
+        # In streaming mode, the not centralized lines are read
+        # by `_stream_move_lines` when the report is exported
+        stream_lines = with_line_details and self.stream_move_lines
+
         # Call this function even if we don't want line details because,
         # we need to compute
         # at least the values for unaffected earnings account
         # In this case, only unaffected earnings account values are computed
         only_unaffected_earnings_account = not with_line_details
-        self._inject_line_not_centralized_values(
-            only_unaffected_earnings_account=only_unaffected_earnings_account
-        )
-
-        if with_line_details:
-            self._inject_line_not_centralized_values(
-                is_account_line=False,
-                is_partner_line=True)
-
+        if not stream_lines:
             self._inject_line_not_centralized_values(
-                is_account_line=False,
-                is_partner_line=True,
-                only_empty_partner_line=True)
+                only_unaffected_earnings_account=(
+                    only_unaffected_earnings_account)
+            )
 
-            if self.centralize:
-                self._inject_line_centralized_values()
+        if with_line_details and self.centralize:
+            self._inject_line_centralized_values()
 
         # Refresh cache because all data are computed with SQL requests
         self.invalidate_cache()
 
-    def _get_account_sub_subquery_sum_amounts(
-            self, include_initial_balance, date_included):
-        """ Return subquery used to compute sum amounts on accounts """
-        sub_subquery_sum_amounts = """
+    def _use_parallel_workers(self):
+        """ Return True if the amounts are computed by shards of accounts,
+        each shard on its own database connection.
+        """
+        return self.parallel_workers > 1
+
+    def _split_shards(self, items):
+        """ Split the sorted `items` in at most `parallel_workers`
+        contiguous shards, so the concatenation of the shards results
+        keeps the order.
+        """
+        if not items:
+            return []
+        size = -(-len(items) // self.parallel_workers)
+        return [items[i:i + size] for i in range(0, len(items), size)]
+
+    def _fetch_sharded_rows(self, query, params, shards_params):
+        """ Execute the query once per shard, with the shard params added
+        to `params`, and return the rows of all the shards in the shards
+        order.
+
+        The shards are executed on a pool of `parallel_workers` cursors,
+        whose transactions import the snapshot of the current transaction.
+        They don't see the changes the current transaction didn't commit
+        yet, so if it changed the ledger, the shards are executed one after
+        the other on the current cursor instead. So they are in test mode,
+        where all the cursors share the test transaction.
+        """
+        if not shards_params:
+            return []
+        if self.pool.in_test_mode() or \
+                self.env['account.ledger.change']._has_pending_changes():
+            return self._fetch_sharded_rows_serially(
+                query, params, shards_params)
+        return self._fetch_sharded_rows_in_workers(
+            query, params, shards_params)
+
+    def _fetch_sharded_rows_serially(self, query, params, shards_params):
+        rows = []
+        for shard_params in shards_params:
+            self.env.cr.execute(query, dict(params, **shard_params))
+            rows += self.env.cr.fetchall()
+        return rows
+
+    def _fetch_sharded_rows_in_workers(self, query, params, shards_params):
+        self.env.cr.execute("SELECT pg_export_snapshot()")
+        snapshot = self.env.cr.fetchone()[0]
+
+        def fetch(shard_params):
+            with self.pool.cursor() as cr:
+                cr.execute("SET TRANSACTION SNAPSHOT %s", (snapshot,))
+                cr.execute(query, dict(params, **shard_params))
+                return cr.fetchall()
+
+        with ThreadPoolExecutor(self.parallel_workers) as executor:
+            return [row
+                    for rows in executor.map(fetch, shards_params)
+                    for row in rows]
+
+    def _insert_rows(self, table, columns, rows):
+        """ Insert the rows fetched by the workers, in their order, with
+        COPY.
+        """
+        self.env['account.financial.report.storage']._copy_rows(
+            table, columns, rows)
+
+    def _use_period_balance(self):
+        """ Return True if the sum amounts can be computed from the monthly
+        balance snapshot (account.period.balance).
+
+        The snapshot doesn't keep the analytic account,
+        so it can't be used with a cost center filter.
+        """
+        return not self.filter_cost_center_ids
+
+    def _get_period_balance_cutoff_date(self):
+        """ Return the date from which journal items are read directly.
+
+        The cutoff is the first day of the month of the fiscal year start
+        (or of the date from, if earlier): all the snapshot rows used are
+        dated before the fiscal year start and the date from, so the initial
+        balances and the P&L accounts balances stay exact.
+        """
+        date = min(d for d in (self.date_from, self.fy_start_date) if d)
+        return fields.Date.to_string(
+            fields.Date.from_string(date).replace(day=1)
+        )
+
+    def _get_period_move_lines_query(self, sharded=False):
+        """ Return the query used as move lines source when the snapshot is
+        used: the snapshot rows of the closed months and the journal items
+        of the remaining period, until the date to.
+
+        It is a subquery of the FROM clause, not a common table expression,
+        so the conditions of the joins on the move lines (account, partner)
+        are pushed down into both parts of the union. The accounts of the
+        filter, and of the `shard_account_ids` param if `sharded`, are also
+        selected explicitly.
+
+        Its params are those of `_get_sum_amounts_query_params`.
+        """
+        query = """
             SELECT
-                a.id AS account_id,
-                SUM(ml.debit) AS debit,
-                SUM(ml.credit) AS credit,
-                SUM(ml.balance) AS balance,
-                c.id AS currency_id,
-                CASE
-                    WHEN c.id IS NOT NULL
-                    THEN SUM(ml.amount_currency)
-                    ELSE NULL
-                END AS balance_currency
+                pb.account_id,
+                pb.partner_id,
+                pb.date,
+                pb.debit,
+                pb.credit,
+                pb.balance,
+                pb.amount_currency
+            FROM
+                account_period_balance pb
+            WHERE
+                pb.company_id = %(company_id)s
+            AND pb.date < %(period_cutoff_date)s
+        """
+        if self.only_posted_moves:
+            query += """
+            AND pb.posted = TRUE
+            """
+        if self.filter_account_ids:
+            query += """
+            AND pb.account_id IN %(account_ids)s
+            """
+        if sharded:
+            query += """
+            AND pb.account_id = ANY(%(shard_account_ids)s)
+            """
+        query += """
+            UNION ALL
+            SELECT
+                ml.account_id,
+                ml.partner_id,
+                ml.date,
+                ml.debit,
+                ml.credit,
+                ml.balance,
+                ml.amount_currency
             FROM
-                accounts a
-            INNER JOIN
-                account_account_type at ON a.user_type_id = at.id
-            INNER JOIN
                 account_move_line ml
-                    ON a.id = ml.account_id
         """
-
-        if date_included:
-            sub_subquery_sum_amounts += """
-                AND ml.date <= %s
+        if self.only_posted_moves:
+            query += """
+            INNER JOIN
+                account_move m ON ml.move_id = m.id AND m.state = 'posted'
             """
-        else:
-            sub_subquery_sum_amounts += """
-                AND ml.date < %s
+        query += """
+            WHERE
+                ml.company_id = %(company_id)s
+            AND ml.date >= %(period_cutoff_date)s
+            AND ml.date <= %(date_to)s
+        """
+        if self.filter_account_ids:
+            query += """
+            AND ml.account_id IN %(account_ids)s
             """
-
-        if not include_initial_balance:
-            sub_subquery_sum_amounts += """
-                AND at.include_initial_balance != TRUE AND ml.date >= %s
+        if sharded:
+            query += """
+            AND ml.account_id = ANY(%(shard_account_ids)s)
+            """
+        return query
+
+    def _get_sum_amounts_query_params(self):
+        """ Return the named params shared by the sum amounts queries. """
+        params = {
+            'report_id': self.id,
+            'user_id': self.env.uid,
+            'company_id': self.company_id.id,
+            'date_from': self.date_from,
+            'date_to': self.date_to,
+            'fy_start_date': self.fy_start_date,
+        }
+        if self._use_period_balance():
+            params['period_cutoff_date'] = \
+                self._get_period_balance_cutoff_date()
+        if self.filter_account_ids:
+            params['account_ids'] = tuple(self.filter_account_ids.ids)
+        if self.filter_partner_ids:
+            params['partner_ids'] = tuple(self.filter_partner_ids.ids)
+        if self.filter_cost_center_ids:
+            params['cost_center_ids'] = tuple(self.filter_cost_center_ids.ids)
+        return params
+
+    def _get_sum_amounts_move_lines_join(self, sharded=False):
+        """ Return the join of the move lines (or of the snapshot source)
+        on the account `a` of type `at`, used to compute both initial and
+        final sum amounts in one scan.
+
+        Only the move lines used by one of the sums are kept:
+        until the date to, and since the fiscal year start date
+        for accounts without initial balance. If `sharded`, only the ones
+        of the `shard_account_ids` param.
+        """
+        if self._use_period_balance():
+            query = """
+            INNER JOIN
+                (""" + self._get_period_move_lines_query(sharded) + """) ml
             """
         else:
-            sub_subquery_sum_amounts += """
-                AND at.include_initial_balance = TRUE
+            query = """
+            INNER JOIN
+                account_move_line ml
             """
-
-        if self.only_posted_moves:
-            sub_subquery_sum_amounts += """
-        INNER JOIN
-            account_move m ON ml.move_id = m.id AND m.state = 'posted'
+        query += """
+                    ON a.id = ml.account_id
+                    AND ml.date <= %(date_to)s
+                    AND (
+                        at.include_initial_balance = TRUE
+                        OR at.include_initial_balance != TRUE
+                        AND ml.date >= %(fy_start_date)s
+                    )
+        """
+        if sharded and not self._use_period_balance():
+            query += """
+                    AND ml.account_id = ANY(%(shard_account_ids)s)
+            """
+        if self.only_posted_moves and not self._use_period_balance():
+            query += """
+            INNER JOIN
+                account_move m ON ml.move_id = m.id AND m.state = 'posted'
             """
         if self.filter_cost_center_ids:
-            sub_subquery_sum_amounts += """
-        INNER JOIN
-            account_analytic_account aa
-                ON
-                    ml.analytic_account_id = aa.id
-                    AND aa.id IN %s
+            query += """
+            INNER JOIN
+                account_analytic_account aa
+                    ON
+                        ml.analytic_account_id = aa.id
+                        AND aa.id IN %(cost_center_ids)s
             """
-        sub_subquery_sum_amounts += """
-        LEFT JOIN
-            res_currency c ON a.currency_id = c.id
+        return query
+
+    def _get_sum_amounts_columns(self):
+        """ Return the conditional aggregates computing initial and final
+        debit, credit, balance and foreign currency balance together.
         """
-        sub_subquery_sum_amounts += """
-        GROUP BY
-            a.id, c.id
+        return """
+                SUM(ml.debit) FILTER (
+                    WHERE ml.date < %(date_from)s
+                ) AS initial_debit,
+                SUM(ml.credit) FILTER (
+                    WHERE ml.date < %(date_from)s
+                ) AS initial_credit,
+                SUM(ml.balance) FILTER (
+                    WHERE ml.date < %(date_from)s
+                ) AS initial_balance,
+                CASE
+                    WHEN c.id IS NOT NULL
+                    THEN SUM(ml.amount_currency) FILTER (
+                        WHERE ml.date < %(date_from)s
+                    )
+                    ELSE NULL
+                END AS initial_balance_currency,
+                SUM(ml.debit) AS final_debit,
+                SUM(ml.credit) AS final_credit,
+                SUM(ml.balance) AS final_balance,
+                CASE
+                    WHEN c.id IS NOT NULL
+                    THEN SUM(ml.amount_currency)
+                    ELSE NULL
+                END AS final_balance_currency
         """
-        return sub_subquery_sum_amounts
 
-    def _get_final_account_sub_subquery_sum_amounts(self, date_included):
-        """ Return final subquery used to compute sum amounts on accounts """
-        subquery_sum_amounts = """
-            SELECT
-                sub.account_id AS account_id,
-                SUM(COALESCE(sub.debit, 0.0)) AS debit,
-                SUM(COALESCE(sub.credit, 0.0)) AS credit,
-                SUM(COALESCE(sub.balance, 0.0)) AS balance,
-                MAX(sub.currency_id) AS currency_id,
-                SUM(COALESCE(sub.balance_currency, 0.0)) AS balance_currency
-            FROM
-            (
-        """
-        subquery_sum_amounts += self._get_account_sub_subquery_sum_amounts(
-            include_initial_balance=False, date_included=date_included
-        )
-        subquery_sum_amounts += """
-                UNION
+    def _get_sum_amounts_not_null_condition(self):
+        """ Return the condition used to keep only lines with amounts. """
+        query = """
+WHERE
+    (
+        s.initial_debit IS NOT NULL AND s.initial_debit != 0
+        OR s.initial_credit IS NOT NULL AND s.initial_credit != 0
+        OR s.initial_balance IS NOT NULL AND s.initial_balance != 0
+        OR s.final_debit IS NOT NULL AND s.final_debit != 0
+        OR s.final_credit IS NOT NULL AND s.final_credit != 0
+        OR s.final_balance IS NOT NULL AND s.final_balance != 0
+    )
         """
-        subquery_sum_amounts += self._get_account_sub_subquery_sum_amounts(
-            include_initial_balance=True, date_included=date_included
-        )
-        subquery_sum_amounts += """
-            ) sub
-            GROUP BY
-                sub.account_id
+        if self.hide_account_balance_at_0:
+            query += """
+AND
+    s.final_balance IS NOT NULL AND s.final_balance != 0
+            """
+        return query
+
+    def _get_inject_account_columns(self):
+        return [
+            'report_id',
+            'create_uid',
+            'create_date',
+            'account_id',
+            'code',
+            'name',
+            'initial_debit',
+            'initial_credit',
+            'initial_balance',
+            'currency_id',
+            'initial_balance_foreign_currency',
+            'final_debit',
+            'final_credit',
+            'final_balance',
+            'final_balance_foreign_currency',
+            'is_partner_account',
+        ]
+
+    def _get_inject_account_insert_query(self):
+        return """
+INSERT INTO
+    report_general_ledger_account
+    (
+    """ + ',\n    '.join(self._get_inject_account_columns()) + """
+    )
         """
-        return subquery_sum_amounts
 
-    def _inject_account_values(self):
-        """Inject report values for report_general_ledger_account."""
+    def _get_account_values_query(self, sharded=False):
+        """ Return the query (and its params) selecting
+        report_general_ledger_account values.
+
+        Initial and final amounts are computed with conditional aggregates,
+        so the move lines are read once.
+
+        If `sharded`, the accounts are restricted to the
+        `shard_account_ids` param and the rows are sorted by account.
+        """
         query_inject_account = """
 WITH
     accounts AS
@@ -401,541 +706,335 @@ WITH
                 account_analytic_account aa
                     ON
                         ml.analytic_account_id = aa.id
-                        AND aa.id IN %s
+                        AND aa.id IN %(cost_center_ids)s
             """
         query_inject_account += """
             WHERE
-                a.company_id = %s
-            AND a.id != %s
+                a.company_id = %(company_id)s
+            AND a.id != %(unaffected_earnings_account_id)s
                     """
         if self.filter_account_ids:
             query_inject_account += """
             AND
-                a.id IN %s
+                a.id IN %(account_ids)s
+            """
+        if sharded:
+            query_inject_account += """
+            AND
+                a.id = ANY(%(shard_account_ids)s)
             """
         if self.filter_partner_ids:
             query_inject_account += """
             AND
-                p.id IN %s
+                p.id IN %(partner_ids)s
             """
         if self.filter_partner_ids or self.filter_cost_center_ids:
             query_inject_account += """
             GROUP BY
                 a.id
             """
-
-        init_subquery = self._get_final_account_sub_subquery_sum_amounts(
-            date_included=False
-        )
-        final_subquery = self._get_final_account_sub_subquery_sum_amounts(
-            date_included=True
-        )
-
         query_inject_account += """
-        ),
-    initial_sum_amounts AS ( """ + init_subquery + """ ),
-    final_sum_amounts AS ( """ + final_subquery + """ )
-INSERT INTO
-    report_general_ledger_account
-    (
-    report_id,
-    create_uid,
-    create_date,
-    account_id,
-    code,
-    name,
-    initial_debit,
-    initial_credit,
-    initial_balance,
-    currency_id,
-    initial_balance_foreign_currency,
-    final_debit,
-    final_credit,
-    final_balance,
-    final_balance_foreign_currency,
-    is_partner_account
-    )
+        ),"""
+        query_inject_account += """
+    sum_amounts AS
+        (
+            SELECT
+                a.id AS account_id,
+        """
+        query_inject_account += self._get_sum_amounts_columns()
+        query_inject_account += """
+            FROM
+                accounts a
+            INNER JOIN
+                account_account_type at ON a.user_type_id = at.id
+        """
+        query_inject_account += self._get_sum_amounts_move_lines_join(
+            sharded)
+        query_inject_account += """
+            LEFT JOIN
+                res_currency c ON a.currency_id = c.id
+            GROUP BY
+                a.id, c.id
+        )
 SELECT
-    %s AS report_id,
-    %s AS create_uid,
+    %(report_id)s AS report_id,
+    %(user_id)s AS create_uid,
     NOW() AS create_date,
     a.id AS account_id,
     a.code,
     a.name,
-    COALESCE(i.debit, 0.0) AS initial_debit,
-    COALESCE(i.credit, 0.0) AS initial_credit,
-    COALESCE(i.balance, 0.0) AS initial_balance,
+    COALESCE(s.initial_debit, 0.0) AS initial_debit,
+    COALESCE(s.initial_credit, 0.0) AS initial_credit,
+    COALESCE(s.initial_balance, 0.0) AS initial_balance,
     c.id AS currency_id,
-    COALESCE(i.balance_currency, 0.0) AS initial_balance_foreign_currency,
-    COALESCE(f.debit, 0.0) AS final_debit,
-    COALESCE(f.credit, 0.0) AS final_credit,
-    COALESCE(f.balance, 0.0) AS final_balance,
-    COALESCE(f.balance_currency, 0.0) AS final_balance_foreign_currency,
+    COALESCE(s.initial_balance_currency, 0.0)
+        AS initial_balance_foreign_currency,
+    COALESCE(s.final_debit, 0.0) AS final_debit,
+    COALESCE(s.final_credit, 0.0) AS final_credit,
+    COALESCE(s.final_balance, 0.0) AS final_balance,
+    COALESCE(s.final_balance_currency, 0.0)
+        AS final_balance_foreign_currency,
     a.is_partner_account
 FROM
     accounts a
-LEFT JOIN
-    initial_sum_amounts i ON a.id = i.account_id
-LEFT JOIN
-    final_sum_amounts f ON a.id = f.account_id
+INNER JOIN
+    sum_amounts s ON a.id = s.account_id
 LEFT JOIN
     res_currency c ON c.id = a.currency_id
-WHERE
+        """
+        query_inject_account += self._get_sum_amounts_not_null_condition()
+        if sharded:
+            query_inject_account += """
+ORDER BY
+    a.id
+            """
+        query_inject_account_params = self._get_sum_amounts_query_params()
+        query_inject_account_params['unaffected_earnings_account_id'] = \
+            self.unaffected_earnings_account.id
+        return query_inject_account, query_inject_account_params
+
+    def _get_inject_account_query(self):
+        """ Return the query (and its params) injecting
+        report_general_ledger_account values.
+        """
+        query_inject_account, query_inject_account_params = \
+            self._get_account_values_query()
+        query_inject_account = \
+            self._get_inject_account_insert_query() + query_inject_account
+        return query_inject_account, query_inject_account_params
+
+    def _inject_account_values(self):
+        """Inject report values for report_general_ledger_account."""
+        if self._use_parallel_workers():
+            account_ids = self.env['account.account'].search(
+                [('company_id', '=', self.company_id.id)], order='id'
+            ).ids
+            query, params = self._get_account_values_query(sharded=True)
+            rows = self._fetch_sharded_rows(query, params, [
+                {'shard_account_ids': shard}
+                for shard in self._split_shards(account_ids)
+            ])
+            self._insert_rows('report_general_ledger_account',
+                              self._get_inject_account_columns(), rows)
+        else:
+            query_inject_account, query_inject_account_params = \
+                self._get_inject_account_query()
+            self.env.cr.execute(
+                query_inject_account, query_inject_account_params)
+
+    def _get_inject_partner_columns(self):
+        return [
+            'report_account_id',
+            'create_uid',
+            'create_date',
+            'partner_id',
+            'name',
+            'initial_debit',
+            'initial_credit',
+            'initial_balance',
+            'currency_id',
+            'initial_balance_foreign_currency',
+            'final_debit',
+            'final_credit',
+            'final_balance',
+            'final_balance_foreign_currency',
+        ]
+
+    def _get_inject_partner_insert_query(self):
+        return """
+INSERT INTO
+    report_general_ledger_partner
     (
-        i.debit IS NOT NULL AND i.debit != 0
-        OR i.credit IS NOT NULL AND i.credit != 0
-        OR i.balance IS NOT NULL AND i.balance != 0
-        OR f.debit IS NOT NULL AND f.debit != 0
-        OR f.credit IS NOT NULL AND f.credit != 0
-        OR f.balance IS NOT NULL AND f.balance != 0
+    """ + ',\n    '.join(self._get_inject_partner_columns()) + """
     )
         """
-        if self.hide_account_balance_at_0:
-            query_inject_account += """
-AND
-    f.balance IS NOT NULL AND f.balance != 0
+
+    def _get_partner_values_query(self, sharded=False):
+        """ Return the query (and its params) selecting
+        report_general_ledger_partner values.
+
+        Only for "partner" accounts (payable and receivable).
+
+        The partners are the groups of the move lines aggregation, the move
+        lines without partner being grouped under a NULL partner, and
+        initial and final amounts are computed with conditional aggregates,
+        so the move lines are read once.
+
+        If `sharded`, the report accounts are not read from
+        report_general_ledger_account but from the `shard_report_account_ids`
+        and `shard_account_ids` params, and the rows are sorted.
+        """
+        # pylint: disable=sql-injection
+        query_inject_partner = """
+WITH"""
+        query_inject_partner += """
+    sum_amounts AS
+        (
+            SELECT
+                ra.id AS report_account_id,
+                ml.partner_id AS partner_id,
+                c.id AS currency_id,
+        """
+        query_inject_partner += self._get_sum_amounts_columns()
+        query_inject_partner += """
+            FROM
+        """
+        if sharded:
+            query_inject_partner += """
+                UNNEST(
+                    %(shard_report_account_ids)s, %(shard_account_ids)s
+                ) AS ra (id, account_id)
             """
-        query_inject_account_params = ()
-        if self.filter_cost_center_ids:
-            query_inject_account_params += (
-                tuple(self.filter_cost_center_ids.ids),
-            )
-        query_inject_account_params += (
-            self.company_id.id,
-            self.unaffected_earnings_account.id,
-        )
-        if self.filter_account_ids:
-            query_inject_account_params += (
-                tuple(self.filter_account_ids.ids),
-            )
+        else:
+            query_inject_partner += """
+                report_general_ledger_account ra
+            """
+        query_inject_partner += """
+            INNER JOIN
+                account_account a ON ra.account_id = a.id
+            INNER JOIN
+                account_account_type at ON a.user_type_id = at.id
+        """
+        query_inject_partner += self._get_sum_amounts_move_lines_join(
+            sharded)
+        query_inject_partner += """
+            LEFT JOIN
+                res_currency c ON a.currency_id = c.id
+        """
+        conditions = []
+        if not sharded:
+            conditions += [
+                "ra.report_id = %(report_id)s",
+                "ra.is_partner_account = TRUE",
+            ]
+        if self.centralize:
+            conditions.append(
+                "(a.centralized IS NULL OR a.centralized != TRUE)")
         if self.filter_partner_ids:
-            query_inject_account_params += (
-                tuple(self.filter_partner_ids.ids),
-            )
-        query_inject_account_params += (
-            self.date_from,
-            self.fy_start_date,
-        )
-        if self.filter_cost_center_ids:
-            query_inject_account_params += (
-                tuple(self.filter_cost_center_ids.ids),
-            )
-        query_inject_account_params += (
-            self.date_from,
+            # The move lines without partner are filtered out as well
+            conditions.append("ml.partner_id IN %(partner_ids)s")
+        if conditions:
+            query_inject_partner += """
+            WHERE
+                """ + """
+            AND
+                """.join(conditions)
+        query_inject_partner += """
+            GROUP BY
+                ra.id,
+                ml.partner_id,
+                c.id
         )
-        if self.filter_cost_center_ids:
-            query_inject_account_params += (
-                tuple(self.filter_cost_center_ids.ids),
-            )
-        query_inject_account_params += (
-            self.date_to,
-            self.fy_start_date,
-        )
-        if self.filter_cost_center_ids:
-            query_inject_account_params += (
-                tuple(self.filter_cost_center_ids.ids),
-            )
-        query_inject_account_params += (
-            self.date_to,
-        )
-        if self.filter_cost_center_ids:
-            query_inject_account_params += (
-                tuple(self.filter_cost_center_ids.ids),
-            )
-        query_inject_account_params += (
-            self.id,
-            self.env.uid,
-        )
-        self.env.cr.execute(query_inject_account, query_inject_account_params)
-
-    def _get_partner_sub_subquery_sum_amounts(
-            self, only_empty_partner, include_initial_balance, date_included
-    ):
-        """ Return subquery used to compute sum amounts on partners """
-        sub_subquery_sum_amounts = """
-            SELECT
-                ap.account_id AS account_id,
-                ap.partner_id AS partner_id,
-                SUM(ml.debit) AS debit,
-                SUM(ml.credit) AS credit,
-                SUM(ml.balance) AS balance,
-                c.id as currency_id,
-                CASE
-                    WHEN c.id IS NOT NULL
-                    THEN SUM(ml.amount_currency)
-                    ELSE NULL
-                END AS balance_currency
-            FROM
-                accounts_partners ap
-            INNER JOIN account_account ac
-                ON ac.id = ap.account_id
-            LEFT JOIN
-                res_currency c ON ac.currency_id = c.id
-            INNER JOIN
-                account_move_line ml
-                    ON ap.account_id = ml.account_id
-            """
-        if date_included:
-            sub_subquery_sum_amounts += """
-                    AND ml.date <= %s
-            """
-        else:
-            sub_subquery_sum_amounts += """
-                    AND ml.date < %s
-            """
-        if not only_empty_partner:
-            sub_subquery_sum_amounts += """
-                    AND ap.partner_id = ml.partner_id
-            """
-        else:
-            sub_subquery_sum_amounts += """
-                    AND ap.partner_id IS NULL AND ml.partner_id IS NULL
-            """
-        if not include_initial_balance:
-            sub_subquery_sum_amounts += """
-                    AND ap.include_initial_balance != TRUE AND ml.date >= %s
-            """
-        else:
-            sub_subquery_sum_amounts += """
-                    AND ap.include_initial_balance = TRUE
-            """
-        if self.only_posted_moves:
-            sub_subquery_sum_amounts += """
-            INNER JOIN
-                account_move m ON ml.move_id = m.id AND m.state = 'posted'
-            """
-        if self.filter_cost_center_ids:
-            sub_subquery_sum_amounts += """
-        INNER JOIN
-            account_analytic_account aa
-                ON
-                    ml.analytic_account_id = aa.id
-                    AND aa.id IN %s
-            """
-        sub_subquery_sum_amounts += """
-            GROUP BY
-                ap.account_id, ap.partner_id, c.id
-        """
-        return sub_subquery_sum_amounts
-
-    def _get_final_partner_sub_subquery_sum_amounts(self, only_empty_partner,
-                                                    date_included):
-        """Return final subquery used to compute sum amounts on partners"""
-
-        subquery_sum_amounts = """
-
-            SELECT
-                sub.account_id AS account_id,
-                sub.partner_id AS partner_id,
-                SUM(COALESCE(sub.debit, 0.0)) AS debit,
-                SUM(COALESCE(sub.credit, 0.0)) AS credit,
-                SUM(COALESCE(sub.balance, 0.0)) AS balance,
-                MAX(sub.currency_id) AS currency_id,
-                SUM(COALESCE(sub.balance_currency, 0.0)) AS balance_currency
-            FROM
-            (
-        """
-        subquery_sum_amounts += self._get_partner_sub_subquery_sum_amounts(
-            only_empty_partner,
-            include_initial_balance=False,
-            date_included=date_included
-        )
-        subquery_sum_amounts += """
-            UNION
-        """
-        subquery_sum_amounts += self._get_partner_sub_subquery_sum_amounts(
-            only_empty_partner,
-            include_initial_balance=True,
-            date_included=date_included
-        )
-        subquery_sum_amounts += """
-            ) sub
-            GROUP BY
-                sub.account_id, sub.partner_id
-        """
-        return subquery_sum_amounts
-
-    def _inject_partner_values(self, only_empty_partner=False):
-        """ Inject report values for report_general_ledger_partner.
-
-        Only for "partner" accounts (payable and receivable).
-        """
-        # pylint: disable=sql-injection
-        query_inject_partner = """
-WITH
-    accounts_partners AS
-        (
-            SELECT
-                ra.id AS report_account_id,
-                a.id AS account_id,
-                at.include_initial_balance AS include_initial_balance,
-                p.id AS partner_id,
-                COALESCE(
-                    CASE
-                        WHEN
-                            NULLIF(p.name, '') IS NOT NULL
-                            AND NULLIF(p.ref, '') IS NOT NULL
-                        THEN p.name || ' (' || p.ref || ')'
-                        ELSE p.name
-                    END,
-                    '""" + _('No partner allocated') + """'
-                ) AS partner_name
-            FROM
-                report_general_ledger_account ra
-            INNER JOIN
-                account_account a ON ra.account_id = a.id
-            INNER JOIN
-                account_account_type at ON a.user_type_id = at.id
-            INNER JOIN
-                account_move_line ml ON a.id = ml.account_id
-            LEFT JOIN
-                res_partner p ON ml.partner_id = p.id
-                    """
-        if self.filter_cost_center_ids:
-            query_inject_partner += """
-            INNER JOIN
-                account_analytic_account aa
-                    ON
-                        ml.analytic_account_id = aa.id
-                        AND aa.id IN %s
-            """
-        query_inject_partner += """
-            WHERE
-                ra.report_id = %s
-            AND
-                ra.is_partner_account = TRUE
-        """
-        if not only_empty_partner:
-            query_inject_partner += """
-            AND
-                p.id IS NOT NULL
-            """
-        else:
-            query_inject_partner += """
-            AND
-                p.id IS NULL
-            """
-        query_inject_partner += """
-                        """
-        if self.centralize:
-            query_inject_partner += """
-            AND (a.centralized IS NULL OR a.centralized != TRUE)
-            """
-        if self.filter_partner_ids:
-            query_inject_partner += """
-            AND
-                p.id IN %s
-            """
-
-        init_subquery = self._get_final_partner_sub_subquery_sum_amounts(
-            only_empty_partner,
-            date_included=False
-        )
-        final_subquery = self._get_final_partner_sub_subquery_sum_amounts(
-            only_empty_partner,
-            date_included=True
-        )
-
-        query_inject_partner += """
-            GROUP BY
-                ra.id,
-                a.id,
-                p.id,
-                at.include_initial_balance
-        ),
-    initial_sum_amounts AS ( """ + init_subquery + """ ),
-    final_sum_amounts AS ( """ + final_subquery + """ )
-INSERT INTO
-    report_general_ledger_partner
-    (
-    report_account_id,
-    create_uid,
-    create_date,
-    partner_id,
-    name,
-    initial_debit,
-    initial_credit,
-    initial_balance,
-    currency_id,
-    initial_balance_foreign_currency,
-    final_debit,
-    final_credit,
-    final_balance,
-    final_balance_foreign_currency
-    )
 SELECT
-    ap.report_account_id,
-    %s AS create_uid,
+    s.report_account_id,
+    %(user_id)s AS create_uid,
     NOW() AS create_date,
-    ap.partner_id,
-    ap.partner_name,
-    COALESCE(i.debit, 0.0) AS initial_debit,
-    COALESCE(i.credit, 0.0) AS initial_credit,
-    COALESCE(i.balance, 0.0) AS initial_balance,
-    i.currency_id AS currency_id,
-    COALESCE(i.balance_currency, 0.0) AS initial_balance_foreign_currency,
-    COALESCE(f.debit, 0.0) AS final_debit,
-    COALESCE(f.credit, 0.0) AS final_credit,
-    COALESCE(f.balance, 0.0) AS final_balance,
-    COALESCE(f.balance_currency, 0.0) AS final_balance_foreign_currency
+    s.partner_id,
+    COALESCE(
+        CASE
+            WHEN
+                NULLIF(p.name, '') IS NOT NULL
+                AND NULLIF(p.ref, '') IS NOT NULL
+            THEN p.name || ' (' || p.ref || ')'
+            ELSE p.name
+        END,
+        %(no_partner_name)s
+    ) AS partner_name,
+    COALESCE(s.initial_debit, 0.0) AS initial_debit,
+    COALESCE(s.initial_credit, 0.0) AS initial_credit,
+    COALESCE(s.initial_balance, 0.0) AS initial_balance,
+    s.currency_id AS currency_id,
+    COALESCE(s.initial_balance_currency, 0.0)
+        AS initial_balance_foreign_currency,
+    COALESCE(s.final_debit, 0.0) AS final_debit,
+    COALESCE(s.final_credit, 0.0) AS final_credit,
+    COALESCE(s.final_balance, 0.0) AS final_balance,
+    COALESCE(s.final_balance_currency, 0.0)
+        AS final_balance_foreign_currency
 FROM
-    accounts_partners ap
+    sum_amounts s
 LEFT JOIN
-    initial_sum_amounts i
-        ON
-            (
+    res_partner p ON s.partner_id = p.id
         """
-        if not only_empty_partner:
-            query_inject_partner += """
-                ap.partner_id = i.partner_id
-            """
-        else:
+        query_inject_partner += self._get_sum_amounts_not_null_condition()
+        if sharded:
             query_inject_partner += """
-                ap.partner_id IS NULL AND i.partner_id IS NULL
+ORDER BY
+    s.report_account_id,
+    s.partner_id
             """
-        query_inject_partner += """
-            )
-            AND ap.account_id = i.account_id
-LEFT JOIN
-    final_sum_amounts f
-        ON
-            (
+        query_inject_partner_params = self._get_sum_amounts_query_params()
+        query_inject_partner_params['no_partner_name'] = \
+            _('No partner allocated')
+        return query_inject_partner, query_inject_partner_params
+
+    def _get_inject_partner_query(self):
+        """ Return the query (and its params) injecting
+        report_general_ledger_partner values.
         """
-        if not only_empty_partner:
-            query_inject_partner += """
-                ap.partner_id = f.partner_id
-            """
+        query_inject_partner, query_inject_partner_params = \
+            self._get_partner_values_query()
+        query_inject_partner = \
+            self._get_inject_partner_insert_query() + query_inject_partner
+        return query_inject_partner, query_inject_partner_params
+
+    def _inject_partner_values(self):
+        """ Inject report values for report_general_ledger_partner.
+
+        Only for "partner" accounts (payable and receivable).
+        """
+        if self._use_parallel_workers():
+            self.env.cr.execute("""
+                SELECT id, account_id
+                FROM report_general_ledger_account
+                WHERE report_id = %s AND is_partner_account = TRUE
+                ORDER BY id
+            """, (self.id,))
+            report_accounts = self.env.cr.fetchall()
+            query, params = self._get_partner_values_query(sharded=True)
+            rows = self._fetch_sharded_rows(query, params, [
+                {
+                    'shard_report_account_ids': [ra[0] for ra in shard],
+                    'shard_account_ids': [ra[1] for ra in shard],
+                }
+                for shard in self._split_shards(report_accounts)
+            ])
+            self._insert_rows('report_general_ledger_partner',
+                              self._get_inject_partner_columns(), rows)
         else:
-            query_inject_partner += """
-                ap.partner_id IS NULL AND f.partner_id IS NULL
-            """
-        query_inject_partner += """
-            )
-            AND ap.account_id = f.account_id
-WHERE
-    (
-        i.debit IS NOT NULL AND i.debit != 0
-        OR i.credit IS NOT NULL AND i.credit != 0
-        OR i.balance IS NOT NULL AND i.balance != 0
-        OR f.debit IS NOT NULL AND f.debit != 0
-        OR f.credit IS NOT NULL AND f.credit != 0
-        OR f.balance IS NOT NULL AND f.balance != 0
-    )
+            query_inject_partner, query_inject_partner_params = \
+                self._get_inject_partner_query()
+            self.env.cr.execute(
+                query_inject_partner, query_inject_partner_params)
+
+    def _get_move_line_taxes_query(self):
+        """ Return the WITH clause describing the taxes of the journal items
+        of the report, used by `_get_move_line_joins_query`, and its
+        parameters.
         """
-        if self.hide_account_balance_at_0:
-            query_inject_partner += """
-AND
-    f.balance IS NOT NULL AND f.balance != 0
-            """
-        query_inject_partner_params = ()
-        if self.filter_cost_center_ids:
-            query_inject_partner_params += (
-                tuple(self.filter_cost_center_ids.ids),
-            )
-        query_inject_partner_params += (
-            self.id,
-        )
-        if self.filter_partner_ids:
-            query_inject_partner_params += (
-                tuple(self.filter_partner_ids.ids),
-            )
-        query_inject_partner_params += (
-            self.date_from,
-            self.fy_start_date,
+        query = "WITH" + self.env[
+            'account.move.line']._get_taxes_description_query("""
+        tml.account_id IN (
+            SELECT account_id
+            FROM report_general_ledger_account
+            WHERE report_id = %s
         )
-        if self.filter_cost_center_ids:
-            query_inject_partner_params += (
-                tuple(self.filter_cost_center_ids.ids),
-            )
-        query_inject_partner_params += (
+        AND tml.date BETWEEN %s AND %s
+            """)
+        params = (
+            self.id,
             self.date_from,
-        )
-        if self.filter_cost_center_ids:
-            query_inject_partner_params += (
-                tuple(self.filter_cost_center_ids.ids),
-            )
-        query_inject_partner_params += (
-            self.date_to,
-            self.fy_start_date,
-        )
-        if self.filter_cost_center_ids:
-            query_inject_partner_params += (
-                tuple(self.filter_cost_center_ids.ids),
-            )
-        query_inject_partner_params += (
             self.date_to,
         )
-        if self.filter_cost_center_ids:
-            query_inject_partner_params += (
-                tuple(self.filter_cost_center_ids.ids),
-            )
-        query_inject_partner_params += (
-            self.env.uid,
-        )
-        self.env.cr.execute(query_inject_partner, query_inject_partner_params)
+        return query, params
 
-    def _inject_line_not_centralized_values(
-            self,
-            is_account_line=True,
-            is_partner_line=False,
-            only_empty_partner_line=False,
-            only_unaffected_earnings_account=False):
-        """ Inject report values for report_general_ledger_move_line.
+    def _get_move_line_columns_query(self):
+        """ Return the journal item columns displayed on a report line.
 
-        If centralized option have been chosen,
-        only non centralized accounts are computed.
-
-        In function of `is_account_line` and `is_partner_line` values,
-        the move_line link is made either with account or either with partner.
-
-        The "only_empty_partner_line" value is used
-        to compute data without partner.
+        Shared by the injected lines and the streamed lines, the query uses
+        the aliases of `_get_move_line_joins_query`.
         """
-        query_inject_move_line = """
-INSERT INTO
-    report_general_ledger_move_line
-    (
-        """
-        if is_account_line:
-            query_inject_move_line += """
-    report_account_id,
-            """
-        elif is_partner_line:
-            query_inject_move_line += """
-    report_partner_id,
-            """
-        query_inject_move_line += """
-    create_uid,
-    create_date,
-    move_line_id,
-    date,
-    entry,
-    journal,
-    account,
-    taxes_description,
-    partner,
-    label,
-    cost_center,
-    matching_number,
-    debit,
-    credit,
-    cumul_balance,
-    currency_id,
-    amount_currency
-    )
-SELECT
-        """
-        if is_account_line:
-            query_inject_move_line += """
-    ra.id AS report_account_id,
-            """
-        elif is_partner_line:
-            query_inject_move_line += """
-    rp.id AS report_partner_id,
-            """
-        query_inject_move_line += """
-    %s AS create_uid,
-    NOW() AS create_date,
+        return """
     ml.id AS move_line_id,
     ml.date,
     m.name AS entry,
@@ -943,89 +1042,30 @@ SELECT
     a.code AS account,
     CASE
         WHEN
-            ml.tax_line_id is not null
+            ml.tax_line_id IS NOT NULL
         THEN
             COALESCE(at.description, at.name)
-        WHEN
-            ml.tax_line_id is null
-        THEN
-            (SELECT
-                array_to_string(
-                    array_agg(COALESCE(at.description, at.name)
-                ), ', ')
-            FROM
-                account_move_line_account_tax_rel aml_at_rel
-            LEFT JOIN
-                account_tax at on (at.id = aml_at_rel.account_tax_id)
-            WHERE
-                aml_at_rel.account_move_line_id = ml.id)
         ELSE
-            ''
-    END as taxes_description,
-        """
-        if not only_empty_partner_line:
-            query_inject_move_line += """
-    CASE
-        WHEN
-            NULLIF(p.name, '') IS NOT NULL
-            AND NULLIF(p.ref, '') IS NOT NULL
-        THEN p.name || ' (' || p.ref || ')'
-        ELSE p.name
-    END AS partner,
-            """
-        elif only_empty_partner_line:
-            query_inject_move_line += """
-    '""" + _('No partner allocated') + """' AS partner,
-            """
-        query_inject_move_line += """
+            td.description
+    END AS taxes_description,
     CONCAT_WS(' - ', NULLIF(ml.ref, ''), NULLIF(ml.name, '')) AS label,
     aa.name AS cost_center,
     fr.name AS matching_number,
     ml.debit,
     ml.credit,
-        """
-        if is_account_line:
-            query_inject_move_line += """
-    ra.initial_balance + (
-        SUM(ml.balance)
-        OVER (PARTITION BY a.code
-              ORDER BY a.code, ml.date, ml.id)
-    ) AS cumul_balance,
-            """
-        elif is_partner_line and not only_empty_partner_line:
-            query_inject_move_line += """
-    rp.initial_balance + (
-        SUM(ml.balance)
-        OVER (PARTITION BY a.code, p.name
-              ORDER BY a.code, p.name, ml.date, ml.id)
-    ) AS cumul_balance,
-            """
-        elif is_partner_line and only_empty_partner_line:
-            query_inject_move_line += """
-    rp.initial_balance + (
-        SUM(ml.balance)
-        OVER (PARTITION BY a.code
-              ORDER BY a.code, ml.date, ml.id)
-    ) AS cumul_balance,
-            """
-        query_inject_move_line += """
     c.id AS currency_id,
     ml.amount_currency
-FROM
         """
-        if is_account_line:
-            query_inject_move_line += """
-    report_general_ledger_account ra
-            """
-        elif is_partner_line:
-            query_inject_move_line += """
-    report_general_ledger_partner rp
-INNER JOIN
-    report_general_ledger_account ra ON rp.report_account_id = ra.id
-            """
-        query_inject_move_line += """
-INNER JOIN
-    account_move_line ml ON ra.account_id = ml.account_id
+
+    def _get_move_line_joins_query(self):
+        """ Return the joins needed by `_get_move_line_columns_query`.
+
+        The query must start with the WITH clause of
+        `_get_move_line_taxes_query`. When the report is filtered on cost
+        centers, the query expects the cost center ids as positional
+        parameter.
+        """
+        query = """
 INNER JOIN
     account_move m ON ml.move_id = m.id
 INNER JOIN
@@ -1034,26 +1074,17 @@ INNER JOIN
     account_account a ON ml.account_id = a.id
 LEFT JOIN
     account_tax at ON ml.tax_line_id = at.id
-        """
-        if is_account_line:
-            query_inject_move_line += """
 LEFT JOIN
-    res_partner p ON ml.partner_id = p.id
-            """
-        elif is_partner_line and not only_empty_partner_line:
-            query_inject_move_line += """
-INNER JOIN
-    res_partner p
-        ON ml.partner_id = p.id AND rp.partner_id = p.id
-            """
-        query_inject_move_line += """
+    line_taxes lt ON ml.id = lt.move_line_id
+LEFT JOIN
+    taxes_descriptions td ON lt.tax_ids = td.tax_ids
 LEFT JOIN
     account_full_reconcile fr ON ml.full_reconcile_id = fr.id
 LEFT JOIN
     res_currency c ON ml.currency_id = c.id
-                    """
+        """
         if self.filter_cost_center_ids:
-            query_inject_move_line += """
+            query += """
 INNER JOIN
     account_analytic_account aa
         ON
@@ -1061,140 +1092,386 @@ INNER JOIN
             AND aa.id IN %s
             """
         else:
-            query_inject_move_line += """
+            query += """
 LEFT JOIN
     account_analytic_account aa ON ml.analytic_account_id = aa.id
             """
-        query_inject_move_line += """
+        return query
+
+    def _get_move_line_partner_query(self):
+        """ Return the partner column of a report line, using the aliases of
+        `_get_move_lines_query`.
+
+        The query expects the label of the lines without partner as
+        positional parameter.
+        """
+        return """
+    CASE
+        WHEN
+            rp.id IS NOT NULL AND rp.partner_id IS NULL
+        THEN %s
+        WHEN
+            NULLIF(p.name, '') IS NOT NULL
+            AND NULLIF(p.ref, '') IS NOT NULL
+        THEN p.name || ' (' || p.ref || ')'
+        ELSE p.name
+    END AS partner
+        """
+
+    def _get_move_lines_query(self, only_unaffected_earnings_account=False):
+        """ Return the FROM, WHERE and ORDER BY clauses (and their params)
+        selecting the not centralized move lines of the report.
+
+        The lines of the "partner" accounts are joined to the report partner
+        of their partner, or to the one without partner, and the lines of the
+        other accounts to their report account only, so all the lines are
+        read in a single pass.
+
+        The rows are sorted like `account_ids` then `partner_ids`, so each
+        account or partner section of the report is a contiguous block.
+        """
+        query = """
+FROM
+    report_general_ledger_account ra
+INNER JOIN
+    account_move_line ml ON ra.account_id = ml.account_id
+        """
+        query += self._get_move_line_joins_query()
+        query += """
+LEFT JOIN
+    res_partner p ON ml.partner_id = p.id
+LEFT JOIN
+    report_general_ledger_partner rp
+        ON
+            rp.report_account_id = ra.id
+            AND COALESCE(rp.partner_id, 0) = COALESCE(ml.partner_id, 0)
 WHERE
     ra.report_id = %s
 AND
+    (
+        ra.is_partner_account IS NULL
+        OR ra.is_partner_account != TRUE
+        OR rp.id IS NOT NULL
+    )
         """
         if only_unaffected_earnings_account:
-            query_inject_move_line += """
-    a.id = %s
+            query += """
 AND
-            """
-        if is_account_line:
-            query_inject_move_line += """
-    (ra.is_partner_account IS NULL OR ra.is_partner_account != TRUE)
-            """
-        elif is_partner_line:
-            query_inject_move_line += """
-    ra.is_partner_account = TRUE
+    a.id = %s
             """
         if self.centralize:
-            query_inject_move_line += """
+            query += """
 AND
     (a.centralized IS NULL OR a.centralized != TRUE)
             """
-        query_inject_move_line += """
+        query += """
 AND
     ml.date BETWEEN %s AND %s
         """
         if self.only_posted_moves:
-            query_inject_move_line += """
+            query += """
 AND
     m.state = 'posted'
         """
-        if only_empty_partner_line:
-            query_inject_move_line += """
-AND
-    ml.partner_id IS NULL
-AND
-    rp.partner_id IS NULL
-        """
-        if is_account_line:
-            query_inject_move_line += """
+        query += """
 ORDER BY
-    a.code, ml.date, ml.id
-            """
-        elif is_partner_line and not only_empty_partner_line:
-            query_inject_move_line += """
-ORDER BY
-    a.code, p.name, ml.date, ml.id
-            """
-        elif is_partner_line and only_empty_partner_line:
-            query_inject_move_line += """
-ORDER BY
-    a.code, ml.date, ml.id
-            """
-
-        query_inject_move_line_params = (
-            self.env.uid,
-        )
+    ra.code,
+    CASE
+        WHEN rp.partner_id IS NOT NULL
+        THEN 0
+        ELSE 1
+    END,
+    rp.name,
+    rp.id,
+    ml.date,
+    ml.id
+        """
+        params = ()
         if self.filter_cost_center_ids:
-            query_inject_move_line_params += (
+            params += (
                 tuple(self.filter_cost_center_ids.ids),
             )
-        query_inject_move_line_params += (
+        params += (
             self.id,
         )
         if only_unaffected_earnings_account:
-            query_inject_move_line_params += (
+            params += (
                 self.unaffected_earnings_account.id,
             )
-        query_inject_move_line_params += (
+        params += (
             self.date_from,
             self.date_to,
         )
+        return query, params
+
+    def _get_inject_move_line_query(
+            self, only_unaffected_earnings_account=False):
+        """ Return the query (and its params) injecting
+        report_general_ledger_move_line values.
+
+        The lines of the "partner" accounts are linked to their report
+        partner, the other ones to their report account.
+        """
+        query_inject_move_line, query_inject_move_line_params = \
+            self._get_move_line_taxes_query()
+        query_inject_move_line += """
+INSERT INTO
+    report_general_ledger_move_line
+    (
+    report_account_id,
+    report_partner_id,
+    create_uid,
+    create_date,
+    move_line_id,
+    date,
+    entry,
+    journal,
+    account,
+    taxes_description,
+    label,
+    cost_center,
+    matching_number,
+    debit,
+    credit,
+    currency_id,
+    amount_currency,
+    partner,
+    cumul_balance
+    )
+SELECT
+    CASE WHEN rp.id IS NULL THEN ra.id END AS report_account_id,
+    rp.id AS report_partner_id,
+    %s AS create_uid,
+    NOW() AS create_date,
+        """
+        query_inject_move_line += self._get_move_line_columns_query()
+        query_inject_move_line += ","
+        query_inject_move_line += self._get_move_line_partner_query()
+        query_inject_move_line += """,
+    COALESCE(rp.initial_balance, ra.initial_balance) + (
+        SUM(ml.balance)
+        OVER (PARTITION BY ra.id, rp.id
+              ORDER BY ml.date, ml.id)
+    ) AS cumul_balance
+        """
+        query_move_lines, query_move_lines_params = \
+            self._get_move_lines_query(
+                only_unaffected_earnings_account=(
+                    only_unaffected_earnings_account)
+            )
+        query_inject_move_line += query_move_lines
+        query_inject_move_line_params += (
+            self.env.uid,
+            _('No partner allocated'),
+        )
+        query_inject_move_line_params += query_move_lines_params
+        return query_inject_move_line, query_inject_move_line_params
+
+    def _inject_line_not_centralized_values(
+            self, only_unaffected_earnings_account=False):
+        """ Inject report values for report_general_ledger_move_line.
+
+        If centralized option have been chosen,
+        only non centralized accounts are computed.
+        """
+        query_inject_move_line, query_inject_move_line_params = \
+            self._get_inject_move_line_query(
+                only_unaffected_earnings_account=(
+                    only_unaffected_earnings_account)
+            )
         self.env.cr.execute(
             query_inject_move_line,
             query_inject_move_line_params
         )
 
-    def _inject_line_centralized_values(self):
-        """ Inject report values for report_general_ledger_move_line.
+    def _get_stream_move_lines_query(self):
+        """ Return the query selecting the not centralized move lines of
+        the report, in the order they are displayed.
+        """
+        query_stream_move_line, query_stream_move_line_params = \
+            self._get_move_line_taxes_query()
+        query_stream_move_line += """
+SELECT
+    ra.id AS report_account_id,
+    rp.id AS report_partner_id,
+    COALESCE(rp.initial_balance, ra.initial_balance) AS initial_balance,
+    ml.balance,
+        """
+        query_stream_move_line += self._get_move_line_columns_query()
+        query_stream_move_line += ","
+        query_stream_move_line += self._get_move_line_partner_query()
+        query_move_lines, query_move_lines_params = \
+            self._get_move_lines_query()
+        query_stream_move_line += query_move_lines
+        query_stream_move_line_params += (
+            _('No partner allocated'),
+        )
+        query_stream_move_line_params += query_move_lines_params
+        return query_stream_move_line, query_stream_move_line_params
 
-        Only centralized accounts are computed.
+    @api.multi
+    def _stream_move_lines(self, batch_size=STREAM_BATCH_SIZE):
+        """ Yield the not centralized move lines of the report as dicts.
+
+        The lines are read from a server-side cursor by batches of
+        `batch_size` rows, so neither report_general_ledger_move_line nor
+        the Python process hold the whole ledger. The cumulative balance is
+        computed on the fly, from the initial balance of each section.
         """
-        query_inject_move_line_centralized = """
-WITH
-    move_lines AS
-        (
+        self.ensure_one()
+        query, params = self._get_stream_move_lines_query()
+        cursor = self.env.cr._cnx.cursor(
+            'report_general_ledger_stream_%s' % self.id)
+        try:
+            cursor.execute(query, params)
+            section = cumul_balance = None
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                columns = [column[0] for column in cursor.description]
+                for row in rows:
+                    line = dict(zip(columns, row))
+                    key = (line['report_account_id'],
+                           line['report_partner_id'])
+                    if key != section:
+                        section = key
+                        cumul_balance = line['initial_balance'] or 0
+                    cumul_balance += line.pop('balance') or 0
+                    line['cumul_balance'] = cumul_balance
+                    line['date'] = fields.Date.to_string(line['date'])
+                    yield line
+        finally:
+            cursor.close()
+
+    def _use_period_balance_for_centralization(self):
+        """ Return True if the centralized lines can sum the monthly balance
+        snapshot: their periods must be made of whole months.
+        """
+        return self._use_period_balance() and \
+            self.centralization_period in ('month', 'quarter')
+
+    def _get_centralization_period_balance_dates(self):
+        """ Return the first month and the month following the last month
+        fully covered by the report dates, read from the monthly balance
+        snapshot. The journal items outside of them are read directly.
+        """
+        date_from = fields.Date.from_string(self.date_from)
+        if date_from.day != 1:
+            date_from += relativedelta(day=1, months=1)
+        date_to = fields.Date.from_string(self.date_to)
+        date_to = (date_to + timedelta(days=1)).replace(day=1)
+        return fields.Date.to_string(date_from), fields.Date.to_string(date_to)
+
+    def _get_centralized_move_lines_query(self):
+        """ Return the query used as move lines source of the centralized
+        lines: the journal items of the centralized accounts of the report,
+        and the snapshot rows of their whole months when possible.
+        """
+        query = ""
+        if self._use_period_balance_for_centralization():
+            query += """
+            SELECT
+                pb.account_id,
+                pb.date,
+                pb.debit,
+                pb.credit,
+                pb.balance,
+                pb.currency_id
+            FROM
+                account_period_balance pb
+            WHERE
+                pb.company_id = %(company_id)s
+            AND
+                pb.account_id IN %(account_ids)s
+            AND
+                pb.date >= %(period_date_from)s
+            AND
+                pb.date < %(period_date_to)s
+            """
+            if self.only_posted_moves:
+                query += """
+            AND
+                pb.posted = TRUE
+                """
+            query += """
+            UNION ALL
+            """
+        query += """
             SELECT
                 ml.account_id,
-                (
-                    DATE_TRUNC('month', ml.date) + interval '1 month'
-                                                 - interval '1 day'
-                )::date AS date,
-                SUM(ml.debit) AS debit,
-                SUM(ml.credit) AS credit,
-                SUM(ml.balance) AS balance,
-                ml.currency_id AS currency_id
+                ml.date,
+                ml.debit,
+                ml.credit,
+                ml.balance,
+                ml.currency_id
             FROM
-                report_general_ledger_account ra
-            INNER JOIN
-                account_move_line ml ON ra.account_id = ml.account_id
+                account_move_line ml
             INNER JOIN
                 account_move m ON ml.move_id = m.id
-            INNER JOIN
-                account_account a ON ml.account_id = a.id
         """
         if self.filter_cost_center_ids:
-            query_inject_move_line_centralized += """
+            query += """
             INNER JOIN
                 account_analytic_account aa
                     ON
                         ml.analytic_account_id = aa.id
-                        AND aa.id IN %s
+                        AND aa.id IN %(cost_center_ids)s
             """
-        query_inject_move_line_centralized += """
+        query += """
             WHERE
-                ra.report_id = %s
+                ml.account_id IN %(account_ids)s
             AND
-                a.centralized = TRUE
-            AND
-                ml.date BETWEEN %s AND %s
+                ml.date BETWEEN %(date_from)s AND %(date_to)s
         """
+        if self._use_period_balance_for_centralization():
+            query += """
+            AND
+                (
+                    ml.date < %(period_date_from)s
+                    OR ml.date >= %(period_date_to)s
+                )
+            """
         if self.only_posted_moves:
-            query_inject_move_line_centralized += """
+            query += """
             AND
                 m.state = 'posted'
             """
+        return query
+
+    def _inject_line_centralized_values(self):
+        """ Inject report values for report_general_ledger_move_line.
+
+        Only centralized accounts are computed, with one line per account
+        and period (see `centralization_period`), dated at the period end.
+        """
+        accounts = self.account_ids.mapped('account_id').filtered(
+            'centralized')
+        if not accounts:
+            return
+        query_inject_move_line_centralized = """
+WITH
+    move_lines AS
+        (
+            SELECT
+                ml.account_id,
+                (
+                    DATE_TRUNC(%(period)s, ml.date)
+                    + %(period_interval)s::interval - interval '1 day'
+                )::date AS date,
+                SUM(ml.debit) AS debit,
+                SUM(ml.credit) AS credit,
+                SUM(ml.balance) AS balance,
+                ml.currency_id AS currency_id
+            FROM
+                (
+        """
+        query_inject_move_line_centralized += \
+            self._get_centralized_move_lines_query()
         query_inject_move_line_centralized += """
+                ) ml
             GROUP BY
-                ra.id, ml.account_id, a.code, 2, ml.currency_id
+                ml.account_id, 2, ml.currency_id
         )
 INSERT INTO
     report_general_ledger_move_line
@@ -1211,7 +1488,7 @@ INSERT INTO
     )
 SELECT
     ra.id AS report_account_id,
-    %s AS create_uid,
+    %(user_id)s AS create_uid,
     NOW() AS create_date,
     ml.date,
     a.code AS account,
@@ -1231,25 +1508,31 @@ INNER JOIN
 LEFT JOIN
     res_currency c ON ml.currency_id = c.id
 WHERE
-    ra.report_id = %s
+    ra.report_id = %(report_id)s
 AND
     (a.centralized IS NOT NULL AND a.centralized = TRUE)
 ORDER BY
     a.code, ml.date
         """
-
-        query_inject_move_line_centralized_params = ()
+        query_inject_move_line_centralized_params = {
+            'report_id': self.id,
+            'user_id': self.env.uid,
+            'company_id': self.company_id.id,
+            'account_ids': tuple(accounts.ids),
+            'date_from': self.date_from,
+            'date_to': self.date_to,
+            'period': self.centralization_period or 'month',
+            'period_interval': CENTRALIZATION_INTERVALS[
+                self.centralization_period or 'month'],
+        }
+        if self._use_period_balance_for_centralization():
+            query_inject_move_line_centralized_params.update(zip(
+                ('period_date_from', 'period_date_to'),
+                self._get_centralization_period_balance_dates()
+            ))
         if self.filter_cost_center_ids:
-            query_inject_move_line_centralized_params += (
-                tuple(self.filter_cost_center_ids.ids),
-            )
-        query_inject_move_line_centralized_params += (
-            self.id,
-            self.date_from,
-            self.date_to,
-            self.env.uid,
-            self.id,
-        )
+            query_inject_move_line_centralized_params['cost_center_ids'] = \
+                tuple(self.filter_cost_center_ids.ids)
         self.env.cr.execute(
             query_inject_move_line_centralized,
             query_inject_move_line_centralized_params
@@ -1332,9 +1615,11 @@ ORDER BY
                 """
         return sub_subquery_sum_amounts
 
-    def _inject_unaffected_earnings_account_values(self):
-        """Inject the report values of the unaffected earnings account
-        for report_general_ledger_account."""
+    def _get_unaffected_earnings_account_values_query(self):
+        """ Return the query (and its params) selecting the
+        report_general_ledger_account values of the unaffected earnings
+        account, with the columns of `_get_inject_account_insert_query`.
+        """
         subquery_sum_amounts = """
             SELECT
                 SUM(COALESCE(sub.initial_balance, 0.0)) AS initial_balance,
@@ -1358,20 +1643,6 @@ ORDER BY
         query_inject_account = """
         WITH
             sum_amounts AS ( """ + subquery_sum_amounts + """ )
-        INSERT INTO
-            report_general_ledger_account
-            (
-            report_id,
-            create_uid,
-            create_date,
-            account_id,
-            code,
-            name,
-            is_partner_account,
-            initial_balance,
-            final_balance,
-            currency_id
-            )
         SELECT
             %(report_id)s AS report_id,
             %(user_id)s AS create_uid,
@@ -1379,10 +1650,16 @@ ORDER BY
             a.id AS account_id,
             a.code,
             a.name,
-            False AS is_partner_account,
+            NULL AS initial_debit,
+            NULL AS initial_credit,
             COALESCE(i.initial_balance, 0.0) AS initial_balance,
+            c.id as currency_id,
+            NULL AS initial_balance_foreign_currency,
+            NULL AS final_debit,
+            NULL AS final_credit,
             COALESCE(i.final_balance, 0.0) AS final_balance,
-            c.id as currency_id
+            NULL AS final_balance_foreign_currency,
+            False AS is_partner_account
         FROM
             account_account a
         LEFT JOIN
@@ -1418,5 +1695,14 @@ ORDER BY
         pl_account_ids = [r[0] for r in self.env.cr.fetchall()]
         query_inject_account_params['unaffected_earnings_account_ids'] = \
             tuple(pl_account_ids + [self.unaffected_earnings_account.id])
+        return query_inject_account, query_inject_account_params
+
+    def _inject_unaffected_earnings_account_values(self):
+        """Inject the report values of the unaffected earnings account
+        for report_general_ledger_account."""
+        query_inject_account, query_inject_account_params = \
+            self._get_unaffected_earnings_account_values_query()
+        query_inject_account = \
+            self._get_inject_account_insert_query() + query_inject_account
         self.env.cr.execute(query_inject_account,
                             query_inject_account_params)
@@ -4,6 +4,8 @@
 # Copyright 2016 Camptocamp SA
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
+from types import SimpleNamespace
+
 from odoo import _, models
 
 
@@ -97,6 +99,9 @@ class GeneralLedgerXslx(models.AbstractModel):
         return 5
 
     def _generate_report_content(self, workbook, report):
+        if report.stream_move_lines:
+            self.streamed_lines = report._stream_move_lines()
+            self.next_streamed_line = next(self.streamed_lines, None)
         # For each account
         for account in report.account_ids:
             # Write account title
@@ -110,7 +115,7 @@ class GeneralLedgerXslx(models.AbstractModel):
                 self.write_initial_balance(account)
 
                 # Display account move lines
-                for line in account.move_line_ids:
+                for line in self._get_move_lines(report, account):
                     self.write_line(line)
 
             else:
@@ -126,7 +131,8 @@ class GeneralLedgerXslx(models.AbstractModel):
                     self.write_initial_balance(partner)
 
                     # Display account move lines
-                    for line in partner.move_line_ids:
+                    for line in self._get_move_lines(
+                            report, account, partner):
                         self.write_line(line)
 
                     # Display ending balance line for partner
@@ -141,6 +147,30 @@ class GeneralLedgerXslx(models.AbstractModel):
             # 2 lines break
             self.row_pos += 2
 
+    def _get_move_lines(self, report, account, partner=None):
+        """Return the move lines of an account or of a partner section.
+
+        In streaming mode, the lines are consumed from the report stream,
+        which is sorted like the sections, except for the centralized
+        accounts whose lines are stored.
+        """
+        if not report.stream_move_lines or (
+                report.centralize and account.account_id.centralized):
+            return (partner or account).move_line_ids
+        return self._iter_streamed_lines(
+            account.id, partner.id if partner else None)
+
+    def _iter_streamed_lines(self, report_account_id, report_partner_id):
+        currency_model = self.env['res.currency']
+        section = (report_account_id, report_partner_id)
+        while self.next_streamed_line and section == (
+                self.next_streamed_line['report_account_id'],
+                self.next_streamed_line['report_partner_id']):
+            line = SimpleNamespace(**self.next_streamed_line)
+            line.currency_id = currency_model.browse(line.currency_id)
+            yield line
+            self.next_streamed_line = next(self.streamed_lines, None)
+
     def write_initial_balance(self, my_object):
         """Specific function to write initial balance for General Ledger"""
         if 'partner' in my_object._name:
@@ -1,7 +1,7 @@
 # Copyright 2017 ACSONE SA/NV
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
-from odoo import models, fields, api
+from odoo import models, fields, api, _
 
 DIGITS = (16, 2)
 
@@ -78,9 +78,13 @@ class ReportJournalLedger(models.TransientModel):
     @api.multi
     def compute_data_for_report(self):
         self.ensure_one()
+        job = self.env['account.financial.report.job']
+        job._report_progress(_('Journal Ledger: moves'))
         self._inject_journal_values()
         self._inject_move_values()
+        job._report_progress(_('Journal Ledger: move lines'))
         self._inject_move_line_values()
+        job._report_progress(_('Journal Ledger: taxes'))
         self._inject_journal_tax_values()
         self._update_journal_report_total_values()
 
@@ -248,7 +252,15 @@ class ReportJournalLedger(models.TransientModel):
             self.id,
         )
         self.env.cr.execute(sql, params)
-        sql = """
+        sql = "WITH" + self.env[
+            'account.move.line']._get_taxes_description_query("""
+                tml.move_id IN (
+                    SELECT move_id
+                    FROM report_journal_ledger_move
+                    WHERE report_id = %s
+                )
+            """)
+        sql += """
             INSERT INTO report_journal_ledger_move_line (
                 create_uid,
                 create_date,
@@ -303,21 +315,8 @@ class ReportJournalLedger(models.TransientModel):
                       aml.tax_line_id is not null
                 THEN
                     COALESCE(at.description, at.name)
-                WHEN
-                    aml.tax_line_id is null
-                THEN
-                    (SELECT
-                      array_to_string(
-                          array_agg(COALESCE(at.description, at.name)
-                      ), ', ')
-                    FROM
-                        account_move_line_account_tax_rel aml_at_rel
-                    LEFT JOIN
-                        account_tax at on (at.id = aml_at_rel.account_tax_id)
-                    WHERE
-                        aml_at_rel.account_move_line_id = aml.id)
                 ELSE
-                    ''
+                    td.description
                 END as taxes_description,
                 aml.company_id as company_id
             FROM
@@ -334,6 +333,12 @@ class ReportJournalLedger(models.TransientModel):
             LEFT JOIN
                 account_tax at
                     on (at.id = aml.tax_line_id)
+            LEFT JOIN
+                line_taxes lt
+                    on (lt.move_line_id = aml.id)
+            LEFT JOIN
+                taxes_descriptions td
+                    on (td.tax_ids = lt.tax_ids)
             LEFT JOIN
                 res_currency currency
                     on (currency.id = aml.currency_id)
@@ -341,6 +346,7 @@ class ReportJournalLedger(models.TransientModel):
                 rjqm.report_id = %s
         """
         params = (
+            self.id,
             self.env.uid,
             self.id,
         )
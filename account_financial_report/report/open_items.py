@@ -177,333 +177,290 @@ class OpenItemsReportCompute(models.TransientModel):
     @api.multi
     def compute_data_for_report(self):
         self.ensure_one()
+        job = self.env['account.financial.report.job']
         # Compute report data
-        self._inject_account_values()
-        self._inject_partner_values()
-        self._inject_line_values()
-        self._inject_line_values(only_empty_partner_line=True)
-        self._clean_partners_and_accounts()
-        self._compute_partners_and_accounts_cumul()
-        if self.hide_account_balance_at_0:
-            self._clean_partners_and_accounts(
-                only_delete_account_balance_at_0=True
-            )
+        job._report_progress(_('Open Items: move lines'))
+        self._inject_open_items_values()
         # Refresh cache because all data are computed with SQL requests
         self.invalidate_cache()
 
-    def _inject_account_values(self):
-        """Inject report values for report_open_items_account."""
-        query_inject_account = """
-WITH
-    accounts AS
-        (
+    def _get_open_move_lines_query(self):
+        """ Return the query of the ids of the journal items of the company
+        that can be open at the date at, and its params.
+
+        They are the journal items open now, read from their residual
+        amount maintained by the reconciliations, and the ones reconciled
+        after the date at, read from the reconciliation timeline: the
+        history of the reconciled journal items isn't read, and an open
+        items report at today's date only reads the open ones.
+        """
+        query = """
             SELECT
-                a.id,
-                a.code,
-                a.name,
-                a.user_type_id,
-                c.id as currency_id
+                ml.id
             FROM
-                account_account a
-            INNER JOIN
-                account_move_line ml ON a.id = ml.account_id AND ml.date <= %s
-            LEFT JOIN
-                res_currency c ON a.currency_id = c.id
-            """
-        if self.filter_partner_ids:
-            query_inject_account += """
-            INNER JOIN
-                res_partner p ON ml.partner_id = p.id
-            """
-        if self.only_posted_moves:
-            query_inject_account += """
+                account_move_line ml
             INNER JOIN
-                account_move m ON ml.move_id = m.id AND m.state = 'posted'
-            """
-        query_inject_account += """
+                account_account a ON ml.account_id = a.id
             WHERE
-                a.company_id = %s
+                a.company_id = %(company_id)s
             AND a.reconcile IS true
-            """
-        if self.filter_account_ids:
-            query_inject_account += """
-            AND
-                a.id IN %s
-            """
-        if self.filter_partner_ids:
-            query_inject_account += """
-            AND
-                p.id IN %s
-            """
-        query_inject_account += """
-            GROUP BY
-                a.id, c.id
-        )
-INSERT INTO
-    report_open_items_account
-    (
-    report_id,
-    create_uid,
-    create_date,
-    account_id,
-    currency_id,
-    code,
-    name
-    )
-SELECT
-    %s AS report_id,
-    %s AS create_uid,
-    NOW() AS create_date,
-    a.id AS account_id,
-    a.currency_id,
-    a.code,
-    a.name
-FROM
-    accounts a
+            AND ml.amount_residual != 0
+            AND ml.date <= %(date_at)s
         """
-        query_inject_account_params = (
-            self.date_at,
-            self.company_id.id,
-        )
-        if self.filter_account_ids:
-            query_inject_account_params += (
-                tuple(self.filter_account_ids.ids),
-            )
         if self.filter_partner_ids:
-            query_inject_account_params += (
-                tuple(self.filter_partner_ids.ids),
-            )
-        query_inject_account_params += (
-            self.id,
-            self.env.uid,
-        )
-        self.env.cr.execute(query_inject_account, query_inject_account_params)
-
-    def _inject_partner_values(self):
-        """ Inject report values for report_open_items_partner. """
-        # pylint: disable=sql-injection
-        query_inject_partner = """
-WITH
-    accounts_partners AS
-        (
+            query += """
+            AND ml.partner_id IN %(partner_ids)s
+            """
+        query += """
+            UNION
             SELECT
-                ra.id AS report_account_id,
-                a.id AS account_id,
-                at.include_initial_balance AS include_initial_balance,
-                p.id AS partner_id,
-                COALESCE(
-                    CASE
-                        WHEN
-                            NULLIF(p.name, '') IS NOT NULL
-                            AND NULLIF(p.ref, '') IS NOT NULL
-                        THEN p.name || ' (' || p.ref || ')'
-                        ELSE p.name
-                    END,
-                    '""" + _('No partner allocated') + """'
-                ) AS partner_name
+                rt.move_line_id
             FROM
-                report_open_items_account ra
+                account_reconcile_timeline rt
             INNER JOIN
-                account_account a ON ra.account_id = a.id
+                account_move_line ml ON rt.move_line_id = ml.id
             INNER JOIN
-                account_account_type at ON a.user_type_id = at.id
-            INNER JOIN
-                account_move_line ml ON a.id = ml.account_id AND ml.date <= %s
-        """
-        if self.only_posted_moves:
-            query_inject_partner += """
-            INNER JOIN
-                account_move m ON ml.move_id = m.id AND m.state = 'posted'
-            """
-        query_inject_partner += """
-            LEFT JOIN
-                res_partner p ON ml.partner_id = p.id
+                account_account a ON ml.account_id = a.id
             WHERE
-                ra.report_id = %s
-                        """
+                rt.date > %(date_at)s
+            AND a.company_id = %(company_id)s
+            AND a.reconcile IS true
+            AND ml.date <= %(date_at)s
+        """
         if self.filter_partner_ids:
-            query_inject_partner += """
-            AND
-                p.id IN %s
+            query += """
+            AND ml.partner_id IN %(partner_ids)s
             """
-        query_inject_partner += """
-            GROUP BY
-                ra.id,
-                a.id,
-                p.id,
-                at.include_initial_balance
-        )
-INSERT INTO
-    report_open_items_partner
-    (
-    report_account_id,
-    create_uid,
-    create_date,
-    partner_id,
-    name
-    )
-SELECT
-    ap.report_account_id,
-    %s AS create_uid,
-    NOW() AS create_date,
-    ap.partner_id,
-    ap.partner_name
-FROM
-    accounts_partners ap
-        """
-        query_inject_partner_params = (
-            self.date_at,
-            self.id,
-        )
+        params = {
+            'company_id': self.company_id.id,
+            'date_at': self.date_at,
+        }
         if self.filter_partner_ids:
-            query_inject_partner_params += (
-                tuple(self.filter_partner_ids.ids),
-            )
-        query_inject_partner_params += (
-            self.env.uid,
-        )
-        self.env.cr.execute(query_inject_partner, query_inject_partner_params)
+            params['partner_ids'] = tuple(self.filter_partner_ids.ids)
+        return query, params
 
-    def _get_line_sub_query_move_lines(self,
-                                       only_empty_partner_line=False,
-                                       positive_balance=True):
-        """ Return subquery used to compute sum amounts on lines """
-        sub_query = """
+    def _get_open_items_move_lines_query(self):
+        """ Return the query of the journal items open at the date at, with
+        their residual amounts computed from the amounts reconciled until
+        the date at.
+        """
+        query = """
             SELECT
                 ml.id,
+                ml.account_id,
+                ml.partner_id,
                 ml.balance,
-                SUM(
-                    CASE
-                        WHEN ml_past.id IS NOT NULL
-                        THEN pr.amount
-                        ELSE NULL
-                    END
-                ) AS partial_amount,
                 ml.amount_currency,
-                SUM(
-                    CASE
-                        WHEN ml_past.id IS NOT NULL
-                        THEN pr.amount_currency
-                        ELSE NULL
-                    END
-                ) AS partial_amount_currency,
-                ml.currency_id
+                ml.currency_id,
+                CASE
+                    WHEN ml.balance > 0
+                    THEN ml.balance - COALESCE(ml_reconciled.amount, 0)
+                    ELSE ml.balance + COALESCE(ml_reconciled.amount, 0)
+                END AS amount_residual,
+                CASE
+                    WHEN ml.amount_currency > 0
+                    THEN ml.amount_currency
+                        - COALESCE(ml_reconciled.amount_currency, 0)
+                    ELSE ml.amount_currency
+                        + COALESCE(ml_reconciled.amount_currency, 0)
+                END AS amount_residual_currency
             FROM
-                report_open_items_partner rp
+                open_move_lines oml
             INNER JOIN
-                report_open_items_account ra
-                    ON rp.report_account_id = ra.id
-            INNER JOIN
-                account_move_line ml
-                    ON ra.account_id = ml.account_id
+                account_move_line ml ON oml.id = ml.id
         """
-        if not only_empty_partner_line:
-            sub_query += """
-                    AND rp.partner_id = ml.partner_id
-            """
-        elif only_empty_partner_line:
-            sub_query += """
-                    AND ml.partner_id IS NULL
-            """
-        if not positive_balance:
-            sub_query += """
-            LEFT JOIN
-                account_partial_reconcile pr
-                    ON ml.balance < 0 AND pr.credit_move_id = ml.id
-            LEFT JOIN
-                account_move_line ml_future
-                    ON ml.balance < 0 AND pr.debit_move_id = ml_future.id
-                    AND ml_future.date > %s
-            LEFT JOIN
-                account_move_line ml_past
-                    ON ml.balance < 0 AND pr.debit_move_id = ml_past.id
-                    AND ml_past.date <= %s
+        if self.only_posted_moves:
+            query += """
+            INNER JOIN
+                account_move m ON ml.move_id = m.id AND m.state = 'posted'
             """
-        else:
-            sub_query += """
-            LEFT JOIN
-                account_partial_reconcile pr
-                    ON ml.balance > 0 AND pr.debit_move_id = ml.id
-            LEFT JOIN
-                account_move_line ml_future
-                    ON ml.balance > 0 AND pr.credit_move_id = ml_future.id
-                    AND ml_future.date > %s
-            LEFT JOIN
-                account_move_line ml_past
-                    ON ml.balance > 0 AND pr.credit_move_id = ml_past.id
-                    AND ml_past.date <= %s
-        """
-        sub_query += """
+        query += self.env[
+            'account.reconcile.timeline']._get_reconciled_amounts_query(
+            'ml', '%(date_at)s')
+        conditions = []
+        if self.filter_account_ids:
+            conditions.append("ml.account_id IN %(account_ids)s")
+        if self.filter_partner_ids:
+            conditions.append("ml.partner_id IN %(partner_ids)s")
+        if conditions:
+            query += """
             WHERE
-                ra.report_id = %s
-            GROUP BY
-                ml.id,
-                ml.balance,
-                ml.amount_currency
-            HAVING
-                (
-                    ml.full_reconcile_id IS NULL
-                    OR MAX(ml_future.id) IS NOT NULL
-                )
-        """
-        return sub_query
+                """ + """
+            AND
+                """.join(conditions)
+        return query
 
-    def _inject_line_values(self, only_empty_partner_line=False):
-        """ Inject report values for report_open_items_move_line.
+    def _inject_open_items_values(self):
+        """ Inject report values for report_open_items_account,
+        report_open_items_partner and report_open_items_move_line.
 
-        The "only_empty_partner_line" value is used
-        to compute data without partner.
+        The accounts and partners are derived from the open journal items,
+        with their cumulative amounts, so only the ones having open items
+        (and a balance, with "hide_account_balance_at_0") are inserted.
         """
-        query_inject_move_line = """
+        query_open_move_lines, query_inject_params = \
+            self._get_open_move_lines_query()
+        query_inject = """
 WITH
-    move_lines_amount AS
+    open_move_lines AS
         (
-        """
-        query_inject_move_line += self._get_line_sub_query_move_lines(
-            only_empty_partner_line=only_empty_partner_line,
-            positive_balance=True
-        )
-        query_inject_move_line += """
-            UNION
-        """
-        query_inject_move_line += self._get_line_sub_query_move_lines(
-            only_empty_partner_line=only_empty_partner_line,
-            positive_balance=False
-        )
-        query_inject_move_line += """
+        """ + query_open_move_lines + """
+        ),
+    residual_move_lines AS
+        (
+        """ + self._get_open_items_move_lines_query() + """
         ),
     move_lines AS
         (
             SELECT
-                id,
+                *
+            FROM
+                residual_move_lines
+            WHERE
+                amount_residual != 0
+        ),
+    partners AS
+        (
+            SELECT
+                ml.account_id,
+                ml.partner_id,
+                SUM(ml.amount_residual) AS final_amount_residual,
+                SUM(ml.balance) AS final_amount_total_due,
                 CASE
-                    WHEN SUM(partial_amount) > 0
-                    THEN
-                        CASE
-                            WHEN balance > 0
-                            THEN balance - SUM(partial_amount)
-                            ELSE balance + SUM(partial_amount)
-                        END
-                    ELSE balance
-                END AS amount_residual,
+                    WHEN a.currency_id IS NOT NULL
+                    THEN MAX(ml.currency_id)
+                END AS currency_id,
+                CASE
+                    WHEN a.currency_id IS NOT NULL
+                    THEN SUM(ml.amount_residual_currency)
+                END AS final_amount_residual_currency,
                 CASE
-                    WHEN SUM(partial_amount_currency) > 0
-                    THEN
-                        CASE
-                            WHEN amount_currency > 0
-                            THEN amount_currency - SUM(partial_amount_currency)
-                            ELSE amount_currency + SUM(partial_amount_currency)
-                        END
-                    ELSE amount_currency
-                END AS amount_residual_currency,
-                currency_id
+                    WHEN a.currency_id IS NOT NULL
+                    THEN SUM(ml.amount_currency)
+                END AS final_amount_total_due_currency
             FROM
-                move_lines_amount
+                move_lines ml
+            INNER JOIN
+                account_account a ON ml.account_id = a.id
             GROUP BY
+                ml.account_id,
+                ml.partner_id,
+                a.currency_id
+        ),
+    accounts AS
+        (
+            SELECT
+                account_id,
+                SUM(final_amount_residual) AS final_amount_residual,
+                SUM(final_amount_total_due) AS final_amount_total_due,
+                SUM(final_amount_residual_currency)
+                    AS final_amount_residual_currency,
+                SUM(final_amount_total_due_currency)
+                    AS final_amount_total_due_currency
+            FROM
+                partners
+            GROUP BY
+                account_id
+        ),
+    report_accounts AS
+        (
+            INSERT INTO
+                report_open_items_account
+                (
+                report_id,
+                create_uid,
+                create_date,
+                account_id,
+                currency_id,
+                code,
+                name,
+                final_amount_residual,
+                final_amount_total_due,
+                final_amount_residual_currency,
+                final_amount_total_due_currency
+                )
+            SELECT
+                %(report_id)s AS report_id,
+                %(user_id)s AS create_uid,
+                NOW() AS create_date,
+                a.id AS account_id,
+                a.currency_id,
+                a.code,
+                a.name,
+                ac.final_amount_residual,
+                ac.final_amount_total_due,
+                ac.final_amount_residual_currency,
+                ac.final_amount_total_due_currency
+            FROM
+                accounts ac
+            INNER JOIN
+                account_account a ON ac.account_id = a.id
+        """
+        if self.hide_account_balance_at_0:
+            query_inject += """
+            WHERE
+                ac.final_amount_residual != 0
+            """
+        query_inject += """
+            ORDER BY
+                a.code
+            RETURNING
+                id,
+                account_id
+        ),
+    report_partners AS
+        (
+            INSERT INTO
+                report_open_items_partner
+                (
+                report_account_id,
+                create_uid,
+                create_date,
+                partner_id,
+                name,
+                currency_id,
+                final_amount_residual,
+                final_amount_total_due,
+                final_amount_residual_currency,
+                final_amount_total_due_currency
+                )
+            SELECT
+                ra.id AS report_account_id,
+                %(user_id)s AS create_uid,
+                NOW() AS create_date,
+                pa.partner_id,
+                COALESCE(
+                    CASE
+                        WHEN
+                            NULLIF(p.name, '') IS NOT NULL
+                            AND NULLIF(p.ref, '') IS NOT NULL
+                        THEN p.name || ' (' || p.ref || ')'
+                        ELSE p.name
+                    END,
+                    %(no_partner_name)s
+                ) AS name,
+                pa.currency_id,
+                pa.final_amount_residual,
+                pa.final_amount_total_due,
+                pa.final_amount_residual_currency,
+                pa.final_amount_total_due_currency
+            FROM
+                partners pa
+            INNER JOIN
+                report_accounts ra ON pa.account_id = ra.account_id
+            LEFT JOIN
+                res_partner p ON pa.partner_id = p.id
+        """
+        if self.hide_account_balance_at_0:
+            query_inject += """
+            WHERE
+                pa.final_amount_residual != 0
+            """
+        query_inject += """
+            RETURNING
                 id,
-                balance,
-                amount_currency,
-                currency_id
+                report_account_id,
+                partner_id
         )
 INSERT INTO
     report_open_items_move_line
@@ -527,390 +484,160 @@ INSERT INTO
     )
 SELECT
     rp.id AS report_partner_id,
-    %s AS create_uid,
+    %(user_id)s AS create_uid,
     NOW() AS create_date,
-    ml.id AS move_line_id,
-    ml.date,
-    ml.date_maturity,
+    aml.id AS move_line_id,
+    aml.date,
+    aml.date_maturity,
     m.name AS entry,
     j.code AS journal,
     a.code AS account,
-        """
-        if not only_empty_partner_line:
-            query_inject_move_line += """
-    CASE
-        WHEN
-            NULLIF(p.name, '') IS NOT NULL
-            AND NULLIF(p.ref, '') IS NOT NULL
-        THEN p.name || ' (' || p.ref || ')'
-        ELSE p.name
-    END AS partner,
-            """
-        elif only_empty_partner_line:
-            query_inject_move_line += """
-    '""" + _('No partner allocated') + """' AS partner,
-            """
-        query_inject_move_line += """
-    CONCAT_WS(' - ', NULLIF(ml.ref, ''), NULLIF(ml.name, '')) AS label,
+    COALESCE(
+        CASE
+            WHEN
+                NULLIF(p.name, '') IS NOT NULL
+                AND NULLIF(p.ref, '') IS NOT NULL
+            THEN p.name || ' (' || p.ref || ')'
+            ELSE p.name
+        END,
+        %(no_partner_name)s
+    ) AS partner,
+    CONCAT_WS(' - ', NULLIF(aml.ref, ''), NULLIF(aml.name, '')) AS label,
     ml.balance,
-    ml2.amount_residual,
-    c.id AS currency_id,
+    ml.amount_residual,
+    ml.currency_id,
     ml.amount_currency,
-    ml2.amount_residual_currency
+    ml.amount_residual_currency
 FROM
-    report_open_items_partner rp
+    move_lines ml
 INNER JOIN
-    report_open_items_account ra ON rp.report_account_id = ra.id
+    report_accounts ra ON ml.account_id = ra.account_id
 INNER JOIN
-    account_move_line ml ON ra.account_id = ml.account_id
+    report_partners rp
+        ON ra.id = rp.report_account_id
+        AND COALESCE(ml.partner_id, 0) = COALESCE(rp.partner_id, 0)
 INNER JOIN
-    move_lines ml2
-        ON ml.id = ml2.id
-        AND ml2.amount_residual IS NOT NULL
-        AND ml2.amount_residual != 0
+    account_move_line aml ON ml.id = aml.id
 INNER JOIN
-    account_move m ON ml.move_id = m.id
+    account_move m ON aml.move_id = m.id
 INNER JOIN
-    account_journal j ON ml.journal_id = j.id
+    account_journal j ON aml.journal_id = j.id
 INNER JOIN
-    account_account a ON ml.account_id = a.id
-        """
-        if not only_empty_partner_line:
-            query_inject_move_line += """
-INNER JOIN
-    res_partner p
-        ON ml.partner_id = p.id AND rp.partner_id = p.id
-            """
-        query_inject_move_line += """
+    account_account a ON aml.account_id = a.id
 LEFT JOIN
-    account_full_reconcile fr ON ml.full_reconcile_id = fr.id
-LEFT JOIN
-    res_currency c ON ml2.currency_id = c.id
-WHERE
-    ra.report_id = %s
-AND
-    ml.date <= %s
-        """
-        if self.only_posted_moves:
-            query_inject_move_line += """
-AND
-    m.state = 'posted'
-        """
-        if only_empty_partner_line:
-            query_inject_move_line += """
-AND
-    ml.partner_id IS NULL
-AND
-    rp.partner_id IS NULL
-        """
-        if not only_empty_partner_line:
-            query_inject_move_line += """
+    res_partner p ON ml.partner_id = p.id
 ORDER BY
-    a.code, p.name, ml.date, ml.id
-            """
-        elif only_empty_partner_line:
-            query_inject_move_line += """
-ORDER BY
-    a.code, ml.date, ml.id
-            """
-        self.env.cr.execute(
-            query_inject_move_line,
-            (self.date_at,
-             self.date_at,
-             self.id,
-             self.date_at,
-             self.date_at,
-             self.id,
-             self.env.uid,
-             self.id,
-             self.date_at,)
-        )
-
-    def _compute_partners_and_accounts_cumul(self):
-        """ Compute cumulative amount for
-        report_open_items_partner and report_open_items_account.
+    a.code, p.name, aml.date, aml.id
         """
-        self._compute_partner_cumul()
-        self._compute_account_cumul()
-
-    def _compute_partner_cumul(self):
-        where_condition_partner_by_account = """
-WHERE
-    id IN
-        (
-            SELECT
-                rp.id
-            FROM
-                report_open_items_account ra
-            INNER JOIN
-                report_open_items_partner rp
-                    ON ra.id = rp.report_account_id
-            WHERE
-                ra.report_id = %s
-        )"""
-        query_computer_partner_residual_cumul = """
-UPDATE
-    report_open_items_partner
-SET
-    final_amount_residual =
-        (
-            SELECT
-                SUM(rml.amount_residual) AS final_amount_residual
-            FROM
-                report_open_items_move_line rml
-            WHERE
-                rml.report_partner_id = report_open_items_partner.id
-        )
-""" + where_condition_partner_by_account
-        params_compute_partners_residual_cumul = (self.id,)
-        self.env.cr.execute(query_computer_partner_residual_cumul,
-                            params_compute_partners_residual_cumul)
-
-        query_compute_partners_due_cumul = """
-UPDATE
-    report_open_items_partner
-SET
-    final_amount_total_due =
-        (
-            SELECT
-                SUM(rml.amount_total_due) AS final_amount_total_due
-            FROM
-                report_open_items_move_line rml
-            WHERE
-                rml.report_partner_id = report_open_items_partner.id
-        )
-""" + where_condition_partner_by_account
-        params_compute_partner_due_cumul = (self.id,)
-        self.env.cr.execute(query_compute_partners_due_cumul,
-                            params_compute_partner_due_cumul)
-
-        # Manage currency in partner
-        where_condition_partner_by_account_cur = """
-WHERE
-    id IN
-        (
-            SELECT
-                rp.id
-            FROM
-                report_open_items_account ra
-            INNER JOIN
-                report_open_items_partner rp
-                    ON ra.id = rp.report_account_id
-            WHERE
-                ra.report_id = %s AND ra.currency_id IS NOT NULL
-        )
+        query_inject_params.update({
+            'report_id': self.id,
+            'user_id': self.env.uid,
+            'no_partner_name': _('No partner allocated'),
+        })
+        if self.filter_account_ids:
+            query_inject_params['account_ids'] = tuple(
+                self.filter_account_ids.ids)
+        self.env.cr.execute(query_inject, query_inject_params)
+
+    def _get_partners_open_items(self, buckets, aging_date='date_due'):
+        """ Return the open items of the partners of the report and their
+        aging in the given `buckets` (see
+        `report_aged_partner_balance._get_aging_buckets`) of their due date
+        or document date (`aging_date`), computed without storing the report
+        rows, as a dict of partner id: {
+            'amount_residual': ...,
+            'aging': [amount of each bucket, in the buckets order],
+            'move_lines': [{'move_line_id': ..., 'date': ...,
+                            'date_due': ..., 'amount_total_due': ...,
+                            'amount_residual': ...}, ...],
+        }
+
+        The partners without open items are not in the result. Raise
+        ValueError if `aging_date` is neither 'date_due' nor 'date'.
         """
-        query_compute_partners_cur_id_cumul = """
-UPDATE
-    report_open_items_partner
-SET
-    currency_id =
-        (
-            SELECT
-                MAX(currency_id) as currency_id
-            FROM
-                report_open_items_move_line rml
-            WHERE
-                rml.report_partner_id = report_open_items_partner.id
-        )
-""" + where_condition_partner_by_account_cur
-        params_compute_partners_cur_id_cumul = (self.id,)
-        self.env.cr.execute(query_compute_partners_cur_id_cumul,
-                            params_compute_partners_cur_id_cumul)
-
-        query_compute_partners_cur_residual_cumul = """
-UPDATE
-    report_open_items_partner
-SET
-    final_amount_residual_currency =
-        (
-            SELECT
-                SUM(rml.amount_residual_currency)
-                    AS final_amount_residual_currency
-            FROM
-                report_open_items_move_line rml
-            WHERE
-                rml.report_partner_id = report_open_items_partner.id
-        )
-""" + where_condition_partner_by_account_cur
-        params_compute_partners_cur_residual_cumul = (self.id,)
-        self.env.cr.execute(query_compute_partners_cur_residual_cumul,
-                            params_compute_partners_cur_residual_cumul)
-
-        query_compute_partners_cur_due_cumul = """
-UPDATE
-    report_open_items_partner
-SET
-    final_amount_total_due_currency =
-        (
-            SELECT
-                SUM(rml.amount_total_due_currency)
-                    AS  final_amount_total_due_currency
-            FROM
-                report_open_items_move_line rml
-            WHERE
-                rml.report_partner_id = report_open_items_partner.id
-        )
-""" + where_condition_partner_by_account_cur
-        params_compute_partners_cur_due_cumul = (self.id,)
-        self.env.cr.execute(query_compute_partners_cur_due_cumul,
-                            params_compute_partners_cur_due_cumul)
-
-    def _compute_account_cumul(self):
-        query_compute_accounts_residual_cumul = """
-UPDATE
-    report_open_items_account
-SET
-    final_amount_residual =
+        aged_partner_balance = self.env['report_aged_partner_balance']
+        aging_date = aged_partner_balance._get_aging_date_column(
+            'ml', aging_date)
+        query_open_move_lines, params = self._get_open_move_lines_query()
+        query = """
+WITH
+    open_move_lines AS
         (
-            SELECT
-                SUM(rp.final_amount_residual) AS final_amount_residual
-            FROM
-                report_open_items_partner rp
-            WHERE
-                rp.report_account_id = report_open_items_account.id
-        )
-WHERE
-    report_id  = %s
-        """
-        params_compute_accounts_residual_cumul = (self.id,)
-        self.env.cr.execute(query_compute_accounts_residual_cumul,
-                            params_compute_accounts_residual_cumul)
-
-        query_compute_accounts_cur_residual_cumul = """
-UPDATE
-    report_open_items_account
-SET
-    final_amount_residual_currency =
+        """ + query_open_move_lines + """
+        ),
+    residual_move_lines AS
         (
-            SELECT
-                SUM(rp.final_amount_residual_currency)
-                    AS final_amount_residual_currency
-            FROM
-                report_open_items_partner rp
-            WHERE
-                rp.report_account_id = report_open_items_account.id
-        )
-WHERE
-    report_id = %s
-        """
-        params_compute_accounts_cur_residual_cumul = (self.id,)
-        self.env.cr.execute(query_compute_accounts_cur_residual_cumul,
-                            params_compute_accounts_cur_residual_cumul)
-
-        query_compute_accounts_due_cumul = """
-UPDATE
-    report_open_items_account
-SET
-    final_amount_total_due =
+        """ + self._get_open_items_move_lines_query() + """
+        ),
+    move_lines AS
         (
             SELECT
-                SUM(rp.final_amount_total_due) AS final_amount_total_due
+                aml.id,
+                ml.partner_id,
+                aml.date,
+                aml.date_maturity AS date_due,
+                ml.balance,
+                ml.amount_residual
             FROM
-                report_open_items_partner rp
+                residual_move_lines ml
+            INNER JOIN
+                account_move_line aml ON ml.id = aml.id
             WHERE
-                rp.report_account_id = report_open_items_account.id
-        )
-WHERE
-    report_id = %s
-        """
-        params_compute_accounts_due_cumul = (self.id,)
-        self.env.cr.execute(query_compute_accounts_due_cumul,
-                            params_compute_accounts_due_cumul)
-
-        query_compute_accounts_cur_due_cumul = """
-UPDATE
-    report_open_items_account
-SET
-    final_amount_total_due_currency =
+                ml.amount_residual != 0
+        ),
+    buckets AS
         (
-            SELECT
-                SUM(rp.final_amount_total_due_currency)
-                    AS final_amount_total_due_currency
-            FROM
-                report_open_items_partner rp
-            WHERE
-                rp.report_account_id = report_open_items_account.id
-        )
-WHERE
-    report_id = %s
-        """
-        params_compute_accounts_cur_due_cumul = (self.id,)
-        self.env.cr.execute(query_compute_accounts_cur_due_cumul,
-                            params_compute_accounts_cur_due_cumul)
-
-    def _clean_partners_and_accounts(self,
-                                     only_delete_account_balance_at_0=False):
-        """ Delete empty data for
-        report_open_items_partner and report_open_items_account.
-
-        The "only_delete_account_balance_at_0" value is used
-        to delete also the data with cumulative amounts at 0.
-        """
-        query_clean_partners = """
-DELETE FROM
-    report_open_items_partner
-WHERE
-    id IN
+        """ + aged_partner_balance._get_aging_buckets_query(buckets) + """
+        ),
+    bucket_amounts AS
         (
             SELECT
-                DISTINCT rp.id
+                ml.partner_id,
+                b.sequence,
+                SUM(ml.amount_residual) AS amount
             FROM
-                report_open_items_account ra
+                move_lines ml
             INNER JOIN
-                report_open_items_partner rp
-                    ON ra.id = rp.report_account_id
-            LEFT JOIN
-                report_open_items_move_line rml
-                    ON rp.id = rml.report_partner_id
-            WHERE
-                ra.report_id = %s
-        """
-        if not only_delete_account_balance_at_0:
-            query_clean_partners += """
-            AND rml.id IS NULL
-            """
-        elif only_delete_account_balance_at_0:
-            query_clean_partners += """
-            AND (
-                rp.final_amount_residual IS NULL
-                OR rp.final_amount_residual = 0
-                )
-            """
-        query_clean_partners += """
+                buckets b
+                    ON
+        """ + aged_partner_balance._get_bucket_condition(
+            'b', '%(date_at)s', aging_date) + """
+            GROUP BY
+                ml.partner_id,
+                b.sequence
         )
-        """
-        params_clean_partners = (self.id,)
-        self.env.cr.execute(query_clean_partners, params_clean_partners)
-        query_clean_accounts = """
-DELETE FROM
-    report_open_items_account
-WHERE
-    id IN
-        (
-            SELECT
-                DISTINCT ra.id
-            FROM
-                report_open_items_account ra
-            LEFT JOIN
-                report_open_items_partner rp
-                    ON ra.id = rp.report_account_id
-            WHERE
-                ra.report_id = %s
-        """
-        if not only_delete_account_balance_at_0:
-            query_clean_accounts += """
-            AND rp.id IS NULL
-            """
-        elif only_delete_account_balance_at_0:
-            query_clean_accounts += """
-            AND (
-                ra.final_amount_residual IS NULL
-                OR ra.final_amount_residual = 0
-                )
-            """
-        query_clean_accounts += """
+SELECT
+    ml.partner_id,
+    SUM(ml.amount_residual) AS amount_residual,
+    (
+        SELECT
+            array_agg(COALESCE(ba.amount, 0) ORDER BY b.sequence)
+        FROM
+            buckets b
+        LEFT JOIN
+            bucket_amounts ba
+                ON ba.sequence = b.sequence
+                AND ba.partner_id IS NOT DISTINCT FROM ml.partner_id
+    ) AS aging,
+    json_agg(
+        json_build_object(
+            'move_line_id', ml.id,
+            'date', ml.date,
+            'date_due', ml.date_due,
+            'amount_total_due', ml.balance,
+            'amount_residual', ml.amount_residual
         )
+        ORDER BY ml.date, ml.id
+    ) AS move_lines
+FROM
+    move_lines ml
+GROUP BY
+    ml.partner_id
         """
-        params_clean_accounts = (self.id,)
-        self.env.cr.execute(query_clean_accounts, params_clean_accounts)
+        if self.filter_account_ids:
+            params['account_ids'] = tuple(self.filter_account_ids.ids)
+        self.env.cr.execute(query, params)
+        return {
+            row.pop('partner_id'): row
+            for row in self.env.cr.dictfetchall()
+        }
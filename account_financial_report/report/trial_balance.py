@@ -2,7 +2,8 @@
 # © 2018 Forest and Biomass Romania SA
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
-from odoo import models, fields, api
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
 
 
 class TrialBalanceReport(models.TransientModel):
@@ -14,6 +15,10 @@ class TrialBalanceReport(models.TransientModel):
     *** TrialBalanceReportAccount
     **** TrialBalanceReportPartner
             If "show_partner_details" is selected
+    **** TrialBalanceReportCompany
+            If "consolidation_company_ids" are selected
+    **** TrialBalanceReportAccountPeriod
+            For each of the compared "period_ids"
     """
 
     _name = 'report_trial_balance'
@@ -34,6 +39,9 @@ class TrialBalanceReport(models.TransientModel):
                                     string='Hierarchy On',
                                     required=True,
                                     default='computed')
+    # Consolidation of several companies, in the reporting currency
+    consolidation_company_ids = fields.Many2many(comodel_name='res.company')
+    reporting_currency_id = fields.Many2one(comodel_name='res.currency')
 
     # General Ledger Report Data fields,
     # used as base for compute the data reports
@@ -41,6 +49,12 @@ class TrialBalanceReport(models.TransientModel):
         comodel_name='report_general_ledger'
     )
 
+    # Compared periods
+    period_ids = fields.One2many(
+        comodel_name='report_trial_balance_period',
+        inverse_name='report_id'
+    )
+
     # Data fields, used to browse report data
     account_ids = fields.One2many(
         comodel_name='report_trial_balance_account',
@@ -48,6 +62,21 @@ class TrialBalanceReport(models.TransientModel):
     )
 
 
+class TrialBalanceReportPeriod(models.TransientModel):
+    _name = 'report_trial_balance_period'
+    _order = 'sequence, id'
+
+    report_id = fields.Many2one(
+        comodel_name='report_trial_balance',
+        ondelete='cascade',
+        index=True
+    )
+    sequence = fields.Integer(default=0)
+    name = fields.Char()
+    date_from = fields.Date()
+    date_to = fields.Date()
+
+
 class TrialBalanceReportAccount(models.TransientModel):
     _name = 'report_trial_balance_account'
     _order = 'sequence, code ASC, name'
@@ -76,8 +105,6 @@ class TrialBalanceReportAccount(models.TransientModel):
         'account.group',
         index=True
     )
-    child_account_ids = fields.Char(
-        string="Accounts")
     compute_account_ids = fields.Many2many(
         'account.account',
         string="Accounts", store=True)
@@ -99,6 +126,37 @@ class TrialBalanceReportAccount(models.TransientModel):
         comodel_name='report_trial_balance_partner',
         inverse_name='report_account_id'
     )
+    company_ids = fields.One2many(
+        comodel_name='report_trial_balance_company',
+        inverse_name='report_account_id'
+    )
+    period_ids = fields.One2many(
+        comodel_name='report_trial_balance_account_period',
+        inverse_name='report_account_id'
+    )
+
+
+class TrialBalanceReportAccountPeriod(models.TransientModel):
+    _name = 'report_trial_balance_account_period'
+    _order = 'sequence, id'
+
+    report_account_id = fields.Many2one(
+        comodel_name='report_trial_balance_account',
+        ondelete='cascade',
+        index=True
+    )
+
+    # Data fields, used to keep link with real object
+    period_id = fields.Many2one(
+        comodel_name='report_trial_balance_period',
+        ondelete='cascade',
+    )
+    sequence = fields.Integer(default=0)
+
+    # Data fields, used for report display
+    debit = fields.Float(digits=(16, 2))
+    credit = fields.Float(digits=(16, 2))
+    balance = fields.Float(digits=(16, 2))
 
 
 class TrialBalanceReportPartner(models.TransientModel):
@@ -141,6 +199,31 @@ ORDER BY
         """
 
 
+class TrialBalanceReportCompany(models.TransientModel):
+    _name = 'report_trial_balance_company'
+    _order = 'name, company_id'
+
+    report_account_id = fields.Many2one(
+        comodel_name='report_trial_balance_account',
+        ondelete='cascade',
+        index=True
+    )
+
+    # Data fields, used to keep link with real object
+    company_id = fields.Many2one(
+        'res.company',
+        index=True
+    )
+
+    # Data fields, used for report display, in the reporting currency
+    name = fields.Char()
+
+    initial_balance = fields.Float(digits=(16, 2))
+    debit = fields.Float(digits=(16, 2))
+    credit = fields.Float(digits=(16, 2))
+    final_balance = fields.Float(digits=(16, 2))
+
+
 class TrialBalanceReportCompute(models.TransientModel):
     """ Here, we just define methods.
     For class fields, go more top at this file.
@@ -193,44 +276,73 @@ class TrialBalanceReportCompute(models.TransientModel):
     @api.multi
     def compute_data_for_report(self):
         self.ensure_one()
-        # Compute General Ledger Report Data.
-        # The data of Trial Balance Report
-        # are based on General Ledger Report data.
-        model = self.env['report_general_ledger']
-        if self.filter_account_ids:
-            account_ids = self.filter_account_ids
+        job = self.env['account.financial.report.job']
+        if self.consolidation_company_ids:
+            # The consolidated amounts are computed directly from the
+            # journal items of all the companies
+            job._report_progress(_('Trial Balance: consolidation'))
+            self._inject_consolidated_values()
         else:
-            account_ids = self.env['account.account'].search(
-                [('company_id', '=', self.company_id.id)])
-        self.general_ledger_id = model.create(
-            self._prepare_report_general_ledger(account_ids)
-        )
-        self.general_ledger_id.compute_data_for_report(
-            with_line_details=False, with_partners=self.show_partner_details
-        )
+            if self.filter_account_ids:
+                account_ids = self.filter_account_ids
+            else:
+                account_ids = self.env['account.account'].search(
+                    [('company_id', '=', self.company_id.id)])
 
-        # Compute report data
-        self._inject_account_values(account_ids)
-        if self.show_partner_details:
-            self._inject_partner_values()
+            # Compute report data
+            job._report_progress(_('Trial Balance: accounts'))
+            self._inject_account_values(account_ids)
+            if self.show_partner_details:
+                self._inject_partner_values(account_ids)
         if not self.filter_account_ids:
+            job._report_progress(_('Trial Balance: account groups'))
             self._inject_account_group_values()
             if self.hierarchy_on == 'computed':
                 self._update_account_group_computed_values()
             else:
                 self._update_account_group_child_values()
             self._update_account_sequence()
-            self._add_account_group_account_values()
-        self.refresh()
-        if not self.filter_account_ids:
             self._compute_group_accounts()
-        else:
-            for line in self.account_ids:
-                line.write({'level': 0})
+        self.refresh()
+        if self.filter_account_ids:
+            self.account_ids.write({'level': 0})
+        if self.period_ids and not self.consolidation_company_ids:
+            job._report_progress(_('Trial Balance: compared periods'))
+            self._inject_period_values()
+            if not self.filter_account_ids:
+                self._inject_account_group_period_values()
+
+    def _get_general_ledger(self, account_ids):
+        """ Return a General Ledger with the options of the report, not
+        stored: its queries compute the amounts of the Trial Balance without
+        filling the General Ledger tables.
+        """
+        self.ensure_one()
+        return self.env['report_general_ledger'].new(
+            self._prepare_report_general_ledger(account_ids))
 
     def _inject_account_values(self, account_ids):
-        """Inject report values for report_trial_balance_account"""
+        """Inject report values for report_trial_balance_account.
+
+        The amounts are selected by the account queries of the General
+        Ledger, and inserted straight into the Trial Balance table.
+        """
+        general_ledger = self._get_general_ledger(account_ids)
+        query_general_ledger, query_inject_account_params = \
+            general_ledger._get_account_values_query()
+        unaffected_earnings_account = \
+            general_ledger.unaffected_earnings_account
+        if (not self.filter_account_ids or
+                unaffected_earnings_account in self.filter_account_ids):
+            query_unaffected, query_unaffected_params = \
+                general_ledger._get_unaffected_earnings_account_values_query()
+            query_general_ledger = "(" + query_general_ledger + \
+                ") UNION ALL (" + query_unaffected + ")"
+            query_inject_account_params.update(query_unaffected_params)
+        # pylint: disable=sql-injection
         query_inject_account = """
+WITH
+    rag AS ( """ + query_general_ledger + """ )
 INSERT INTO
     report_trial_balance_account
     (
@@ -250,8 +362,8 @@ INSERT INTO
     final_balance_foreign_currency
     )
 SELECT
-    %s AS report_id,
-    %s AS create_uid,
+    %(trial_balance_id)s AS report_id,
+    %(user_id)s AS create_uid,
     NOW() AS create_date,
     acc.id,
     acc.group_id,
@@ -268,25 +380,341 @@ SELECT
         AS final_balance_foreign_currency
 FROM
     account_account acc
-    LEFT OUTER JOIN report_general_ledger_account AS rag
-        ON rag.account_id = acc.id AND rag.report_id = %s
+    LEFT OUTER JOIN rag ON rag.account_id = acc.id
 WHERE
-    acc.id in %s
+    acc.id in %(trial_balance_account_ids)s
         """
         if self.hide_account_balance_at_0:
             query_inject_account += """ AND
-    final_balance IS NOT NULL AND final_balance != 0"""
-        query_inject_account_params = (
-            self.id,
-            self.env.uid,
-            self.general_ledger_id.id,
-            account_ids._ids,
-        )
+    rag.final_balance IS NOT NULL AND rag.final_balance != 0"""
+        query_inject_account_params.update({
+            # The General Ledger is not stored
+            'report_id': None,
+            'trial_balance_id': self.id,
+            'user_id': self.env.uid,
+            'trial_balance_account_ids': account_ids._ids,
+        })
         self.env.cr.execute(query_inject_account, query_inject_account_params)
 
-    def _inject_partner_values(self):
-        """Inject report values for report_trial_balance_partner"""
+    def _get_consolidation_companies(self):
+        """ Return the consolidated companies, including the report one. """
+        self.ensure_one()
+        return self.company_id | self.consolidation_company_ids
+
+    def _get_consolidation_rates(self):
+        """ Return the rates converting the currency of each consolidated
+        company to the reporting currency, at the date to.
+
+        The rates are loaded once and given to the consolidation query.
+        """
+        self.ensure_one()
+        reporting_currency = self.reporting_currency_id or \
+            self.company_id.currency_id
+        rates = {}
+        for company in self._get_consolidation_companies():
+            rates[company.id] = company.currency_id.with_context(
+                date=self.date_to, company_id=company.id,
+            ).compute(1.0, reporting_currency, round=False)
+        return rates
+
+    def _get_consolidation_unaffected_accounts(self):
+        """ Return the unaffected earnings accounts of the consolidated
+        companies.
+
+        Raise UserError if a company has none: its results of the previous
+        fiscal years would be left out of the consolidation.
+        """
+        companies = self._get_consolidation_companies()
+        accounts = self.env['account.account'].search([
+            ('company_id', 'in', companies.ids),
+            ('user_type_id', '=', self.env.ref(
+                'account.data_unaffected_earnings').id),
+        ])
+        missing_companies = companies - accounts.mapped('company_id')
+        if missing_companies:
+            raise UserError(_(
+                "The following companies have no unaffected earnings "
+                "account, so they can't be consolidated: %s"
+            ) % ', '.join(missing_companies.mapped('name')))
+        return accounts
+
+    def _inject_consolidated_values(self):
+        """ Inject report_trial_balance_account values summing up the
+        accounts of the same code of all the consolidated companies, and a
+        report_trial_balance_company row per company and account.
+
+        The journal items of all the companies are aggregated in one pass
+        by company and account, converted to the reporting currency by the
+        preloaded rates. The amounts of each company are those of the
+        Trial Balance of the company alone: the income accounts start at
+        the fiscal year start, and the unaffected earnings account sums up
+        the balance of the income accounts and its own balance, without
+        debit and credit. Unlike that Trial Balance, a partner filter
+        restricts the summed journal items to the ones of the partners.
+        """
+        self._get_consolidation_unaffected_accounts()
+        rates = self._get_consolidation_rates()
+        query_inject_consolidation = """
+WITH
+    rates AS (
+        SELECT *
+        FROM UNNEST(%(company_ids)s::int[], %(rates)s::numeric[])
+            AS r (company_id, rate)
+    ),
+    unaffected_accounts AS (
+        SELECT DISTINCT ON (a.company_id)
+            a.company_id,
+            a.id,
+            a.code
+        FROM
+            account_account a
+        WHERE
+            a.company_id IN %(company_tuple)s
+        AND
+            a.user_type_id = %(unaffected_earnings_type_id)s
+        ORDER BY
+            a.company_id, a.id
+    ),
+    account_amounts AS (
+        SELECT
+            ml.company_id,
+            a.id AS account_id,
+            a.code,
+            at.include_initial_balance,
+            SUM(ml.balance * r.rate) FILTER (
+                WHERE ml.date < %(date_from)s
+                AND (
+                    at.include_initial_balance = TRUE
+                    OR ml.date >= %(fy_start_date)s
+                )
+            ) AS initial_balance,
+            SUM(ml.debit * r.rate) FILTER (
+                WHERE ml.date >= %(date_from)s
+            ) AS debit,
+            SUM(ml.credit * r.rate) FILTER (
+                WHERE ml.date >= %(date_from)s
+            ) AS credit,
+            SUM(ml.balance * r.rate) FILTER (
+                WHERE at.include_initial_balance = TRUE
+                OR ml.date >= %(fy_start_date)s
+            ) AS final_balance,
+            SUM(ml.balance * r.rate) FILTER (
+                WHERE ml.date < %(date_from)s
+            ) AS all_initial_balance,
+            SUM(ml.balance * r.rate) AS all_final_balance
+        FROM
+            account_move_line ml
+        INNER JOIN
+            rates r ON ml.company_id = r.company_id
+        INNER JOIN
+            account_account a ON ml.account_id = a.id
+        INNER JOIN
+            account_account_type at ON a.user_type_id = at.id
+        """
+        if self.only_posted_moves:
+            query_inject_consolidation += """
+        INNER JOIN
+            account_move m ON ml.move_id = m.id AND m.state = 'posted'
+            """
+        query_inject_consolidation += """
+        WHERE
+            ml.date <= %(date_to)s
+        """
+        if self.filter_partner_ids:
+            query_inject_consolidation += """
+        AND
+            ml.partner_id IN %(partner_ids)s
+            """
+        query_inject_consolidation += """
+        GROUP BY
+            ml.company_id, a.id, a.code, at.include_initial_balance
+    ),
+    sum_amounts AS (
+        SELECT
+            s.company_id,
+            s.code,
+            SUM(s.initial_balance) AS initial_balance,
+            SUM(s.debit) AS debit,
+            SUM(s.credit) AS credit,
+            SUM(s.final_balance) AS final_balance
+        FROM
+            (
+                SELECT
+                    aa.company_id,
+                    aa.code,
+                    aa.initial_balance,
+                    aa.debit,
+                    aa.credit,
+                    aa.final_balance
+                FROM
+                    account_amounts aa
+                INNER JOIN
+                    unaffected_accounts ua
+                        ON aa.company_id = ua.company_id
+                WHERE
+                    aa.account_id != ua.id
+                UNION ALL
+                SELECT
+                    aa.company_id,
+                    ua.code,
+                    aa.all_initial_balance,
+                    NULL,
+                    NULL,
+                    aa.all_final_balance
+                FROM
+                    account_amounts aa
+                INNER JOIN
+                    unaffected_accounts ua
+                        ON aa.company_id = ua.company_id
+                WHERE
+                    aa.include_initial_balance != TRUE
+                OR
+                    aa.account_id = ua.id
+            ) s
+        GROUP BY
+            s.company_id, s.code
+    ),
+    accounts AS (
+        SELECT DISTINCT ON (a.code)
+            a.id,
+            a.group_id,
+            a.code,
+            a.name
+        FROM
+            account_account a
+        WHERE
+            a.company_id IN %(company_tuple)s
+        """
+        if self.filter_account_ids:
+            query_inject_consolidation += """
+        AND
+            a.code IN %(account_codes)s
+            """
+        query_inject_consolidation += """
+        ORDER BY
+            a.code, a.company_id != %(company_id)s, a.id
+    ),
+    report_accounts AS (
+        INSERT INTO
+            report_trial_balance_account
+            (
+            report_id,
+            create_uid,
+            create_date,
+            account_id,
+            parent_id,
+            code,
+            name,
+            initial_balance,
+            debit,
+            credit,
+            final_balance
+            )
+        SELECT
+            %(report_id)s AS report_id,
+            %(user_id)s AS create_uid,
+            NOW() AS create_date,
+            acc.id,
+            acc.group_id,
+            acc.code,
+            acc.name,
+            COALESCE(SUM(s.initial_balance), 0) AS initial_balance,
+            COALESCE(SUM(s.debit), 0) AS debit,
+            COALESCE(SUM(s.credit), 0) AS credit,
+            COALESCE(SUM(s.final_balance), 0) AS final_balance
+        FROM
+            accounts acc
+        LEFT JOIN
+            sum_amounts s ON acc.code = s.code
+        GROUP BY
+            acc.id, acc.group_id, acc.code, acc.name
+        """
+        if self.hide_account_balance_at_0:
+            query_inject_consolidation += """
+        HAVING
+            COALESCE(SUM(s.final_balance), 0) != 0
+            """
+        query_inject_consolidation += """
+        RETURNING
+            id, code
+    )
+INSERT INTO
+    report_trial_balance_company
+    (
+    report_account_id,
+    create_uid,
+    create_date,
+    company_id,
+    name,
+    initial_balance,
+    debit,
+    credit,
+    final_balance
+    )
+SELECT
+    ra.id AS report_account_id,
+    %(user_id)s AS create_uid,
+    NOW() AS create_date,
+    s.company_id,
+    c.name,
+    COALESCE(s.initial_balance, 0) AS initial_balance,
+    COALESCE(s.debit, 0) AS debit,
+    COALESCE(s.credit, 0) AS credit,
+    COALESCE(s.final_balance, 0) AS final_balance
+FROM
+    sum_amounts s
+INNER JOIN
+    report_accounts ra ON s.code = ra.code
+INNER JOIN
+    res_company c ON s.company_id = c.id
+        """
+        query_inject_consolidation_params = {
+            'report_id': self.id,
+            'user_id': self.env.uid,
+            'company_id': self.company_id.id,
+            'company_ids': list(rates),
+            'company_tuple': tuple(rates),
+            'rates': [rates[company_id] for company_id in rates],
+            'unaffected_earnings_type_id': self.env.ref(
+                'account.data_unaffected_earnings').id,
+            'date_from': self.date_from,
+            'date_to': self.date_to,
+            'fy_start_date': self.fy_start_date,
+        }
+        if self.filter_account_ids:
+            query_inject_consolidation_params['account_codes'] = tuple(
+                set(self.filter_account_ids.mapped('code')))
+        if self.filter_partner_ids:
+            query_inject_consolidation_params['partner_ids'] = tuple(
+                self.filter_partner_ids.ids)
+        self.env.cr.execute(query_inject_consolidation,
+                            query_inject_consolidation_params)
+
+    def _inject_partner_values(self, account_ids):
+        """Inject report values for report_trial_balance_partner.
+
+        The amounts are selected by the partner query of the General Ledger,
+        grouped by the report lines of the "partner" accounts.
+        """
+        self.env.cr.execute("""
+            SELECT ra.id, ra.account_id
+            FROM report_trial_balance_account ra
+            INNER JOIN account_account a ON ra.account_id = a.id
+            WHERE
+                ra.report_id = %s
+            AND a.internal_type IN ('payable', 'receivable')
+            ORDER BY ra.id
+        """, (self.id,))
+        report_accounts = self.env.cr.fetchall()
+        if not report_accounts:
+            return
+        general_ledger = self._get_general_ledger(account_ids)
+        query_general_ledger, query_inject_partner_params = \
+            general_ledger._get_partner_values_query(sharded=True)
+        # pylint: disable=sql-injection
         query_inject_partner = """
+WITH
+    rpg AS ( """ + query_general_ledger + """ )
 INSERT INTO
     report_trial_balance_partner
     (
@@ -303,11 +731,11 @@ INSERT INTO
     final_balance_foreign_currency
     )
 SELECT
-    ra.id AS report_account_id,
-    %s AS create_uid,
+    rpg.report_account_id,
+    %(user_id)s AS create_uid,
     NOW() AS create_date,
     rpg.partner_id,
-    rpg.name,
+    rpg.partner_name,
     rpg.initial_balance AS initial_balance,
     rpg.initial_balance_foreign_currency AS initial_balance_foreign_currency,
     rpg.final_debit - rpg.initial_debit AS debit,
@@ -315,20 +743,15 @@ SELECT
     rpg.final_balance AS final_balance,
     rpg.final_balance_foreign_currency AS final_balance_foreign_currency
 FROM
-    report_general_ledger_partner rpg
-INNER JOIN
-    report_general_ledger_account rag ON rpg.report_account_id = rag.id
-INNER JOIN
-    report_trial_balance_account ra ON rag.code = ra.code
-WHERE
-    rag.report_id = %s
-AND ra.report_id = %s
+    rpg
         """
-        query_inject_partner_params = (
-            self.env.uid,
-            self.general_ledger_id.id,
-            self.id,
-        )
+        query_inject_partner_params.update({
+            # The General Ledger is not stored
+            'report_id': None,
+            'user_id': self.env.uid,
+            'shard_report_account_ids': [ra[0] for ra in report_accounts],
+            'shard_account_ids': [ra[1] for ra in report_accounts],
+        })
         self.env.cr.execute(query_inject_partner, query_inject_partner_params)
 
     def _inject_account_group_values(self):
@@ -366,36 +789,30 @@ FROM
         self.env.cr.execute(query_inject_account_group,
                             query_inject_account_params)
 
-    def _update_account_group_child_values(self):
-        """Compute values for report_trial_balance_account group in child."""
-        query_update_account_group = """
-WITH computed AS (WITH RECURSIVE cte AS (
-   SELECT account_group_id, code, account_group_id AS parent_id,
-    initial_balance, initial_balance_foreign_currency, debit, credit,
-    final_balance, final_balance_foreign_currency
-   FROM   report_trial_balance_account
-   WHERE report_id = %s
-   GROUP BY report_trial_balance_account.id
-
-   UNION  ALL
-   SELECT c.account_group_id, c.code, p.account_group_id,
-    p.initial_balance, p.initial_balance_foreign_currency, p.debit, p.credit,
-    p.final_balance, p.final_balance_foreign_currency
-   FROM   cte c
-   JOIN   report_trial_balance_account p USING (parent_id)
-    WHERE p.report_id = %s
-)
-SELECT account_group_id, code,
-    sum(initial_balance) AS initial_balance,
-    sum(initial_balance_foreign_currency) AS initial_balance_foreign_currency,
-    sum(debit) AS debit,
-    sum(credit) AS credit,
-    sum(final_balance) AS final_balance,
-    sum(final_balance_foreign_currency) AS final_balance_foreign_currency
-FROM   cte
-GROUP BY cte.account_group_id, cte.code
-ORDER BY account_group_id
-)
+    def _get_account_group_update_query(self, query_group_accounts):
+        """ Return the query updating the amounts of the group lines with
+        the sums of the account lines, grouped by `account_group_id` by
+        `query_group_accounts` (aliased `ra`).
+        """
+        # pylint: disable=sql-injection
+        return """
+WITH
+    computed AS (
+        SELECT
+            account_group_id,
+            COALESCE(SUM(ra.initial_balance), 0) AS initial_balance,
+            COALESCE(SUM(ra.initial_balance_foreign_currency), 0)
+                AS initial_balance_foreign_currency,
+            COALESCE(SUM(ra.debit), 0) AS debit,
+            COALESCE(SUM(ra.credit), 0) AS credit,
+            COALESCE(SUM(ra.final_balance), 0) AS final_balance,
+            COALESCE(SUM(ra.final_balance_foreign_currency), 0)
+                AS final_balance_foreign_currency
+        FROM
+            (""" + query_group_accounts + """) ra
+        GROUP BY
+            account_group_id
+    )
 UPDATE report_trial_balance_account
 SET initial_balance = computed.initial_balance,
     initial_balance_foreign_currency =
@@ -407,92 +824,61 @@ SET initial_balance = computed.initial_balance,
         computed.final_balance_foreign_currency
 FROM computed
 WHERE report_trial_balance_account.account_group_id = computed.account_group_id
-    AND report_trial_balance_account.report_id = %s
-"""
-        query_update_account_params = (self.id, self.id, self.id,)
-        self.env.cr.execute(query_update_account_group,
-                            query_update_account_params)
+    AND report_trial_balance_account.report_id = %(report_id)s
+        """
 
-    def _add_account_group_account_values(self):
-        """Compute values for report_trial_balance_account group in child."""
-        query_update_account_group = """
-DROP AGGREGATE IF EXISTS array_concat_agg(anyarray);
-CREATE AGGREGATE array_concat_agg(anyarray) (
-  SFUNC = array_cat,
-  STYPE = anyarray
-);
-WITH aggr AS(WITH computed AS (WITH RECURSIVE cte AS (
-   SELECT account_group_id, account_group_id AS parent_id,
-    ARRAY[account_id]::int[] as child_account_ids
-   FROM   report_trial_balance_account
-   WHERE report_id = %s
-   GROUP BY report_trial_balance_account.id
-
-   UNION  ALL
-   SELECT c.account_group_id, p.account_group_id, ARRAY[p.account_id]::int[]
-   FROM   cte c
-   JOIN   report_trial_balance_account p USING (parent_id)
-    WHERE p.report_id = %s
-)
-SELECT account_group_id,
-    array_concat_agg(DISTINCT child_account_ids)::int[] as child_account_ids
-FROM   cte
-GROUP BY cte.account_group_id, cte.child_account_ids
-ORDER BY account_group_id
-)
-SELECT account_group_id,
-    array_concat_agg(DISTINCT child_account_ids)::int[]
-        AS child_account_ids from computed
-GROUP BY account_group_id)
-UPDATE report_trial_balance_account
-SET child_account_ids = aggr.child_account_ids
-FROM aggr
-WHERE report_trial_balance_account.account_group_id = aggr.account_group_id
-    AND report_trial_balance_account.report_id = %s
-"""
-        query_update_account_params = (self.id, self.id, self.id,)
+    def _update_account_group_child_values(self):
+        """Compute values for report_trial_balance_account group in child.
+
+        The accounts are summed up in the group of their account and in
+        all its ancestors, read from the account groups closure.
+        """
+        query_update_account_group = self._get_account_group_update_query("""
+            SELECT
+                gc.ancestor_id AS account_group_id,
+                ra.*
+            FROM
+                report_trial_balance_account ra
+            INNER JOIN
+                account_group_closure gc ON ra.parent_id = gc.descendant_id
+            WHERE
+                ra.report_id = %(report_id)s
+            AND ra.account_id IS NOT NULL
+        """)
         self.env.cr.execute(query_update_account_group,
-                            query_update_account_params)
+                            {'report_id': self.id})
 
     def _update_account_group_computed_values(self):
-        """Compute values for report_trial_balance_account group in compute."""
-        query_update_account_group = """
-WITH RECURSIVE accgroup AS
-(SELECT
-    accgroup.id,
-    coalesce(sum(ra.initial_balance),0) as initial_balance,
-    coalesce(sum(ra.initial_balance_foreign_currency),0)
-        as initial_balance_foreign_currency,
-    coalesce(sum(ra.debit),0) as debit,
-    coalesce(sum(ra.credit),0) as credit,
-    coalesce(sum(ra.final_balance),0) as final_balance,
-    coalesce(sum(ra.final_balance_foreign_currency),0)
-        as final_balance_foreign_currency
- FROM
-    account_group accgroup
-    LEFT OUTER JOIN account_account AS acc
-        ON strpos(acc.code, accgroup.code_prefix) = 1
-    LEFT OUTER JOIN report_trial_balance_account AS ra
-        ON ra.account_id = acc.id
- WHERE ra.report_id = %s
- GROUP BY accgroup.id
-)
-UPDATE report_trial_balance_account
-SET initial_balance = accgroup.initial_balance,
-    initial_balance_foreign_currency =
-        accgroup.initial_balance_foreign_currency,
-    debit = accgroup.debit,
-    credit = accgroup.credit,
-    final_balance = accgroup.final_balance,
-    final_balance_foreign_currency =
-        accgroup.final_balance_foreign_currency
+        """Compute values for report_trial_balance_account group in compute.
 
-FROM accgroup
-WHERE report_trial_balance_account.account_group_id = accgroup.id
-"""
-        query_update_account_params = (self.id,)
+        The accounts are summed up in all the groups whose code prefix
+        starts their code, read from the accounts computed by the groups.
+        """
+        # pylint: disable=sql-injection
+        field = self.env['account.group']._fields['compute_account_ids']
+        query_update_account_group = self._get_account_group_update_query("""
+            SELECT
+                rel."{column1}" AS account_group_id,
+                ra.*
+            FROM
+                report_trial_balance_account ra
+            INNER JOIN
+                "{relation}" rel ON ra.account_id = rel."{column2}"
+            INNER JOIN
+                account_group accgroup
+                    ON
+                        rel."{column1}" = accgroup.id
+                        AND accgroup.code_prefix IS NOT NULL
+            WHERE
+                ra.report_id = %(report_id)s
+            AND ra.account_id IS NOT NULL
+        """.format(
+            relation=field.relation,
+            column1=field.column1,
+            column2=field.column2,
+        ))
         self.env.cr.execute(query_update_account_group,
-                            query_update_account_params)
+                            {'report_id': self.id})
 
     def _update_account_sequence(self):
         """Compute sequence, level for report_trial_balance_account account."""
@@ -509,19 +895,193 @@ WHERE newline.account_group_id = report_trial_balance_account.parent_id
         self.env.cr.execute(query_update_account_group,
                             query_update_account_params)
 
+    def _inject_period_values(self):
+        """ Inject report_trial_balance_account_period values of the
+        accounts, for each compared period.
+
+        The journal items of all the periods are aggregated in one scan,
+        grouped by account and period.
+        """
+        query_inject_period = """
+WITH
+    period_amounts AS (
+        SELECT
+            ra.id AS report_account_id,
+            p.id AS period_id,
+            SUM(ml.debit) AS debit,
+            SUM(ml.credit) AS credit,
+            SUM(ml.balance) AS balance
+        FROM
+            report_trial_balance_account ra
+        INNER JOIN
+            account_move_line ml ON ra.account_id = ml.account_id
+        INNER JOIN
+            report_trial_balance_period p
+                ON
+                    p.report_id = ra.report_id
+                    AND ml.date BETWEEN p.date_from AND p.date_to
+        """
+        if self.only_posted_moves:
+            query_inject_period += """
+        INNER JOIN
+            account_move m ON ml.move_id = m.id AND m.state = 'posted'
+            """
+        query_inject_period += """
+        WHERE
+            ra.report_id = %(report_id)s
+        AND
+            ml.date BETWEEN %(date_from)s AND %(date_to)s
+        """
+        if self.filter_partner_ids:
+            query_inject_period += """
+        AND
+            ml.partner_id IN %(partner_ids)s
+            """
+        query_inject_period += """
+        GROUP BY
+            ra.id,
+            p.id
+    )
+INSERT INTO
+    report_trial_balance_account_period
+    (
+    report_account_id,
+    create_uid,
+    create_date,
+    period_id,
+    sequence,
+    debit,
+    credit,
+    balance
+    )
+SELECT
+    ra.id AS report_account_id,
+    %(user_id)s AS create_uid,
+    NOW() AS create_date,
+    p.id AS period_id,
+    p.sequence,
+    COALESCE(pa.debit, 0) AS debit,
+    COALESCE(pa.credit, 0) AS credit,
+    COALESCE(pa.balance, 0) AS balance
+FROM
+    report_trial_balance_account ra
+INNER JOIN
+    report_trial_balance_period p ON p.report_id = ra.report_id
+LEFT JOIN
+    period_amounts pa
+        ON pa.report_account_id = ra.id AND pa.period_id = p.id
+WHERE
+    ra.report_id = %(report_id)s
+AND
+    ra.account_id IS NOT NULL
+        """
+        periods = self.period_ids
+        query_inject_period_params = {
+            'report_id': self.id,
+            'user_id': self.env.uid,
+            'date_from': min(periods.mapped('date_from')),
+            'date_to': max(periods.mapped('date_to')),
+        }
+        if self.filter_partner_ids:
+            query_inject_period_params['partner_ids'] = tuple(
+                self.filter_partner_ids.ids)
+        self.env.cr.execute(query_inject_period, query_inject_period_params)
+
+    def _inject_account_group_period_values(self):
+        """ Inject report_trial_balance_account_period values of the
+        account groups, summing up the accounts they compute.
+        """
+        # pylint: disable=sql-injection
+        field = self.env['report_trial_balance_account']._fields[
+            'compute_account_ids']
+        query_inject_period = """
+INSERT INTO
+    report_trial_balance_account_period
+    (
+    report_account_id,
+    create_uid,
+    create_date,
+    period_id,
+    sequence,
+    debit,
+    credit,
+    balance
+    )
+SELECT
+    rg.id AS report_account_id,
+    %(user_id)s AS create_uid,
+    NOW() AS create_date,
+    p.id AS period_id,
+    p.sequence,
+    COALESCE(SUM(rap.debit), 0) AS debit,
+    COALESCE(SUM(rap.credit), 0) AS credit,
+    COALESCE(SUM(rap.balance), 0) AS balance
+FROM
+    report_trial_balance_account rg
+INNER JOIN
+    report_trial_balance_period p ON p.report_id = rg.report_id
+LEFT JOIN
+    "{relation}" rel ON rel."{column1}" = rg.id
+LEFT JOIN
+    report_trial_balance_account ra
+        ON
+            ra.account_id = rel."{column2}"
+            AND ra.report_id = rg.report_id
+LEFT JOIN
+    report_trial_balance_account_period rap
+        ON rap.report_account_id = ra.id AND rap.period_id = p.id
+WHERE
+    rg.report_id = %(report_id)s
+AND
+    rg.account_group_id IS NOT NULL
+GROUP BY
+    rg.id,
+    p.id,
+    p.sequence
+        """.format(
+            relation=field.relation,
+            column1=field.column1,
+            column2=field.column2,
+        )
+        query_inject_period_params = {
+            'report_id': self.id,
+            'user_id': self.env.uid,
+        }
+        self.env.cr.execute(query_inject_period, query_inject_period_params)
+
     def _compute_group_accounts(self):
-        groups = self.account_ids.filtered(
-            lambda a: a.account_group_id is not False)
-        for group in groups:
-            if self.hierarchy_on == 'compute':
-                group.compute_account_ids = \
-                    group.account_group_id.compute_account_ids
-            else:
-                if group.child_account_ids:
-                    chacc = group.child_account_ids.replace(
-                        '}', '').replace('{', '').split(',')
-                    if 'NULL' in chacc:
-                        chacc.remove('NULL')
-                    if chacc:
-                        group.compute_account_ids = [
-                            (6, 0, [int(g) for g in chacc])]
+        """ Link the group lines to the accounts of their group and of all
+        its descendants, read from the account groups closure.
+        """
+        # pylint: disable=sql-injection
+        field = self.env['report_trial_balance_account']._fields[
+            'compute_account_ids']
+        query_inject_group_accounts = """
+INSERT INTO
+    "{relation}"
+    (
+    "{column1}",
+    "{column2}"
+    )
+SELECT
+    rg.id,
+    ra.account_id
+FROM
+    report_trial_balance_account ra
+INNER JOIN
+    account_group_closure gc ON ra.parent_id = gc.descendant_id
+INNER JOIN
+    report_trial_balance_account rg
+        ON
+            rg.report_id = ra.report_id
+            AND rg.account_group_id = gc.ancestor_id
+WHERE
+    ra.report_id = %s
+AND ra.account_id IS NOT NULL
+        """.format(
+            relation=field.relation,
+            column1=field.column1,
+            column2=field.column2,
+        )
+        self.env.cr.execute(query_inject_group_accounts, (self.id,))
+        self.account_ids.invalidate_cache(['compute_account_ids'])
@@ -14,6 +14,26 @@ class TrialBalanceXslx(models.AbstractModel):
         return _('Trial Balance')
 
     def _get_report_columns(self, report):
+        if report.consolidation_company_ids:
+            return {
+                0: {'header': _('Company'), 'field': 'name', 'width': 70},
+                1: {'header': _('Initial balance'),
+                    'field': 'initial_balance',
+                    'type': 'amount',
+                    'width': 14},
+                2: {'header': _('Debit'),
+                    'field': 'debit',
+                    'type': 'amount',
+                    'width': 14},
+                3: {'header': _('Credit'),
+                    'field': 'credit',
+                    'type': 'amount',
+                    'width': 14},
+                4: {'header': _('Ending balance'),
+                    'field': 'final_balance',
+                    'type': 'amount',
+                    'width': 14},
+            }
         if not report.show_partner_details:
             res = {
                 0: {'header': _('Code'), 'field': 'code', 'width': 10},
@@ -51,6 +71,18 @@ class TrialBalanceXslx(models.AbstractModel):
                         'width': 14},
                 }
                 res = {**res, **foreign_currency}
+            for period in report.period_ids:
+                for field, header in (('debit', _('Debit')),
+                                      ('credit', _('Credit')),
+                                      ('balance', _('Balance'))):
+                    res[len(res)] = {
+                        'header': '%s %s' % (period.name, header),
+                        'field': 'period_ids',
+                        'type': 'period_amount',
+                        'period_id': period.id,
+                        'period_field': field,
+                        'width': 14,
+                    }
             return res
         else:
             res = {
@@ -91,7 +123,7 @@ class TrialBalanceXslx(models.AbstractModel):
             return res
 
     def _get_report_filters(self, report):
-        return [
+        filters = [
             [_('Date range filter'),
              _('From: %s To: %s') % (report.date_from, report.date_to)],
             [_('Target moves filter'),
@@ -102,6 +134,16 @@ class TrialBalanceXslx(models.AbstractModel):
             [_('Show foreign currency'),
              _('Yes') if report.foreign_currency else _('No')],
         ]
+        if report.consolidation_company_ids:
+            currency = report.reporting_currency_id or \
+                report.company_id.currency_id
+            companies = report.company_id | report.consolidation_company_ids
+            filters.append([
+                _('Consolidated companies'),
+                '%s (%s)' % (', '.join(companies.mapped('name')),
+                             currency.name),
+            ])
+        return filters
 
     def _get_col_count_filter_name(self):
         return 2
@@ -110,6 +152,9 @@ class TrialBalanceXslx(models.AbstractModel):
         return 3
 
     def _generate_report_content(self, workbook, report):
+        if report.consolidation_company_ids:
+            self._generate_consolidated_content(report)
+            return
 
         if not report.show_partner_details:
             # Display array header for account lines
@@ -140,6 +185,26 @@ class TrialBalanceXslx(models.AbstractModel):
                 # Line break
                 self.row_pos += 2
 
+    def _generate_consolidated_content(self, report):
+        # For each account
+        for account in report.account_ids:
+            # Write account title
+            self.write_array_title(account.code + ' - ' + account.name)
+
+            # Display array header for company lines
+            self.write_array_header()
+
+            # For each company
+            for company in account.company_ids:
+                # Display company lines
+                self.write_line(company, 'company')
+
+            # Display consolidated amounts
+            self.write_account_footer(account, _('Consolidated'))
+
+            # Line break
+            self.row_pos += 2
+
     def write_line(self, line_object, type_object):
         """Write a line on current line using all defined columns field name.
         Columns are defined with `_get_report_columns` method.
@@ -148,8 +213,24 @@ class TrialBalanceXslx(models.AbstractModel):
             line_object.currency_id = line_object.report_account_id.currency_id
         elif type_object == 'account':
             line_object.currency_id = line_object.currency_id
+            self._write_period_amounts(line_object)
         super(TrialBalanceXslx, self).write_line(line_object)
 
+    def _write_period_amounts(self, account):
+        """Write the amounts of the compared periods on current line."""
+        period_lines = {
+            period_line.period_id.id: period_line
+            for period_line in account.period_ids
+        }
+        for col_pos, column in self.columns.items():
+            if column.get('type') != 'period_amount':
+                continue
+            period_line = period_lines.get(column['period_id'])
+            value = period_line[column['period_field']] if period_line \
+                else 0.0
+            self.sheet.write_number(
+                self.row_pos, col_pos, float(value), self.format_amount)
+
     def write_account_footer(self, account, name_value):
         """Specific function to write account footer for Trial Balance"""
         format_amt = self._get_currency_amt_header_format(account)
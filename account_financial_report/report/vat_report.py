@@ -1,7 +1,7 @@
 # Copyright  2018 Forest and Biomass Romania
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
-from odoo import api, fields, models
+from odoo import _, api, fields, models
 
 
 class VATReport(models.TransientModel):
@@ -128,6 +128,8 @@ class VATReportCompute(models.TransientModel):
     @api.multi
     def compute_data_for_report(self):
         self.ensure_one()
+        self.env['account.financial.report.job']._report_progress(
+            _('VAT Report: taxes'))
         # Compute report data
         if self.based_on == 'taxtags':
             self._inject_taxtags_values()
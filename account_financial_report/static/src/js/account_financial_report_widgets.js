@@ -2,8 +2,11 @@ odoo.define('account_financial_report.account_financial_report_widget', function
 (require) {
 'use strict';
 
+var core = require('web.core');
 var Widget = require('web.Widget');
 
+var _t = core._t;
+
 
 var accountFinancialReportWidget = Widget.extend({
     events: {
@@ -11,8 +14,10 @@ var accountFinancialReportWidget = Widget.extend({
         'click .o_account_financial_reports_web_action_multi': 'boundLinkmulti',
         'click .o_account_financial_reports_web_action_monetary': 'boundLinkMonetary',
         'click .o_account_financial_reports_web_action_monetary_multi': 'boundLinkMonetarymulti',
+        'click .o_account_financial_reports_load_lines_link': 'loadLines',
     },
-    init: function() {
+    init: function(parent, given_context) {
+        this.given_context = given_context || {};
         this._super.apply(this, arguments);
     },
     start: function() {
@@ -62,6 +67,37 @@ var accountFinancialReportWidget = Widget.extend({
             target: 'current'
         });
     },
+    // Fetches the next page of lines of an account or a partner and
+    // renders it before the row of the link
+    loadLines: function(e) {
+        var $row = $(e.target).closest('.o_account_financial_reports_load_lines');
+        if ($row.data('loading')) {
+            return;
+        }
+        $row.data('loading', true);
+        return this._rpc({
+            model: this.given_context.model,
+            method: 'get_html_lines',
+            args: [
+                this.given_context.active_id,
+                $row.data('report-account-id'),
+                $row.data('report-partner-id') || false,
+                $row.data('last-line-id'),
+            ],
+        }).then(function (result) {
+            $row.before(result.html);
+            if (result.has_more) {
+                $row.data('last-line-id', result.last_line_id);
+                $row.find('.o_account_financial_reports_load_lines_link')
+                    .text(_t('Show more lines'));
+                $row.data('loading', false);
+            } else {
+                $row.remove();
+            }
+        }).fail(function () {
+            $row.data('loading', false);
+        });
+    },
 });
 
 return accountFinancialReportWidget;
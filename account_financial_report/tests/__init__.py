@@ -5,9 +5,16 @@
 from . import abstract_test
 from . import abstract_test_tax_report
 from . import abstract_test_foreign_currency
+from . import test_account_financial_report_cache
+from . import test_account_financial_report_job
+from . import test_account_financial_report_storage
+from . import test_account_period_balance
+from . import test_account_reconcile_timeline
 from . import test_aged_partner_balance
 from . import test_general_ledger
 from . import test_journal_ledger
 from . import test_open_items
+from . import test_partner_open_balance
+from . import test_reporting_indexes
 from . import test_trial_balance
 from . import test_vat_report
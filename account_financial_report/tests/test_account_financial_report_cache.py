@@ -0,0 +1,119 @@
+# Copyright 2018 Tecnativa
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo.tests import common
+
+
+@common.at_install(False)
+@common.post_install(True)
+class TestAccountFinancialReportCache(common.TransactionCase):
+
+    def setUp(self):
+        super(TestAccountFinancialReportCache, self).setUp()
+        self.cache_model = self.env['account.financial.report.cache']
+        self.env['ir.config_parameter'].sudo().set_param(
+            'account_financial_report.cache_ttl', '60')
+        wizard = self.env['general.ledger.report.wizard'].create({
+            'date_from': '2016-01-01',
+            'date_to': '2016-12-31',
+            'company_id': self.env.ref('base.main_company').id,
+        })
+        self.vals = wizard._prepare_report_general_ledger()
+
+    def _add_move(self):
+        receivable_account = self.env['account.account'].search([
+            ('user_type_id.name', '=', 'Receivable')
+        ], limit=1)
+        income_account = self.env['account.account'].search([
+            ('user_type_id.name', '=', 'Income')
+        ], limit=1)
+        self.env['account.move'].create({
+            'journal_id': self.env['account.journal'].search([
+                ('code', '=', 'MISC')]).id,
+            'date': '2016-06-15',
+            'line_ids': [
+                (0, 0, {
+                    'name': 'cache',
+                    'debit': 100,
+                    'credit': 0,
+                    'account_id': receivable_account.id}),
+                (0, 0, {
+                    'name': 'cache',
+                    'debit': 0,
+                    'credit': 100,
+                    'account_id': income_account.id}),
+            ]}).post()
+
+    def test_01_reuse_until_ledger_change(self):
+        report = self.cache_model._get_report(
+            'report_general_ledger', self.vals)
+        self.assertEqual(
+            self.cache_model._get_report('report_general_ledger', self.vals),
+            report)
+
+        other_vals = dict(self.vals, date_to='2016-11-30')
+        self.assertNotEqual(
+            self.cache_model._get_report('report_general_ledger', other_vals),
+            report)
+
+        self._add_move()
+        new_report = self.cache_model._get_report(
+            'report_general_ledger', self.vals)
+        self.assertNotEqual(new_report, report)
+        self.assertEqual(
+            self.cache_model._get_report('report_general_ledger', self.vals),
+            new_report)
+
+    def test_02_disabled(self):
+        self.env['ir.config_parameter'].sudo().set_param(
+            'account_financial_report.cache_ttl', '0')
+        report = self.cache_model._get_report(
+            'report_general_ledger', self.vals)
+        self.assertNotEqual(
+            self.cache_model._get_report('report_general_ledger', self.vals),
+            report)
+        self.assertFalse(self.cache_model.sudo().search([]))
+
+    def test_03_eviction(self):
+        self.env['ir.config_parameter'].sudo().set_param(
+            'account_financial_report.cache_size', '2')
+        for month in ('06', '07', '08', '09'):
+            vals = dict(self.vals, date_to='2016-%s-30' % month)
+            report = self.cache_model._get_report(
+                'report_general_ledger', vals)
+        self.assertEqual(len(self.cache_model.sudo().search([])), 2)
+        # The last added entry is kept
+        self.assertEqual(
+            self.cache_model._get_report('report_general_ledger', vals),
+            report)
+
+    def test_04_accounts_and_groups_changes(self):
+        report = self.cache_model._get_report(
+            'report_general_ledger', self.vals)
+        account = self.env['account.account'].search([
+            ('company_id', '=', self.vals['company_id']),
+        ], limit=1)
+        account.centralized = not account.centralized
+        new_report = self.cache_model._get_report(
+            'report_general_ledger', self.vals)
+        self.assertNotEqual(new_report, report)
+
+        self.env['account.group'].create({
+            'name': 'Cache',
+            'code_prefix': '99',
+        })
+        self.assertNotEqual(
+            self.cache_model._get_report('report_general_ledger', self.vals),
+            new_report)
+
+    def test_05_compact_ledger_changes(self):
+        change_model = self.env['account.ledger.change']
+        company_ids = [self.vals['company_id']]
+        self._add_move()
+        watermark = change_model._get_watermark(company_ids)
+        change_model._compact()
+        self.assertEqual(change_model._get_watermark(company_ids), watermark)
+        self.assertEqual(
+            change_model.sudo().search_count([
+                ('company_id', '=', self.vals['company_id']),
+            ]), 1)
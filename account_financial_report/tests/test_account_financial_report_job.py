@@ -0,0 +1,47 @@
+# Copyright 2018 Tecnativa
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import json
+
+from odoo.tests import common
+
+
+@common.at_install(False)
+@common.post_install(True)
+class TestAccountFinancialReportJob(common.TransactionCase):
+
+    def setUp(self):
+        super(TestAccountFinancialReportJob, self).setUp()
+        self.job_model = self.env['account.financial.report.job']
+        self.wizard = self.env['general.ledger.report.wizard'].create({
+            'date_from': '2016-01-01',
+            'date_to': '2016-12-31',
+            'company_id': self.env.ref('base.main_company').id,
+            'run_in_background': True,
+        })
+
+    def test_01_export_in_background(self):
+        action = self.wizard.button_export_xlsx()
+        self.assertEqual(action['res_model'], self.job_model._name)
+        job = self.job_model.browse(action['res_id'])
+        self.assertEqual(job.state, 'pending')
+        self.assertEqual(job.report_model, 'report_general_ledger')
+        self.assertEqual(job.report_type, 'xlsx')
+        self.assertEqual(job.user_id, self.env.user)
+        vals = json.loads(job.report_vals)
+        self.assertEqual(vals['date_from'], '2016-01-01')
+        self.assertTrue(vals['stream_move_lines'])
+        # No report is computed until the job runs
+        self.assertFalse(self.env['report_general_ledger'].search([
+            ('date_from', '=', '2016-01-01'),
+            ('date_to', '=', '2016-12-31'),
+        ]))
+
+    def test_02_execute(self):
+        action = self.wizard.button_export_xlsx()
+        job = self.job_model.browse(action['res_id'])
+        attachment = job._execute()
+        self.assertEqual(attachment.res_model, job._name)
+        self.assertEqual(attachment.res_id, job.id)
+        self.assertTrue(attachment.datas_fname.endswith('.xlsx'))
+        self.assertTrue(attachment.datas)
@@ -0,0 +1,108 @@
+# Copyright 2018 Tecnativa
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import logging
+import time
+
+from odoo.tests import common
+
+_logger = logging.getLogger(__name__)
+
+
+@common.at_install(False)
+@common.post_install(True)
+class TestAccountFinancialReportStorage(common.TransactionCase):
+
+    def setUp(self):
+        super(TestAccountFinancialReportStorage, self).setUp()
+        self.storage = self.env['account.financial.report.storage']
+        self.tables = self.storage._get_report_tables()
+
+    def _get_persistences(self):
+        self.env.cr.execute("""
+            SELECT DISTINCT relpersistence
+            FROM pg_class
+            WHERE relkind = 'r' AND relname IN %s
+        """, (tuple(self.tables),))
+        return {row[0] for row in self.env.cr.fetchall()}
+
+    def _get_wal_location(self):
+        if self.env.cr._cnx.server_version >= 100000:
+            self.env.cr.execute("SELECT pg_current_wal_insert_lsn()")
+        else:
+            self.env.cr.execute("SELECT pg_current_xlog_insert_location()")
+        return self.env.cr.fetchone()[0]
+
+    def _get_wal_bytes(self, location):
+        if self.env.cr._cnx.server_version >= 100000:
+            self.env.cr.execute(
+                "SELECT pg_wal_lsn_diff(pg_current_wal_insert_lsn(), %s)",
+                (location,))
+        else:
+            self.env.cr.execute("""
+                SELECT pg_xlog_location_diff(
+                    pg_current_xlog_insert_location(), %s)
+            """, (location,))
+        return self.env.cr.fetchone()[0]
+
+    def _compute_general_ledger(self):
+        """ Return the WAL bytes and the time of a General Ledger
+        computation.
+        """
+        location = self._get_wal_location()
+        start = time.time()
+        general_ledger = self.env['report_general_ledger'].create({
+            'date_from': time.strftime('%Y-01-01'),
+            'date_to': time.strftime('%Y-12-31'),
+            'company_id': self.env.ref('base.main_company').id,
+        })
+        general_ledger.compute_data_for_report()
+        self.assertTrue(general_ledger.account_ids.mapped('move_line_ids'))
+        return self._get_wal_bytes(location), time.time() - start
+
+    def test_01_report_tables(self):
+        self.assertIn('report_general_ledger_move_line', self.tables)
+        self.assertIn('report_open_items_move_line', self.tables)
+        self.assertIn(
+            self.env['report_general_ledger']._fields[
+                'filter_account_ids'].relation,
+            self.tables)
+
+    def test_02_unlogged_report_tables(self):
+        self.storage._set_report_tables_unlogged(False)
+        self.assertEqual(self._get_persistences(), {'p'})
+        logged_wal, logged_time = self._compute_general_ledger()
+
+        self.storage._set_report_tables_unlogged(True)
+        self.assertEqual(self._get_persistences(), {'u'})
+        unlogged_wal, unlogged_time = self._compute_general_ledger()
+
+        _logger.info(
+            "General Ledger: %s WAL bytes in %.3fs with logged tables, "
+            "%s WAL bytes in %.3fs with unlogged tables",
+            logged_wal, logged_time, unlogged_wal, unlogged_time)
+        self.assertLess(unlogged_wal, logged_wal)
+
+        self.storage._set_report_tables_unlogged(False)
+        self.assertEqual(self._get_persistences(), {'p'})
+
+    def test_03_copy_rows(self):
+        report = self.env['report_trial_balance'].create({
+            'date_from': time.strftime('%Y-01-01'),
+            'date_to': time.strftime('%Y-12-31'),
+            'company_id': self.env.ref('base.main_company').id,
+        })
+        names = ['Tab\tNew line\nBack\\slash', None, 'Plain']
+        ids = self.storage._copy_rows(
+            'report_trial_balance_account',
+            ('report_id', 'code', 'name', 'level'),
+            ((report.id, str(i), name, i) for i, name in enumerate(names)),
+            batch_size=2)
+        self.assertEqual(len(ids), 3)
+        lines = self.env['report_trial_balance_account'].browse(ids)
+        self.assertEqual(lines.mapped('report_id'), report)
+        self.assertEqual([line.name for line in lines],
+                         ['Tab\tNew line\nBack\\slash', False, 'Plain'])
+        self.assertEqual(lines.mapped('level'), [0, 1, 2])
+        self.assertEqual(lines.mapped('create_uid'), self.env.user)
+        self.assertEqual(report.account_ids, lines)
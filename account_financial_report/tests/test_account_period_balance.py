@@ -0,0 +1,129 @@
+# Copyright 2018 Tecnativa
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo.tests import common
+
+
+@common.at_install(False)
+@common.post_install(True)
+class TestAccountPeriodBalance(common.TransactionCase):
+
+    def setUp(self):
+        super(TestAccountPeriodBalance, self).setUp()
+        self.period_balance_model = self.env['account.period.balance']
+        self.receivable_account = self.env['account.account'].search([
+            ('user_type_id.name', '=', 'Receivable')
+            ], limit=1)
+        self.income_account = self.env['account.account'].search([
+            ('user_type_id.name', '=', 'Income')
+            ], limit=1)
+        self.journal = self.env['account.journal'].search([
+            ('code', '=', 'MISC')])
+        self.partner = self.env.ref('base.res_partner_12')
+
+    def _add_move(self, date, amount):
+        return self.env['account.move'].create({
+            'journal_id': self.journal.id,
+            'partner_id': self.partner.id,
+            'date': date,
+            'line_ids': [
+                (0, 0, {
+                    'name': 'period balance',
+                    'debit': amount,
+                    'credit': 0,
+                    'partner_id': self.partner.id,
+                    'account_id': self.receivable_account.id}),
+                (0, 0, {
+                    'name': 'period balance',
+                    'debit': 0,
+                    'credit': amount,
+                    'account_id': self.income_account.id}),
+            ]})
+
+    def _get_balance(self, date, posted):
+        rows = self.period_balance_model.search([
+            ('account_id', '=', self.receivable_account.id),
+            ('partner_id', '=', self.partner.id),
+            ('date', '=', date),
+            ('posted', '=', posted),
+        ])
+        rows.invalidate_cache()
+        return sum(rows.mapped('balance'))
+
+    def _get_snapshot(self):
+        self.env.cr.execute("""
+            SELECT company_id, account_id, partner_id, currency_id, date,
+                posted, debit, credit, balance, amount_currency
+            FROM account_period_balance
+            WHERE debit != 0 OR credit != 0 OR amount_currency != 0
+            ORDER BY 1, 2, 3, 4, 5, 6
+        """)
+        return self.env.cr.fetchall()
+
+    def test_01_move_life_cycle(self):
+        draft_before = self._get_balance('2015-03-01', False)
+        posted_before = self._get_balance('2015-03-01', True)
+
+        move = self._add_move('2015-03-15', 100)
+        self.assertEqual(
+            self._get_balance('2015-03-01', False), draft_before + 100)
+
+        move.post()
+        self.assertEqual(
+            self._get_balance('2015-03-01', False), draft_before)
+        self.assertEqual(
+            self._get_balance('2015-03-01', True), posted_before + 100)
+
+        move.button_cancel()
+        move.write({'date': '2015-04-10'})
+        self.assertEqual(
+            self._get_balance('2015-03-01', False), draft_before)
+        self.assertEqual(
+            self._get_balance('2015-03-01', True), posted_before)
+        self.assertEqual(self._get_balance('2015-04-01', False), 100)
+
+        move.unlink()
+        self.assertEqual(self._get_balance('2015-04-01', False), 0)
+
+    def test_02_incremental_equals_rebuild(self):
+        move = self._add_move('2015-05-20', 250)
+        move.post()
+        move.button_cancel()
+        receivable_line = move.line_ids.filtered(
+            lambda l: l.account_id == self.receivable_account)
+        income_line = move.line_ids - receivable_line
+        move.write({'line_ids': [
+            (1, receivable_line.id, {'debit': 300}),
+            (1, income_line.id, {'credit': 300}),
+        ]})
+        move.post()
+        self._add_move('2015-06-02', 75).post()
+        incremental = self._get_snapshot()
+        self.period_balance_model._rebuild()
+        self.assertEqual(incremental, self._get_snapshot())
+
+    def test_03_move_lines_commands(self):
+        move = self._add_move('2015-07-08', 250)
+        # The lines are added once the move is created, with the context of
+        # the caller
+        self.assertFalse(move.env.context.get('skip_period_balance'))
+        income_line = move.line_ids.filtered(
+            lambda l: l.account_id == self.income_account)
+        move.write({'line_ids': [
+            (2, income_line.id),
+            (0, 0, {
+                'name': 'period balance',
+                'debit': 0,
+                'credit': 100,
+                'account_id': self.income_account.id}),
+            (0, 0, {
+                'name': 'period balance',
+                'debit': 0,
+                'credit': 150,
+                'partner_id': self.partner.id,
+                'account_id': self.income_account.id}),
+        ]})
+        move.post()
+        incremental = self._get_snapshot()
+        self.period_balance_model._rebuild()
+        self.assertEqual(incremental, self._get_snapshot())
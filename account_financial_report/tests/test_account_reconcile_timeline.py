@@ -0,0 +1,144 @@
+# Copyright 2018 Tecnativa
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo.tests import common
+
+
+@common.at_install(False)
+@common.post_install(True)
+class TestAccountReconcileTimeline(common.TransactionCase):
+
+    def setUp(self):
+        super(TestAccountReconcileTimeline, self).setUp()
+        self.timeline_model = self.env['account.reconcile.timeline']
+        self.receivable_account = self.env['account.account'].search([
+            ('user_type_id.name', '=', 'Receivable')
+            ], limit=1)
+        self.income_account = self.env['account.account'].search([
+            ('user_type_id.name', '=', 'Income')
+            ], limit=1)
+        self.journal = self.env['account.journal'].search([
+            ('code', '=', 'MISC')])
+        self.partner = self.env.ref('base.res_partner_12')
+
+    def _add_move(self, date, amount):
+        """ Add a posted move of `amount` on the receivable account (a
+        payment if negative) and return its receivable line.
+        """
+        move = self.env['account.move'].create({
+            'journal_id': self.journal.id,
+            'partner_id': self.partner.id,
+            'date': date,
+            'line_ids': [
+                (0, 0, {
+                    'name': 'reconcile timeline',
+                    'debit': max(amount, 0),
+                    'credit': max(-amount, 0),
+                    'partner_id': self.partner.id,
+                    'account_id': self.receivable_account.id}),
+                (0, 0, {
+                    'name': 'reconcile timeline',
+                    'debit': max(-amount, 0),
+                    'credit': max(amount, 0),
+                    'account_id': self.income_account.id}),
+            ]})
+        move.post()
+        return move.line_ids.filtered(
+            lambda line: line.account_id == self.receivable_account)
+
+    def _get_timeline(self):
+        self.env.cr.execute("""
+            SELECT partial_id, move_line_id, date, amount, amount_currency,
+                currency_id
+            FROM account_reconcile_timeline
+            ORDER BY 1, 2
+        """)
+        return self.env.cr.fetchall()
+
+    def _get_open_residual(self, date_at, move_line):
+        report = self.env['report_open_items'].create({
+            'date_at': date_at,
+            'company_id': move_line.company_id.id,
+            'filter_account_ids': [(6, 0, self.receivable_account.ids)],
+            'filter_partner_ids': [(6, 0, self.partner.ids)],
+        })
+        report.compute_data_for_report()
+        lines = self.env['report_open_items_move_line'].search([
+            ('report_partner_id.report_account_id.report_id', '=', report.id),
+            ('move_line_id', '=', move_line.id),
+        ])
+        return sum(lines.mapped('amount_residual'))
+
+    def test_01_partial_life_cycle(self):
+        invoice_line = self._add_move('2015-03-15', 100)
+        payment_line = self._add_move('2015-04-10', -60)
+        (invoice_line | payment_line).reconcile()
+        partial = invoice_line.matched_credit_ids
+        rows = self.timeline_model.search([('partial_id', '=', partial.id)])
+        self.assertEqual(rows.mapped('move_line_id'),
+                         invoice_line | payment_line)
+        self.assertEqual(set(rows.mapped('date')), {'2015-04-10'})
+        self.assertEqual(rows.mapped('amount'), [60, 60])
+
+        self.assertEqual(self._get_open_residual('2015-03-31', invoice_line),
+                         100)
+        self.assertEqual(self._get_open_residual('2015-04-30', invoice_line),
+                         40)
+
+        # The partial follows the date of its journal items
+        payment_line.move_id.button_cancel()
+        payment_line.move_id.write({'date': '2015-05-05'})
+        rows.invalidate_cache()
+        self.assertEqual(set(rows.mapped('date')), {'2015-05-05'})
+        self.assertEqual(self._get_open_residual('2015-04-30', invoice_line),
+                         100)
+
+        maintained = self._get_timeline()
+        self.timeline_model._rebuild()
+        self.assertEqual(maintained, self._get_timeline())
+
+        (invoice_line | payment_line).remove_move_reconcile()
+        self.assertFalse(rows.exists())
+
+    def test_02_open_items_of_reconciled_lines(self):
+        invoice_line = self._add_move('2015-03-15', 100)
+        payment_line = self._add_move('2015-04-10', -100)
+        (invoice_line | payment_line).reconcile()
+        self.assertTrue(invoice_line.reconciled)
+        # Fully reconciled now, but still open before the payment
+        self.assertEqual(self._get_open_residual('2015-03-31', invoice_line),
+                         100)
+        self.assertEqual(self._get_open_residual('2015-04-30', invoice_line),
+                         0)
+
+    def test_03_open_items_totals(self):
+        invoice_line = self._add_move('2015-03-15', 100)
+        payment_line = self._add_move('2015-04-10', -60)
+        (invoice_line | payment_line).reconcile()
+        self._add_move('2015-04-20', 30)
+        report = self.env['report_open_items'].create({
+            'date_at': '2015-04-30',
+            'company_id': invoice_line.company_id.id,
+            'filter_account_ids': [(6, 0, self.receivable_account.ids)],
+        })
+        report.compute_data_for_report()
+        self.assertTrue(report.account_ids)
+        for account in report.account_ids:
+            self.assertTrue(account.partner_ids)
+            for partner in account.partner_ids:
+                self.assertTrue(partner.move_line_ids)
+                self.assertAlmostEqual(
+                    partner.final_amount_residual,
+                    sum(partner.move_line_ids.mapped('amount_residual')))
+                self.assertAlmostEqual(
+                    partner.final_amount_total_due,
+                    sum(partner.move_line_ids.mapped('amount_total_due')))
+            self.assertAlmostEqual(
+                account.final_amount_residual,
+                sum(account.partner_ids.mapped('final_amount_residual')))
+        partner_line = report.account_ids.mapped('partner_ids').filtered(
+            lambda line: line.partner_id == self.partner)
+        self.assertIn(invoice_line, partner_line.move_line_ids.mapped(
+            'move_line_id'))
+        self.assertNotIn(payment_line, partner_line.move_line_ids.mapped(
+            'move_line_id'))
@@ -154,6 +154,37 @@ class TestGeneralLedgerReport(common.TransactionCase):
             ])
         return lines
 
+    def _count_relation_scans(self, query, params, relation):
+        """Count the plan nodes reading the given table"""
+        self.env.cr.execute('EXPLAIN (FORMAT JSON) ' + query, params)
+        nodes = [self.env.cr.fetchone()[0][0]['Plan']]
+        count = 0
+        while nodes:
+            node = nodes.pop()
+            if node.get('Relation Name') == relation:
+                count += 1
+            nodes += node.get('Plans', [])
+        return count
+
+    def test_00_single_scan_sum_amounts(self):
+        company = self.env.ref('base.main_company')
+        for only_posted_moves in (True, False):
+            general_ledger = self.env['report_general_ledger'].create({
+                'date_from': self.fy_date_start,
+                'date_to': self.fy_date_end,
+                'only_posted_moves': only_posted_moves,
+                'company_id': company.id,
+                'fy_start_date': self.fy_date_start,
+            })
+            queries = [
+                general_ledger._get_inject_account_query(),
+                general_ledger._get_inject_partner_query(),
+            ]
+            for query, params in queries:
+                self.assertEqual(
+                    self._count_relation_scans(
+                        query, params, 'account_move_line'), 1)
+
     def test_01_account_balance(self):
         # Generate the general ledger line
         lines = self._get_report_lines()
@@ -467,3 +498,257 @@ class TestGeneralLedgerReport(common.TransactionCase):
         self.assertEqual(lines['unaffected'].final_debit, 0)
         self.assertEqual(lines['unaffected'].final_credit, 0)
         self.assertEqual(lines['unaffected'].final_balance, 500)
+
+    def test_05_streamed_move_lines(self):
+        self._add_move(
+            date=self.previous_fy_date_end,
+            receivable_debit=1000,
+            receivable_credit=0,
+            income_debit=0,
+            income_credit=1000
+        )
+        self._add_move(
+            date=self.fy_date_start,
+            receivable_debit=300,
+            receivable_credit=0,
+            income_debit=0,
+            income_credit=300
+        )
+        self._add_move(
+            date=self.fy_date_end,
+            receivable_debit=0,
+            receivable_credit=100,
+            income_debit=100,
+            income_credit=0
+        )
+        company = self.env.ref('base.main_company')
+        vals = {
+            'date_from': self.fy_date_start,
+            'date_to': self.fy_date_end,
+            'only_posted_moves': True,
+            'company_id': company.id,
+            'fy_start_date': self.fy_date_start,
+        }
+        general_ledger = self.env['report_general_ledger'].create(vals)
+        general_ledger.compute_data_for_report()
+        stored_lines = []
+        for account in general_ledger.account_ids:
+            sections = account.partner_ids or account
+            for section in sections:
+                for line in section.move_line_ids:
+                    stored_lines.append((
+                        account.account_id.id,
+                        section.partner_id.id if section != account
+                        else None,
+                        line.move_line_id.id,
+                        line.cumul_balance,
+                    ))
+
+        vals['stream_move_lines'] = True
+        streamed_ledger = self.env['report_general_ledger'].create(vals)
+        streamed_ledger.compute_data_for_report()
+        self.assertFalse(self.env['report_general_ledger_move_line'].search([
+            ('report_account_id.report_id', '=', streamed_ledger.id),
+        ]))
+        streamed_lines = []
+        report_account_model = self.env['report_general_ledger_account']
+        report_partner_model = self.env['report_general_ledger_partner']
+        for line in streamed_ledger._stream_move_lines(batch_size=2):
+            partner = report_partner_model.browse(line['report_partner_id'])
+            streamed_lines.append((
+                report_account_model.browse(
+                    line['report_account_id']).account_id.id,
+                partner.partner_id.id if partner else None,
+                line['move_line_id'],
+                float(line['cumul_balance']),
+            ))
+        self.assertTrue(streamed_lines)
+        self.assertEqual(stored_lines, streamed_lines)
+
+    def test_06_parallel_equals_serial(self):
+        """ The shards are computed by the workers, on the committed demo
+        data.
+        """
+        self.assertFalse(
+            self.env['account.ledger.change']._has_pending_changes())
+        company = self.env.ref('base.main_company')
+        vals = {
+            'date_from': self.fy_date_start,
+            'date_to': self.fy_date_end,
+            'only_posted_moves': False,
+            'company_id': company.id,
+            'fy_start_date': self.fy_date_start,
+        }
+        results = []
+        for parallel_workers in (0, 3):
+            vals['parallel_workers'] = parallel_workers
+            general_ledger = self.env['report_general_ledger'].create(vals)
+            general_ledger.compute_data_for_report(with_line_details=False)
+            accounts = [(
+                account.account_id.id,
+                account.initial_balance,
+                account.final_debit,
+                account.final_credit,
+                account.final_balance,
+                [(partner.partner_id.id,
+                  partner.initial_balance,
+                  partner.final_balance)
+                 for partner in account.partner_ids],
+            ) for account in general_ledger.account_ids]
+            results.append(accounts)
+        self.assertTrue(results[0])
+        self.assertEqual(results[0], results[1])
+
+        # Without partner accounts, there is no partner shard to compute
+        vals['filter_account_ids'] = [(6, 0, self.income_account.ids)]
+        general_ledger = self.env['report_general_ledger'].create(vals)
+        general_ledger.compute_data_for_report(with_line_details=False)
+        self.assertEqual(general_ledger.account_ids.mapped('account_id'),
+                         self.income_account)
+        self.assertFalse(general_ledger.account_ids.mapped('partner_ids'))
+
+    def test_07_html_lines_pages(self):
+        for date in (self.fy_date_start, self.fy_date_end):
+            self._add_move(
+                date=date,
+                receivable_debit=100,
+                receivable_credit=0,
+                income_debit=0,
+                income_credit=100
+            )
+        company = self.env.ref('base.main_company')
+        general_ledger = self.env['report_general_ledger'].create({
+            'date_from': self.fy_date_start,
+            'date_to': self.fy_date_end,
+            'only_posted_moves': True,
+            'company_id': company.id,
+            'fy_start_date': self.fy_date_start,
+        })
+        general_ledger.compute_data_for_report()
+        html = general_ledger.with_context(
+            active_id=general_ledger.id).get_html()['html']
+        self.assertIn(b'o_account_financial_reports_load_lines', html)
+
+        report_account = general_ledger.account_ids.filtered(
+            lambda a: a.account_id == self.income_account)
+        expected_ids = report_account.move_line_ids.ids
+        self.assertTrue(len(expected_ids) >= 2)
+        line_ids = []
+        last_line_id = 0
+        has_more = True
+        while has_more:
+            result = general_ledger.get_html_lines(
+                report_account.id, last_line_id=last_line_id, limit=1)
+            line_ids.append(result['last_line_id'])
+            last_line_id = result['last_line_id']
+            has_more = result['has_more']
+        self.assertEqual(line_ids, sorted(expected_ids))
+
+    def test_08_centralization_periods(self):
+        self.income_account.centralized = True
+        for date in ('2016-01-04', '2016-01-05', '2016-02-10'):
+            self._add_move(
+                date=date,
+                receivable_debit=100,
+                receivable_credit=0,
+                income_debit=0,
+                income_credit=100
+            )
+        company = self.env.ref('base.main_company')
+        results = {}
+        for period in ('day', 'week', 'month', 'quarter'):
+            general_ledger = self.env['report_general_ledger'].create({
+                'date_from': '2016-01-04',
+                'date_to': self.fy_date_end,
+                'only_posted_moves': True,
+                'company_id': company.id,
+                'fy_start_date': self.fy_date_start,
+                'centralize': True,
+                'centralization_period': period,
+            })
+            general_ledger.compute_data_for_report()
+            report_account = general_ledger.account_ids.filtered(
+                lambda a: a.account_id == self.income_account)
+            lines = report_account.move_line_ids
+            self.assertTrue(all(not line.move_line_id for line in lines))
+            results[period] = {
+                'dates': set(lines.mapped('date')),
+                'credit': sum(lines.mapped('credit')),
+                'final_balance': lines[-1:].cumul_balance,
+            }
+        self.assertTrue(
+            {'2016-01-04', '2016-01-05', '2016-02-10'}.issubset(
+                results['day']['dates']))
+        self.assertTrue(
+            {'2016-01-10', '2016-02-14'}.issubset(results['week']['dates']))
+        self.assertTrue(
+            {'2016-01-31', '2016-02-29'}.issubset(results['month']['dates']))
+        self.assertIn('2016-03-31', results['quarter']['dates'])
+        for period in ('week', 'month', 'quarter'):
+            self.assertEqual(results[period]['credit'],
+                             results['day']['credit'])
+            self.assertEqual(results[period]['final_balance'],
+                             results['day']['final_balance'])
+
+    def test_09_split_shards(self):
+        general_ledger = self.env['report_general_ledger'].new({
+            'parallel_workers': 3,
+        })
+        self.assertEqual(general_ledger._split_shards([]), [])
+        self.assertEqual(general_ledger._split_shards([1, 2]), [[1], [2]])
+        self.assertEqual(general_ledger._split_shards([1, 2, 3, 4, 5]),
+                         [[1, 2], [3, 4], [5]])
+        self.assertEqual(general_ledger._fetch_sharded_rows(
+            "SELECT 1", {}, []), [])
+
+    def test_10_parallel_workers_fallback(self):
+        """ The workers don't see the journal items of the current
+        transaction: the shards are computed on the current cursor.
+        """
+        general_ledger = self.env['report_general_ledger'].create({
+            'date_from': self.fy_date_start,
+            'date_to': self.fy_date_end,
+            'only_posted_moves': False,
+            'company_id': self.env.ref('base.main_company').id,
+            'fy_start_date': self.fy_date_start,
+            'parallel_workers': 2,
+        })
+        account_ids = self.env['account.account'].search(
+            [('company_id', '=', general_ledger.company_id.id)], order='id'
+        ).ids
+        shards_params = [
+            {'shard_account_ids': shard}
+            for shard in general_ledger._split_shards(account_ids)
+        ]
+        query, params = general_ledger._get_account_values_query(
+            sharded=True)
+
+        def get_amounts(rows):
+            # Without the creation date of the worker transactions
+            return [row[:2] + row[3:] for row in rows]
+
+        self.assertEqual(
+            get_amounts(general_ledger._fetch_sharded_rows_in_workers(
+                query, params, shards_params)),
+            get_amounts(general_ledger._fetch_sharded_rows_serially(
+                query, params, shards_params)))
+
+        self._add_move(
+            date=self.fy_date_start,
+            receivable_debit=1000,
+            receivable_credit=0,
+            income_debit=0,
+            income_credit=1000
+        )
+        self.assertTrue(
+            self.env['account.ledger.change']._has_pending_changes())
+        rows = general_ledger._fetch_sharded_rows(
+            query, params, shards_params)
+        self.assertEqual(
+            get_amounts(rows),
+            get_amounts(general_ledger._fetch_sharded_rows_serially(
+                query, params, shards_params)))
+        self.assertNotEqual(
+            get_amounts(rows),
+            get_amounts(general_ledger._fetch_sharded_rows_in_workers(
+                query, params, shards_params)))
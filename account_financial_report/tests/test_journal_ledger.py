@@ -364,3 +364,46 @@ class TestJournalReport(TransactionCase):
 
         self.check_report_journal_debit_credit(report, 250, 250)
         self.check_report_journal_debit_credit_taxes(report, 300, 0, 50, 0)
+
+    def test_04_test_taxes_description(self):
+        invoice_values = {
+            'journal_id': self.journal_sale.id,
+            'partner_id': self.partner_2.id,
+            'type': 'out_invoice',
+            'invoice_line_ids': [
+                (0, 0, {
+                    'quantity': 1.0,
+                    'price_unit': 100,
+                    'account_id': self.receivable_account.id,
+                    'name': "Test",
+                    'invoice_line_tax_ids': [(6, 0, [self.tax_15_s.id])],
+                }),
+                (0, 0, {
+                    'quantity': 1.0,
+                    'price_unit': 100,
+                    'account_id': self.receivable_account.id,
+                    'name': "Test",
+                    'invoice_line_tax_ids': [(6, 0, [
+                        self.tax_20_s.id, self.tax_15_s.id
+                    ])],
+                })
+            ]
+        }
+        invoice = self.InvoiceObj.create(invoice_values)
+        invoice.action_invoice_open()
+
+        report = self.ReportJournalLedger.create({
+            'date_from': self.fy_date_start,
+            'date_to': self.fy_date_end,
+            'company_id': self.company.id,
+            'journal_ids': [(6, 0, self.journal_sale.ids)]
+        })
+        report.compute_data_for_report()
+
+        descriptions = set(report.report_move_line_ids.filtered(
+            lambda l: not l.tax_id and l.taxes_description
+        ).mapped('taxes_description'))
+        self.assertEqual(descriptions, {
+            self.tax_15_s.name,
+            '%s, %s' % (self.tax_15_s.name, self.tax_20_s.name),
+        })
@@ -0,0 +1,198 @@
+# Copyright 2018 Tecnativa
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo.tests import common
+
+
+@common.at_install(False)
+@common.post_install(True)
+class TestPartnerOpenBalance(common.TransactionCase):
+
+    def setUp(self):
+        super(TestPartnerOpenBalance, self).setUp()
+        self.receivable_account = self.env['account.account'].search([
+            ('user_type_id.name', '=', 'Receivable')
+            ], limit=1)
+        self.income_account = self.env['account.account'].search([
+            ('user_type_id.name', '=', 'Income')
+            ], limit=1)
+        self.journal = self.env['account.journal'].search([
+            ('code', '=', 'MISC')])
+        self.partner = self.env.ref('base.res_partner_12')
+
+    def _add_move(self, partner, date, date_maturity, amount):
+        """ Add a posted move of `amount` on the receivable account of
+        `partner` and return its receivable line.
+        """
+        move = self.env['account.move'].create({
+            'journal_id': self.journal.id,
+            'partner_id': partner.id,
+            'date': date,
+            'line_ids': [
+                (0, 0, {
+                    'name': 'open balance',
+                    'debit': max(amount, 0),
+                    'credit': max(-amount, 0),
+                    'date_maturity': date_maturity,
+                    'partner_id': partner.id,
+                    'account_id': self.receivable_account.id}),
+                (0, 0, {
+                    'name': 'open balance',
+                    'debit': max(-amount, 0),
+                    'credit': max(amount, 0),
+                    'account_id': self.income_account.id}),
+            ]})
+        move.post()
+        return move.line_ids.filtered(
+            lambda line: line.account_id == self.receivable_account)
+
+    def _get_aged_partner_balance(self, date_at, partners, **options):
+        """ Return the residual and aging amounts of the partners in the
+        Aged Partner Balance report.
+        """
+        vals = {
+            'date_at': date_at,
+            'only_posted_moves': True,
+            'company_id': self.receivable_account.company_id.id,
+            'filter_account_ids': [(6, 0, self.receivable_account.ids)],
+            'filter_partner_ids': [(6, 0, partners.ids)],
+        }
+        vals.update(options)
+        report = self.env['report_aged_partner_balance'].create(vals)
+        report.compute_data_for_report()
+        return {
+            line.report_partner_id.partner_id.id: tuple(
+                round(amount, 2) for amount in
+                [line.amount_residual] + line.amount_ids.mapped('amount'))
+            for line in report.account_ids.mapped('partner_ids.line_ids')
+        }
+
+    def _get_open_balance(self, date_at, partners, **options):
+        """ Return the residual and aging amounts of the partners in their
+        open balance.
+        """
+        balances = partners._get_open_balance(
+            date_at=date_at, company=self.receivable_account.company_id,
+            **options)
+        return {
+            partner_id: tuple(
+                round(amount, 2) for amount in
+                [balance['amount_residual']] +
+                [bucket['amount'] for bucket in balance['aging']])
+            for partner_id, balance in balances.items()
+        }
+
+    def _get_table_counts(self, tables):
+        counts = {}
+        for table in tables:
+            self.env.cr.execute("SELECT COUNT(*) FROM %s" % table)
+            counts[table] = self.env.cr.fetchone()[0]
+        return counts
+
+    def _count_queries(self, method, *args, **kwargs):
+        count = self.env.cr.sql_log_count
+        method(*args, **kwargs)
+        return self.env.cr.sql_log_count - count
+
+    def test_01_same_as_aged_partner_balance(self):
+        invoice_line = self._add_move(
+            self.partner, '2015-01-10', '2015-02-10', 300)
+        payment_line = self._add_move(
+            self.partner, '2015-03-01', '2015-03-01', -100)
+        (invoice_line | payment_line).reconcile()
+        open_line = self._add_move(
+            self.partner, '2015-04-15', '2015-05-15', 50)
+        self._add_move(self.partner, '2015-06-15', '2015-06-30', 20)
+
+        date_at = '2015-05-31'
+        self.assertEqual(
+            self._get_open_balance(date_at, self.partner)[self.partner.id],
+            self._get_aged_partner_balance(
+                date_at, self.partner)[self.partner.id])
+        balance = self.partner._get_open_balance(
+            date_at=date_at,
+            company=self.receivable_account.company_id)[self.partner.id]
+        self.assertAlmostEqual(balance['amount_residual'], 250)
+        self.assertEqual(
+            [bucket['name'] for bucket in balance['aging']],
+            ['Current', '1 - 30 d.', '31 - 60 d.', '61 - 90 d.',
+             '91 - 120 d.', '> 120 d.'])
+        self.assertAlmostEqual(balance['aging'][1]['amount'], 50)
+        self.assertAlmostEqual(balance['aging'][4]['amount'], 200)
+        self.assertEqual(
+            [line['move_line_id'] for line in balance['move_lines']],
+            [invoice_line.id, open_line.id])
+        self.assertAlmostEqual(balance['move_lines'][0]['amount_residual'],
+                               200)
+
+        # A partner without open items has a zero balance
+        other_partner = self.env.ref('base.res_partner_2')
+        balances = (self.partner | other_partner)._get_open_balance(
+            date_at=date_at, company=self.receivable_account.company_id)
+        self.assertEqual(balances[other_partner.id]['move_lines'], [])
+        self.assertEqual(balances[other_partner.id]['amount_residual'], 0)
+
+    def test_02_configured_buckets(self):
+        """ The buckets limits and the aging date are configurable. """
+        self._add_move(self.partner, '2015-01-10', '2015-05-20', 300)
+        self._add_move(self.partner, '2015-04-15', '2015-05-15', 50)
+        self._add_move(self.partner, '2015-05-20', '2015-06-30', 20)
+        date_at = '2015-05-31'
+        options = {'aging_days': '15,45,100', 'aging_date': 'date'}
+        open_balance = self._get_open_balance(
+            date_at, self.partner, **options)[self.partner.id]
+        self.assertEqual(
+            open_balance,
+            self._get_aged_partner_balance(
+                date_at, self.partner, **options)[self.partner.id])
+        # By document date: 11, 46 and 141 days
+        self.assertEqual(open_balance, (370, 0, 20, 0, 50, 300))
+        # By due date: 11, 16 days and not due
+        options['aging_date'] = 'date_due'
+        self.assertEqual(
+            self._get_open_balance(date_at, self.partner, **options)[
+                self.partner.id],
+            (370, 20, 300, 50, 0, 0))
+        # The aging date is written in the query: only known values pass
+        with self.assertRaises(ValueError):
+            self.partner._get_open_balance(
+                date_at=date_at, aging_date='date; DROP TABLE res_partner')
+
+    def test_03_queries(self):
+        """ The open balance reads the journal items of all the partners in
+        one query, and doesn't fill the report tables.
+        """
+        partners = self.env['res.partner'].search([], limit=20)
+        for partner in partners:
+            self._add_move(partner, '2015-06-01', '2015-06-30', 100)
+        date_at = '2015-12-31'
+        company = self.receivable_account.company_id
+        report_tables = (
+            'report_open_items',
+            'report_open_items_account',
+            'report_open_items_partner',
+            'report_open_items_move_line',
+        )
+        report_counts = self._get_table_counts(report_tables)
+        # Fill the caches (system parameters, user) before counting
+        self.partner._get_open_balance(date_at=date_at, company=company)
+
+        queries = self._count_queries(
+            self.partner._get_open_balance, date_at=date_at, company=company)
+        self.assertEqual(
+            self._count_queries(
+                partners._get_open_balance, date_at=date_at,
+                company=company),
+            queries)
+        report = self.env['report_open_items'].new({
+            'date_at': date_at,
+            'only_posted_moves': True,
+            'company_id': company.id,
+            'filter_account_ids': [(6, 0, self.receivable_account.ids)],
+            'filter_partner_ids': [(6, 0, partners.ids)],
+        })
+        buckets = self.env['report_aged_partner_balance']._get_aging_buckets()
+        self.assertEqual(
+            self._count_queries(report._get_partners_open_items, buckets), 1)
+        self.assertEqual(
+            self._get_table_counts(report_tables), report_counts)
@@ -0,0 +1,119 @@
+# Copyright 2018 Tecnativa
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from datetime import date, timedelta
+
+from odoo.tests import common
+
+from ..models.account_move import REPORTING_INDEXES
+
+
+@common.at_install(False)
+@common.post_install(True)
+class TestReportingIndexes(common.TransactionCase):
+
+    def setUp(self):
+        super(TestReportingIndexes, self).setUp()
+        self.move_line_model = self.env['account.move.line']
+
+    def _create_dataset(self):
+        """ Spread journal items of two accounts over a year. """
+        receivable_account = self.env['account.account'].search([
+            ('user_type_id.name', '=', 'Receivable')
+        ], limit=1)
+        income_account = self.env['account.account'].search([
+            ('user_type_id.name', '=', 'Income')
+        ], limit=1)
+        journal = self.env['account.journal'].search([
+            ('code', '=', 'MISC')], limit=1)
+        partner = self.env.ref('base.res_partner_12')
+        start = date(2016, 1, 1)
+        for day in range(0, 366, 2):
+            self.env['account.move'].create({
+                'journal_id': journal.id,
+                'date': (start + timedelta(days=day)).isoformat(),
+                'line_ids': [
+                    (0, 0, {
+                        'name': 'index',
+                        'debit': 10,
+                        'credit': 0,
+                        'partner_id': partner.id,
+                        'account_id': receivable_account.id}),
+                    (0, 0, {
+                        'name': 'index',
+                        'debit': 0,
+                        'credit': 10,
+                        'account_id': income_account.id}),
+                ]})
+        self.env.cr.execute("ANALYZE account_move_line")
+        return receivable_account, partner
+
+    def _get_used_indexes(self, query, params):
+        """ Return the indexes of the plan of `query`, sequential scans
+        being disabled as the dataset is small.
+        """
+        self.env.cr.execute("SET LOCAL enable_seqscan = off")
+        self.env.cr.execute("EXPLAIN (FORMAT JSON) " + query, params)
+        plans = [self.env.cr.fetchone()[0][0]['Plan']]
+        indexes = set()
+        while plans:
+            plan = plans.pop()
+            if 'Index Name' in plan:
+                indexes.add(plan['Index Name'])
+            plans.extend(plan.get('Plans', []))
+        self.env.cr.execute("RESET enable_seqscan")
+        return indexes
+
+    def test_01_indexes_installed(self):
+        self.assertFalse(self.move_line_model._get_missing_reporting_indexes())
+        self.env.cr.execute(
+            "SELECT indexname FROM pg_indexes WHERE indexname IN %s",
+            (tuple(REPORTING_INDEXES),))
+        self.assertEqual(
+            len(self.env.cr.fetchall()), len(REPORTING_INDEXES))
+        self.assertFalse(
+            self.move_line_model._check_reporting_indexes()['missing'])
+
+    def test_02_recreate_missing_index(self):
+        name = 'account_move_line_account_id_date_index'
+        self.env.cr.execute("DROP INDEX %s" % name)
+        self.assertEqual(
+            self.move_line_model._check_reporting_indexes()['missing'],
+            [name])
+        self.move_line_model._create_reporting_indexes()
+        self.assertFalse(self.move_line_model._get_missing_reporting_indexes())
+
+    def test_03_general_ledger_query_plans(self):
+        account, partner = self._create_dataset()
+        general_ledger = self.env['report_general_ledger'].create({
+            'date_from': '2016-03-01',
+            'date_to': '2016-03-31',
+            'fy_start_date': '2016-01-01',
+            'company_id': account.company_id.id,
+            'filter_account_ids': [(6, 0, account.ids)],
+            'filter_partner_ids': [(6, 0, partner.ids)],
+        })
+        indexes = self._get_used_indexes(
+            *general_ledger._get_account_values_query())
+        self.assertIn('account_move_line_account_id_date_index', indexes)
+
+        query, params = general_ledger._get_partner_values_query(
+            sharded=True)
+        params.update({
+            'shard_report_account_ids': [0],
+            'shard_account_ids': account.ids,
+        })
+        indexes = self._get_used_indexes(query, params)
+        self.assertIn(
+            'account_move_line_account_id_partner_id_date_index', indexes)
+
+    def test_04_open_items_query_plan(self):
+        account, partner = self._create_dataset()
+        report = self.env['report_open_items'].create({
+            'date_at': '2016-12-31',
+            'company_id': account.company_id.id,
+        })
+        indexes = self._get_used_indexes(
+            *report._get_open_move_lines_query())
+        self.assertIn('account_move_line_open_items_index', indexes)
+        self.assertIn('account_reconcile_timeline_date_index', indexes)
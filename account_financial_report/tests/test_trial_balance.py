@@ -3,7 +3,11 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 
+from odoo import api, sql_db
+from odoo.exceptions import UserError
 from odoo.tests import common
 from . import abstract_test_foreign_currency as a_t_f_c
 
@@ -492,3 +496,380 @@ class TestTrialBalanceReport(common.TransactionCase):
         self.assertEqual(lines['partner_receivable'].debit, 0)
         self.assertEqual(lines['partner_receivable'].credit, 2000)
         self.assertEqual(lines['partner_receivable'].final_balance, -1000)
+
+    def test_04_consolidation(self):
+        company = self.env.ref('base.main_company')
+        company_b = self.env['res.company'].create({
+            'name': 'Consolidated Company',
+            'currency_id': self.env.ref('base.EUR').id,
+        })
+        acc_obj = self.env['account.account']
+        receivable_b = acc_obj.create({
+            'code': '100',
+            'name': 'Account 100',
+            'company_id': company_b.id,
+            'user_type_id': self.env.ref(
+                'account.data_account_type_receivable').id,
+            'reconcile': True})
+        income_b = acc_obj.create({
+            'code': '200',
+            'name': 'Account 200',
+            'company_id': company_b.id,
+            'user_type_id': self.env.ref(
+                'account.data_account_type_other_income').id})
+        acc_obj.create({
+            'code': self.account110.code,
+            'name': 'Unaffected Earnings',
+            'company_id': company_b.id,
+            'user_type_id': self.env.ref(
+                'account.data_unaffected_earnings').id})
+        journal_b = self.env['account.journal'].create({
+            'name': 'Consolidated Miscellaneous',
+            'code': 'CMISC',
+            'type': 'general',
+            'company_id': company_b.id,
+        })
+        move = self.env['account.move'].create({
+            'journal_id': journal_b.id,
+            'date': self.date_start,
+            'line_ids': [
+                (0, 0, {
+                    'name': 'consolidated',
+                    'debit': 500,
+                    'credit': 0,
+                    'account_id': receivable_b.id}),
+                (0, 0, {
+                    'name': 'consolidated',
+                    'debit': 0,
+                    'credit': 500,
+                    'account_id': income_b.id}),
+            ]})
+        move.post()
+        self._add_move(
+            date=self.fy_date_start,
+            receivable_debit=1000,
+            receivable_credit=0,
+            income_debit=0,
+            income_credit=1000
+        )
+        trial_balance = self.env['report_trial_balance'].create({
+            'date_from': self.date_start,
+            'date_to': self.date_end,
+            'only_posted_moves': True,
+            'hierarchy_on': 'computed',
+            'company_id': company.id,
+            'fy_start_date': self.fy_date_start,
+            'consolidation_company_ids': [(6, 0, company_b.ids)],
+            'reporting_currency_id': company.currency_id.id,
+        })
+        trial_balance.compute_data_for_report()
+        rate = company_b.currency_id.with_context(
+            date=self.date_end, company_id=company_b.id,
+        ).compute(1.0, company.currency_id, round=False)
+
+        receivable = trial_balance.account_ids.filtered(
+            lambda line: line.code == '100')
+        self.assertEqual(len(receivable), 1)
+        self.assertEqual(receivable.account_id, self.account100)
+        self.assertAlmostEqual(receivable.debit, 1000 + 500 * rate, 2)
+        self.assertAlmostEqual(
+            receivable.final_balance, 1000 + 500 * rate, 2)
+        amounts = {line.company_id: line.debit
+                   for line in receivable.company_ids}
+        self.assertEqual(len(amounts), 2)
+        self.assertAlmostEqual(amounts[company], 1000, 2)
+        self.assertAlmostEqual(amounts[company_b], 500 * rate, 2)
+
+        group1 = trial_balance.account_ids.filtered(
+            lambda line: line.account_group_id == self.group1)
+        self.assertAlmostEqual(group1.debit, 1000 + 500 * rate, 2)
+
+    def test_05_comparison_periods(self):
+        wizard = self.env['trial.balance.report.wizard'].create({
+            'date_from': '2016-01-15',
+            'date_to': '2016-06-30',
+            'comparison_period': 'quarter',
+            'comparison_previous_year': True,
+        })
+        self.assertEqual(wizard._get_comparison_period_dates(), [
+            ('Q1 2016', '2016-01-15', '2016-03-31'),
+            ('Q2 2016', '2016-04-01', '2016-06-30'),
+            ('Q1 2015', '2015-01-15', '2015-03-31'),
+            ('Q2 2015', '2015-04-01', '2015-06-30'),
+        ])
+
+        self._add_move(
+            date=self.previous_fy_date_end,
+            receivable_debit=1000,
+            receivable_credit=0,
+            income_debit=0,
+            income_credit=1000
+        )
+        self._add_move(
+            date=self.fy_date_end,
+            receivable_debit=0,
+            receivable_credit=300,
+            income_debit=300,
+            income_credit=0
+        )
+        company = self.env.ref('base.main_company')
+        trial_balance = self.env['report_trial_balance'].create({
+            'date_from': self.date_start,
+            'date_to': self.date_end,
+            'only_posted_moves': True,
+            'hierarchy_on': 'computed',
+            'company_id': company.id,
+            'fy_start_date': self.fy_date_start,
+            'period_ids': [
+                (0, 0, {'sequence': 0, 'name': '01/2016',
+                        'date_from': '2016-01-01', 'date_to': '2016-01-31'}),
+                (0, 0, {'sequence': 1, 'name': '12/2016',
+                        'date_from': '2016-12-01', 'date_to': '2016-12-31'}),
+                (0, 0, {'sequence': 2, 'name': '12/2015',
+                        'date_from': '2015-12-01', 'date_to': '2015-12-31'}),
+            ],
+        })
+        trial_balance.compute_data_for_report()
+        receivable = trial_balance.account_ids.filtered(
+            lambda line: line.account_id == self.account100)
+        self.assertEqual(
+            receivable.period_ids.mapped('balance'), [0, -300, 1000])
+        self.assertEqual(
+            receivable.period_ids.mapped('credit'), [0, 300, 0])
+        group1 = trial_balance.account_ids.filtered(
+            lambda line: line.account_group_id == self.group1)
+        self.assertEqual(
+            group1.period_ids.mapped('balance'), [0, -300, 1000])
+
+    def test_06_same_totals_as_general_ledger(self):
+        self._add_move(
+            date=self.previous_fy_date_end,
+            receivable_debit=1000,
+            receivable_credit=0,
+            income_debit=0,
+            income_credit=1000
+        )
+        self._add_move(
+            date=self.fy_date_end,
+            receivable_debit=0,
+            receivable_credit=300,
+            income_debit=300,
+            income_credit=0
+        )
+        company = self.env.ref('base.main_company')
+        trial_balance = self.env['report_trial_balance'].create({
+            'date_from': self.date_start,
+            'date_to': self.date_end,
+            'only_posted_moves': True,
+            'hierarchy_on': 'computed',
+            'company_id': company.id,
+            'fy_start_date': self.fy_date_start,
+            'show_partner_details': True,
+        })
+        trial_balance.compute_data_for_report()
+        self.assertFalse(trial_balance.general_ledger_id)
+
+        accounts = self.env['account.account'].search(
+            [('company_id', '=', company.id)])
+        general_ledger = self.env['report_general_ledger'].create(
+            trial_balance._prepare_report_general_ledger(accounts))
+        general_ledger.compute_data_for_report(
+            with_line_details=False, with_partners=True)
+
+        def amounts(line):
+            return (
+                round(line.initial_balance, 2),
+                round(line.final_debit - line.initial_debit, 2),
+                round(line.final_credit - line.initial_credit, 2),
+                round(line.final_balance, 2),
+            )
+
+        expected_accounts = {
+            line.account_id: amounts(line)
+            for line in general_ledger.account_ids
+        }
+        expected_partners = {
+            (line.report_account_id.account_id, line.partner_id):
+                amounts(line)
+            for line in general_ledger.account_ids.mapped('partner_ids')
+        }
+        account_lines = trial_balance.account_ids.filtered('account_id')
+        self.assertEqual(len(account_lines), len(accounts))
+        for line in account_lines:
+            self.assertEqual(
+                (round(line.initial_balance, 2), round(line.debit, 2),
+                 round(line.credit, 2), round(line.final_balance, 2)),
+                expected_accounts.get(line.account_id, (0, 0, 0, 0)))
+        partners = {
+            (line.report_account_id.account_id, line.partner_id):
+                (round(line.initial_balance, 2), round(line.debit, 2),
+                 round(line.credit, 2), round(line.final_balance, 2))
+            for line in account_lines.mapped('partner_ids')
+        }
+        self.assertTrue(partners)
+        self.assertEqual(partners, expected_partners)
+
+    def test_07_account_group_closure(self):
+        closure_obj = self.env['account.group.closure']
+
+        def closure():
+            self.env.cr.execute("""
+                SELECT ancestor_id, descendant_id, depth
+                FROM account_group_closure
+                ORDER BY ancestor_id, descendant_id
+            """)
+            return self.env.cr.fetchall()
+
+        group111 = self.env['account.group'].create({
+            'code_prefix': '111',
+            'name': 'Group 111',
+            'parent_id': self.group11.id,
+        })
+        ancestors = closure_obj.search([('descendant_id', '=', group111.id)])
+        self.assertEqual(
+            {(row.ancestor_id, row.depth) for row in ancestors},
+            {(group111, 0), (self.group11, 1), (self.group1, 2)})
+
+        # Move the subtree of group 11 under group 2
+        self.group11.parent_id = self.group2
+        ancestors = closure_obj.search([('descendant_id', '=', group111.id)])
+        self.assertEqual(
+            {(row.ancestor_id, row.depth) for row in ancestors},
+            {(group111, 0), (self.group11, 1), (self.group2, 2)})
+
+        # Move a group along with its parent
+        (self.group11 | group111).write({'parent_id': self.group1.id})
+        maintained = closure()
+        closure_obj._rebuild()
+        self.assertEqual(maintained, closure())
+
+    def test_08_concurrent_computation(self):
+        """ Trial balances computed on other connections, while this
+        transaction computed one and is still open, don't wait for locks.
+        """
+        company = self.env.ref('base.main_company')
+        vals = {
+            'date_from': self.date_start,
+            'date_to': self.date_end,
+            'only_posted_moves': True,
+            'hierarchy_on': 'relation',
+            'company_id': company.id,
+            'fy_start_date': self.fy_date_start,
+        }
+        trial_balance = self.env['report_trial_balance'].create(vals)
+        trial_balance.compute_data_for_report()
+        self.assertTrue(trial_balance.account_ids.filtered(
+            lambda line: line.account_group_id == self.group1
+        ).compute_account_ids)
+
+        def compute(_index):
+            with api.Environment.manage(), closing(
+                    sql_db.db_connect(self.env.cr.dbname).cursor()) as cr:
+                cr.execute("SET lock_timeout = '5s'")
+                env = api.Environment(cr, self.env.uid, {})
+                report = env['report_trial_balance'].create(vals)
+                report.compute_data_for_report()
+                count = len(report.account_ids)
+                cr.rollback()
+                return count
+
+        with ThreadPoolExecutor(3) as executor:
+            counts = list(executor.map(compute, range(3)))
+        self.assertTrue(all(counts))
+
+    def test_09_account_group_accounts_and_level(self):
+        account = self.env['account.account'].create({
+            'code': '111000',
+            'name': 'Account 111000',
+            'user_type_id': self.env.ref(
+                'account.data_account_type_other_income').id,
+        })
+        self.assertIn(account, self.group1.compute_account_ids)
+        self.assertIn(account, self.group11.compute_account_ids)
+        self.assertNotIn(account, self.group2.compute_account_ids)
+
+        account.code = '211000'
+        self.assertNotIn(account, self.group1.compute_account_ids)
+        self.assertNotIn(account, self.group11.compute_account_ids)
+        self.assertIn(account, self.group2.compute_account_ids)
+
+        group21 = self.env['account.group'].create({
+            'code_prefix': '21',
+            'name': 'Group 21',
+            'parent_id': self.group2.id,
+        })
+        self.assertEqual(group21.compute_account_ids, account)
+        self.assertEqual(group21.parent_path, '%s/%s/' % (
+            self.group2.id, group21.id))
+        self.assertEqual(group21.level, 1)
+
+        self.group2.parent_id = self.group1
+        self.assertEqual(group21.parent_path, '%s/%s/%s/' % (
+            self.group1.id, self.group2.id, group21.id))
+        self.assertEqual(group21.level, 2)
+
+    def test_10_consolidation_of_one_company(self):
+        """ The consolidation of the report company alone has the amounts
+        of its Trial Balance.
+        """
+        self._add_move(
+            date=self.previous_fy_date_end,
+            receivable_debit=1000,
+            receivable_credit=0,
+            income_debit=0,
+            income_credit=1000,
+        )
+        self._add_move(
+            date=self.fy_date_end,
+            receivable_debit=0,
+            receivable_credit=300,
+            income_debit=300,
+            income_credit=0,
+            unaffected_debit=50,
+            unaffected_credit=0,
+        )
+        company = self.env.ref('base.main_company')
+        vals = {
+            'date_from': '2016-06-01',
+            'date_to': self.date_end,
+            'only_posted_moves': True,
+            'hierarchy_on': 'computed',
+            'company_id': company.id,
+            'fy_start_date': self.fy_date_start,
+        }
+        results = []
+        for consolidation_companies in (
+                self.env['res.company'], company):
+            trial_balance = self.env['report_trial_balance'].create(dict(
+                vals,
+                consolidation_company_ids=[
+                    (6, 0, consolidation_companies.ids)],
+            ))
+            trial_balance.compute_data_for_report()
+            results.append({
+                line.code: (
+                    round(line.initial_balance, 2),
+                    round(line.debit, 2),
+                    round(line.credit, 2),
+                    round(line.final_balance, 2),
+                )
+                for line in trial_balance.account_ids.filtered('account_id')
+            })
+        self.assertTrue(results[0][self.account110.code][3])
+        self.assertEqual(results[0], results[1])
+
+    def test_11_consolidation_without_unaffected_earnings(self):
+        company_b = self.env['res.company'].create({
+            'name': 'Company without unaffected earnings',
+        })
+        trial_balance = self.env['report_trial_balance'].create({
+            'date_from': self.date_start,
+            'date_to': self.date_end,
+            'only_posted_moves': True,
+            'hierarchy_on': 'computed',
+            'company_id': self.env.ref('base.main_company').id,
+            'fy_start_date': self.fy_date_start,
+            'consolidation_company_ids': [(6, 0, company_b.ids)],
+        })
+        with self.assertRaises(UserError):
+            trial_balance.compute_data_for_report()
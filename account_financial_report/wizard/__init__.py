@@ -1,3 +1,4 @@
+from . import abstract_wizard
 from . import aged_partner_balance_wizard
 from . import general_ledger_wizard
 from . import journal_ledger_wizard
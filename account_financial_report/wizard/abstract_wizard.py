@@ -0,0 +1,37 @@
+# Copyright 2018 Tecnativa
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import json
+
+from odoo import fields, models
+
+
+class AbstractWizard(models.AbstractModel):
+    """Fields and methods shared by the report wizards."""
+
+    _name = 'account_financial_report_abstract_wizard'
+    _description = 'Abstract Report Wizard'
+
+    run_in_background = fields.Boolean(
+        help='Compute and export the report in background. The file is '
+             'attached to a report job and you are notified when it is '
+             'ready.'
+    )
+
+    def _export_in_background(self, report_model, vals, report_type):
+        """Enqueue a job computing the report and return its form."""
+        self.ensure_one()
+        job = self.env['account.financial.report.job'].create({
+            'name': self._description.replace(' Wizard', ''),
+            'company_id': vals.get('company_id'),
+            'report_model': report_model,
+            'report_vals': json.dumps(vals),
+            'report_type': report_type,
+        })
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': job._name,
+            'res_id': job.id,
+            'view_mode': 'form',
+            'target': 'current',
+        }
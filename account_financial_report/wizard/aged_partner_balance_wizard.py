@@ -4,7 +4,8 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
 from datetime import datetime
-from odoo import api, fields, models
+from odoo import api, fields, models, _
+from odoo.exceptions import ValidationError
 from odoo.tools.safe_eval import safe_eval
 from odoo.tools import pycompat
 
@@ -14,6 +15,7 @@ class AgedPartnerBalanceWizard(models.TransientModel):
 
     _name = 'aged.partner.balance.wizard'
     _description = 'Aged Partner Balance Wizard'
+    _inherit = 'account_financial_report_abstract_wizard'
 
     company_id = fields.Many2one(
         comodel_name='res.company',
@@ -38,6 +40,29 @@ class AgedPartnerBalanceWizard(models.TransientModel):
         string='Filter partners',
     )
     show_move_line_details = fields.Boolean()
+    aging_days = fields.Char(
+        string='Aging buckets',
+        default=lambda self: self.env['ir.config_parameter'].sudo().get_param(
+            'account_financial_report.aging_days', default='30,60,90,120'),
+        help="Comma separated limits, in days, of the aging buckets.",
+    )
+    aging_date = fields.Selection(
+        selection=[('date_due', 'Due date'), ('date', 'Document date')],
+        string='Aging based on',
+        required=True,
+        default='date_due',
+    )
+
+    @api.constrains('aging_days')
+    def _check_aging_days(self):
+        for wizard in self:
+            try:
+                self.env['report_aged_partner_balance']._get_aging_buckets(
+                    wizard.aging_days)
+            except ValueError:
+                raise ValidationError(_(
+                    "The aging buckets must be a comma separated list of "
+                    "days, e.g. 30,60,90,120."))
 
     @api.onchange('receivable_accounts_only', 'payable_accounts_only')
     def onchange_type_accounts_only(self):
@@ -93,11 +118,16 @@ class AgedPartnerBalanceWizard(models.TransientModel):
             'filter_account_ids': [(6, 0, self.account_ids.ids)],
             'filter_partner_ids': [(6, 0, self.partner_ids.ids)],
             'show_move_line_details': self.show_move_line_details,
+            'aging_days': self.aging_days,
+            'aging_date': self.aging_date,
         }
 
     def _export(self, report_type):
         """Default export is PDF."""
         model = self.env['report_aged_partner_balance']
-        report = model.create(self._prepare_report_aged_partner_balance())
+        vals = self._prepare_report_aged_partner_balance()
+        if self.run_in_background:
+            return self._export_in_background(model._name, vals, report_type)
+        report = model.create(vals)
         report.compute_data_for_report()
         return report.print_report(report_type)
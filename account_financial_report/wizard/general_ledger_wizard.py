@@ -7,7 +7,7 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
 
-from odoo import api, fields, models
+from odoo import api, fields, models, _
 from odoo.tools.safe_eval import safe_eval
 from odoo.tools import pycompat
 
@@ -17,6 +17,7 @@ class GeneralLedgerReportWizard(models.TransientModel):
 
     _name = "general.ledger.report.wizard"
     _description = "General Ledger Report Wizard"
+    _inherit = 'account_financial_report_abstract_wizard'
 
     company_id = fields.Many2one(
         comodel_name='res.company',
@@ -41,6 +42,14 @@ class GeneralLedgerReportWizard(models.TransientModel):
     )
     centralize = fields.Boolean(string='Activate centralization',
                                 default=True)
+    centralization_period = fields.Selection(
+        selection='_get_centralization_periods',
+        string='Centralize by',
+        default='month',
+        required=True,
+        help='Period of the lines summing the journal items of the '
+             'centralized accounts.',
+    )
     hide_account_balance_at_0 = fields.Boolean(
         string='Hide account ending balance at 0',
         help='Use this filter to hide an account or a partner '
@@ -70,6 +79,15 @@ class GeneralLedgerReportWizard(models.TransientModel):
              'will display initial and final balance in that currency.'
     )
 
+    @api.model
+    def _get_centralization_periods(self):
+        return [
+            ('day', _("Day")),
+            ('week', _("Week")),
+            ('month', _("Month")),
+            ('quarter', _("Quarter")),
+        ]
+
     @api.depends('date_from')
     def _compute_fy_start_date(self):
         for wiz in self.filtered('date_from'):
@@ -127,8 +145,8 @@ class GeneralLedgerReportWizard(models.TransientModel):
         if isinstance(context1, pycompat.string_types):
             context1 = safe_eval(context1)
         model = self.env['report_general_ledger']
-        report = model.create(self._prepare_report_general_ledger())
-        report.compute_data_for_report()
+        report = self.env['account.financial.report.cache']._get_report(
+            model._name, self._prepare_report_general_ledger())
         context1['active_id'] = report.id
         context1['active_ids'] = report.ids
         vals['context'] = context1
@@ -159,12 +177,18 @@ class GeneralLedgerReportWizard(models.TransientModel):
             'filter_partner_ids': [(6, 0, self.partner_ids.ids)],
             'filter_cost_center_ids': [(6, 0, self.cost_center_ids.ids)],
             'centralize': self.centralize,
+            'centralization_period': self.centralization_period,
             'fy_start_date': self.fy_start_date,
         }
 
     def _export(self, report_type):
         """Default export is PDF."""
         model = self.env['report_general_ledger']
-        report = model.create(self._prepare_report_general_ledger())
-        report.compute_data_for_report()
+        vals = self._prepare_report_general_ledger()
+        # The spreadsheet is written from the journal items directly
+        vals['stream_move_lines'] = report_type == 'xlsx'
+        if self.run_in_background:
+            return self._export_in_background(model._name, vals, report_type)
+        report = self.env['account.financial.report.cache']._get_report(
+            model._name, vals)
         return report.print_report(report_type)
@@ -11,6 +11,7 @@ class JournalLedgerReportWizard(models.TransientModel):
 
     _name = 'journal.ledger.report.wizard'
     _description = "Journal Ledger Report Wizard"
+    _inherit = 'account_financial_report_abstract_wizard'
 
     company_id = fields.Many2one(
         comodel_name='res.company',
@@ -137,6 +138,9 @@ class JournalLedgerReportWizard(models.TransientModel):
         """Default export is PDF."""
         self.ensure_one()
         model = self.env['report_journal_ledger']
-        report = model.create(self._prepare_report_journal_ledger())
+        vals = self._prepare_report_journal_ledger()
+        if self.run_in_background:
+            return self._export_in_background(model._name, vals, report_type)
+        report = model.create(vals)
         report.compute_data_for_report()
         return report.print_report(report_type)
@@ -14,6 +14,7 @@ class OpenItemsReportWizard(models.TransientModel):
 
     _name = "open.items.report.wizard"
     _description = "Open Items Report Wizard"
+    _inherit = 'account_financial_report_abstract_wizard'
 
     company_id = fields.Many2one(
         comodel_name='res.company',
@@ -77,8 +78,8 @@ class OpenItemsReportWizard(models.TransientModel):
         if isinstance(context1, pycompat.string_types):
             context1 = safe_eval(context1)
         model = self.env['report_open_items']
-        report = model.create(self._prepare_report_open_items())
-        report.compute_data_for_report()
+        report = self.env['account.financial.report.cache']._get_report(
+            model._name, self._prepare_report_open_items())
 
         context1['active_id'] = report.id
         context1['active_ids'] = report.ids
@@ -112,6 +113,9 @@ class OpenItemsReportWizard(models.TransientModel):
     def _export(self, report_type):
         """Default export is PDF."""
         model = self.env['report_open_items']
-        report = model.create(self._prepare_report_open_items())
-        report.compute_data_for_report()
+        vals = self._prepare_report_open_items()
+        if self.run_in_background:
+            return self._export_in_background(model._name, vals, report_type)
+        report = self.env['account.financial.report.cache']._get_report(
+            model._name, vals)
         return report.print_report(report_type)
@@ -3,7 +3,9 @@
 # Copyright 2017 Akretion - Alexis de Lattre
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
-from odoo import models, fields, api
+from dateutil.relativedelta import relativedelta
+
+from odoo import models, fields, api, _
 from odoo.tools.safe_eval import safe_eval
 from odoo.tools import pycompat
 
@@ -13,6 +15,7 @@ class TrialBalanceReportWizard(models.TransientModel):
 
     _name = "trial.balance.report.wizard"
     _description = "Trial Balance Report Wizard"
+    _inherit = 'account_financial_report_abstract_wizard'
 
     company_id = fields.Many2one(
         comodel_name='res.company',
@@ -66,6 +69,81 @@ class TrialBalanceReportWizard(models.TransientModel):
              'account currency is not setup through chart of accounts '
              'will display initial and final balance in that currency.'
     )
+    consolidation_company_ids = fields.Many2many(
+        comodel_name='res.company',
+        string='Consolidated companies',
+        help='Sum up the accounts of the same code of these companies and '
+             'of the selected company, with the amounts of each company.'
+    )
+    reporting_currency_id = fields.Many2one(
+        comodel_name='res.currency',
+        string='Reporting currency',
+        default=lambda self: self.env.user.company_id.currency_id,
+        help='Currency of the consolidated amounts, converted at the rate '
+             'of the end date.'
+    )
+    comparison_period = fields.Selection(
+        selection='_get_comparison_periods',
+        string='Compare by',
+        help='Add the debit, credit and balance of each period of the '
+             'date range.'
+    )
+    comparison_previous_year = fields.Boolean(
+        string='Compare with previous year',
+        help='Add the same periods of the previous year.'
+    )
+
+    @api.model
+    def _get_comparison_periods(self):
+        return [
+            ('month', _("Month")),
+            ('quarter', _("Quarter")),
+        ]
+
+    def _get_comparison_period_dates(self):
+        """ Return the (name, date from, date to) of the compared periods:
+        the periods of the date range, then the same periods of the previous
+        year if asked.
+        """
+        self.ensure_one()
+        if not self.comparison_period and not self.comparison_previous_year:
+            return []
+        date_from = fields.Date.from_string(self.date_from)
+        date_to = fields.Date.from_string(self.date_to)
+        if self.comparison_period:
+            months = 3 if self.comparison_period == 'quarter' else 1
+            step = relativedelta(months=months)
+        else:
+            step = None
+        ranges = []
+        start = date_from
+        while start <= date_to:
+            if step:
+                # Align the periods on the calendar months or quarters
+                end = start.replace(day=1) - relativedelta(
+                    months=(start.month - 1) % months) + step - \
+                    relativedelta(days=1)
+                end = min(end, date_to)
+            else:
+                end = date_to
+            ranges.append((start, end))
+            start = end + relativedelta(days=1)
+        if self.comparison_previous_year:
+            ranges += [(start - relativedelta(years=1),
+                        end - relativedelta(years=1))
+                       for start, end in list(ranges)]
+        periods = []
+        for start, end in ranges:
+            if self.comparison_period == 'month':
+                name = start.strftime('%m/%Y')
+            elif self.comparison_period == 'quarter':
+                name = _('Q%s %s') % ((start.month - 1) // 3 + 1, start.year)
+            else:
+                name = '%s - %s' % (start.strftime('%m/%Y'),
+                                    end.strftime('%m/%Y'))
+            periods.append((name, fields.Date.to_string(start),
+                            fields.Date.to_string(end)))
+        return periods
 
     @api.depends('date_from')
     def _compute_fy_start_date(self):
@@ -126,8 +204,8 @@ class TrialBalanceReportWizard(models.TransientModel):
         if isinstance(context1, pycompat.string_types):
             context1 = safe_eval(context1)
         model = self.env['report_trial_balance']
-        report = model.create(self._prepare_report_trial_balance())
-        report.compute_data_for_report()
+        report = self.env['account.financial.report.cache']._get_report(
+            model._name, self._prepare_report_trial_balance())
 
         context1['active_id'] = report.id
         context1['active_ids'] = report.ids
@@ -160,11 +238,27 @@ class TrialBalanceReportWizard(models.TransientModel):
             'fy_start_date': self.fy_start_date,
             'hierarchy_on': self.hierarchy_on,
             'show_partner_details': self.show_partner_details,
+            'consolidation_company_ids': [
+                (6, 0, self.consolidation_company_ids.ids)],
+            'reporting_currency_id': self.reporting_currency_id.id,
+            'period_ids': [
+                (0, 0, {
+                    'sequence': sequence,
+                    'name': name,
+                    'date_from': date_from,
+                    'date_to': date_to,
+                })
+                for sequence, (name, date_from, date_to) in enumerate(
+                    self._get_comparison_period_dates())
+            ],
         }
 
     def _export(self, report_type):
         """Default export is PDF."""
         model = self.env['report_trial_balance']
-        report = model.create(self._prepare_report_trial_balance())
-        report.compute_data_for_report()
+        vals = self._prepare_report_trial_balance()
+        if self.run_in_background:
+            return self._export_in_background(model._name, vals, report_type)
+        report = self.env['account.financial.report.cache']._get_report(
+            model._name, vals)
         return report.print_report(report_type)
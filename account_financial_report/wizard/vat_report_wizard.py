@@ -8,6 +8,8 @@ from odoo.tools import pycompat
 
 class VATReportWizard(models.TransientModel):
     _name = "vat.report.wizard"
+    _description = "VAT Report Wizard"
+    _inherit = 'account_financial_report_abstract_wizard'
 
     company_id = fields.Many2one(
         comodel_name='res.company',
@@ -75,6 +77,9 @@ class VATReportWizard(models.TransientModel):
     def _export(self, report_type):
         """Default export is PDF."""
         model = self.env['report_vat_report']
-        report = model.create(self._prepare_vat_report())
+        vals = self._prepare_vat_report()
+        if self.run_in_background:
+            return self._export_in_background(model._name, vals, report_type)
+        report = model.create(vals)
         report.compute_data_for_report()
         return report.print_report(report_type)
@@ -11,6 +11,7 @@
     'website': 'https://github.com/OCA/account-financial-reporting',
     'license': 'AGPL-3',
     'depends': [
+        'account_financial_report',
         'account_invoicing',
     ],
     'data': [
@@ -2,7 +2,7 @@
 #   (http://www.eficent.com)
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
 
-from datetime import datetime, timedelta
+from datetime import datetime
 from odoo.tools.misc import DEFAULT_SERVER_DATE_FORMAT
 from odoo import api, fields, models
 
@@ -18,6 +18,11 @@ class CustomerActivityStatement(models.AbstractModel):
         date = datetime.strptime(str_date, DEFAULT_SERVER_DATE_FORMAT).date()
         return date.strftime(lang.date_format)
 
+    def _reconciled_amounts_sql(self, date_end):
+        return self.env[
+            'account.reconcile.timeline']._get_reconciled_amounts_query(
+            'l', "'%s'" % date_end)
+
     def _initial_balance_sql_q1(self, partners, date_start):
         return """
             SELECT l.partner_id, l.currency_id, l.company_id,
@@ -118,41 +123,18 @@ class CustomerActivityStatement(models.AbstractModel):
             res[row.pop('partner_id')].append(row)
         return res
 
-    def _show_buckets_sql_q0(self, date_end):
-        return """
-            SELECT l1.id,
-            CASE WHEN l1.reconciled = TRUE and l1.balance > 0.0
-                                THEN max(pd.max_date)
-                WHEN l1.reconciled = TRUE and l1.balance < 0.0
-                                THEN max(pc.max_date)
-                ELSE null
-            END as reconciled_date
-            FROM account_move_line l1
-            LEFT JOIN (SELECT pr.*
-                FROM account_partial_reconcile pr
-                INNER JOIN account_move_line l2
-                ON pr.credit_move_id = l2.id
-                WHERE l2.date <= '%s'
-            ) as pd ON pd.debit_move_id = l1.id
-            LEFT JOIN (SELECT pr.*
-                FROM account_partial_reconcile pr
-                INNER JOIN account_move_line l2
-                ON pr.debit_move_id = l2.id
-                WHERE l2.date <= '%s'
-            ) as pc ON pc.credit_move_id = l1.id
-            GROUP BY l1.id
-        """ % (date_end, date_end)
-
     def _show_buckets_sql_q1(self, partners, date_end):
         return """
             SELECT l.partner_id, l.currency_id, l.company_id, l.move_id,
             CASE WHEN l.balance > 0.0
-                THEN l.balance - sum(coalesce(pd.amount, 0.0))
-                ELSE l.balance + sum(coalesce(pc.amount, 0.0))
+                THEN l.balance - sum(coalesce(l_reconciled.amount, 0.0))
+                ELSE l.balance + sum(coalesce(l_reconciled.amount, 0.0))
             END AS open_due,
             CASE WHEN l.balance > 0.0
-                THEN l.amount_currency - sum(coalesce(pd.amount_currency, 0.0))
-                ELSE l.amount_currency + sum(coalesce(pc.amount_currency, 0.0))
+                THEN l.amount_currency
+                    - sum(coalesce(l_reconciled.amount_currency, 0.0))
+                ELSE l.amount_currency
+                    + sum(coalesce(l_reconciled.amount_currency, 0.0))
             END AS open_due_currency,
             CASE WHEN l.date_maturity is null
                 THEN l.date
@@ -161,144 +143,65 @@ class CustomerActivityStatement(models.AbstractModel):
             FROM account_move_line l
             JOIN account_account_type at ON (at.id = l.user_type_id)
             JOIN account_move m ON (l.move_id = m.id)
-            LEFT JOIN Q0 ON Q0.id = l.id
-            LEFT JOIN (SELECT pr.*
-                FROM account_partial_reconcile pr
-                INNER JOIN account_move_line l2
-                ON pr.credit_move_id = l2.id
-                WHERE l2.date <= '%s'
-            ) as pd ON pd.debit_move_id = l.id
-            LEFT JOIN (SELECT pr.*
-                FROM account_partial_reconcile pr
-                INNER JOIN account_move_line l2
-                ON pr.debit_move_id = l2.id
-                WHERE l2.date <= '%s'
-            ) as pc ON pc.credit_move_id = l.id
+            %s
             WHERE l.partner_id IN (%s) AND at.type = 'receivable'
-                                AND (Q0.reconciled_date is null or
-                                    Q0.reconciled_date > '%s')
+                                AND (l.reconciled is not true or
+                                    l_reconciled.max_date > '%s')
                                 AND l.date <= '%s' AND not l.blocked
             GROUP BY l.partner_id, l.currency_id, l.date, l.date_maturity,
                                 l.amount_currency, l.balance, l.move_id,
                                 l.company_id
-        """ % (date_end, date_end, partners, date_end, date_end)
+        """ % (self._reconciled_amounts_sql(date_end), partners, date_end,
+               date_end)
 
-    def _show_buckets_sql_q2(self, date_end, minus_30, minus_60, minus_90,
-                             minus_120):
+    def _show_buckets_sql_q2(self, company_id):
         return """
-            SELECT partner_id, currency_id, date_maturity, open_due,
-                            open_due_currency, move_id, company_id,
-            CASE
-                WHEN '%s' <= date_maturity AND currency_id is null
-                                THEN open_due
-                WHEN '%s' <= date_maturity AND currency_id is not null
-                                THEN open_due_currency
-                ELSE 0.0
-            END as current,
-            CASE
-                WHEN '%s' < date_maturity AND date_maturity < '%s'
-                                AND currency_id is null THEN open_due
-                WHEN '%s' < date_maturity AND date_maturity < '%s'
-                                AND currency_id is not null
-                                THEN open_due_currency
-                ELSE 0.0
-            END as b_1_30,
-            CASE
-                WHEN '%s' < date_maturity AND date_maturity <= '%s'
-                                AND currency_id is null THEN open_due
-                WHEN '%s' < date_maturity AND date_maturity <= '%s'
-                                AND currency_id is not null
-                                THEN open_due_currency
-                ELSE 0.0
-            END as b_30_60,
-            CASE
-                WHEN '%s' < date_maturity AND date_maturity <= '%s'
-                                AND currency_id is null THEN open_due
-                WHEN '%s' < date_maturity AND date_maturity <= '%s'
-                                AND currency_id is not null
-                                THEN open_due_currency
-                ELSE 0.0
-            END as b_60_90,
-            CASE
-                WHEN '%s' < date_maturity AND date_maturity <= '%s'
-                                AND currency_id is null THEN open_due
-                WHEN '%s' < date_maturity AND date_maturity <= '%s'
-                                AND currency_id is not null
-                                THEN open_due_currency
-                ELSE 0.0
-            END as b_90_120,
-            CASE
-                WHEN date_maturity <= '%s' AND currency_id is null
-                                THEN open_due
-                WHEN date_maturity <= '%s' AND currency_id is not null
-                                THEN open_due_currency
-                ELSE 0.0
-            END as b_over_120
+            SELECT Q1.partner_id, Q1.date_maturity,
+            COALESCE(Q1.currency_id, c.currency_id) AS currency_id,
+            CASE WHEN Q1.currency_id is null THEN Q1.open_due
+                ELSE Q1.open_due_currency
+            END AS open_due
             FROM Q1
-            GROUP BY partner_id, currency_id, date_maturity, open_due,
-                                open_due_currency, move_id, company_id
-        """ % (date_end, date_end, minus_30, date_end, minus_30, date_end,
-               minus_60, minus_30, minus_60, minus_30, minus_90, minus_60,
-               minus_90, minus_60, minus_120, minus_90, minus_120, minus_90,
-               minus_120, minus_120)
-
-    def _show_buckets_sql_q3(self, company_id):
-        return """
-            SELECT Q2.partner_id, current, b_1_30, b_30_60, b_60_90, b_90_120,
-                                b_over_120,
-            COALESCE(Q2.currency_id, c.currency_id) AS currency_id
-            FROM Q2
-            JOIN res_company c ON (c.id = Q2.company_id)
+            JOIN res_company c ON (c.id = Q1.company_id)
             WHERE c.id = %s
+            GROUP BY Q1.partner_id, Q1.currency_id, c.currency_id,
+                                Q1.date_maturity, Q1.open_due,
+                                Q1.open_due_currency, Q1.move_id
         """ % company_id
 
-    def _show_buckets_sql_q4(self):
+    def _show_buckets_sql_q3(self, date_end):
         return """
-            SELECT partner_id, currency_id, sum(current) as current,
-                                sum(b_1_30) as b_1_30,
-                                sum(b_30_60) as b_30_60,
-                                sum(b_60_90) as b_60_90,
-                                sum(b_90_120) as b_90_120,
-                                sum(b_over_120) as b_over_120
-            FROM Q3
-            GROUP BY partner_id, currency_id
-        """
-
-    def _get_bucket_dates(self, date_end):
-        return {
-            'date_end': date_end,
-            'minus_30': date_end - timedelta(days=30),
-            'minus_60': date_end - timedelta(days=60),
-            'minus_90': date_end - timedelta(days=90),
-            'minus_120': date_end - timedelta(days=120),
-        }
+            SELECT partner_id, currency_id, sequence, sum(open_due) AS amount
+            FROM Q2
+            JOIN buckets b ON %s
+            GROUP BY partner_id, currency_id, sequence
+        """ % self.env['report_aged_partner_balance']._get_bucket_condition(
+            'b', "'%s'" % date_end, 'date_maturity')
 
-    def _get_account_show_buckets(self, company_id, partner_ids, date_end):
+    def _get_account_show_buckets(self, company_id, partner_ids, date_end,
+                                  buckets):
         res = dict(map(lambda x: (x, []), partner_ids))
         partners = ', '.join([str(i) for i in partner_ids])
         date_end = datetime.strptime(
             date_end, DEFAULT_SERVER_DATE_FORMAT).date()
-        full_dates = self._get_bucket_dates(date_end)
+        aged_partner_balance = self.env['report_aged_partner_balance']
         # pylint: disable=E8103
         self.env.cr.execute("""
-        WITH Q0 AS (%s), Q1 AS (%s), Q2 AS (%s), Q3 AS (%s), Q4 AS (%s)
-        SELECT partner_id, currency_id, current, b_1_30, b_30_60, b_60_90,
-                            b_90_120, b_over_120,
-                            current+b_1_30+b_30_60+b_60_90+b_90_120+b_over_120
-                            AS balance
-        FROM Q4
-        GROUP BY partner_id, currency_id, current, b_1_30, b_30_60, b_60_90,
-        b_90_120, b_over_120""" % (
-            self._show_buckets_sql_q0(date_end),
+        WITH Q1 AS (%s), Q2 AS (%s), buckets AS (%s), Q3 AS (%s)
+        SELECT p.partner_id, p.currency_id,
+                            array_agg(COALESCE(Q3.amount, 0.0)
+                                ORDER BY b.sequence) AS aging,
+                            sum(Q3.amount) AS balance
+        FROM (SELECT DISTINCT partner_id, currency_id FROM Q3) p
+        CROSS JOIN buckets b
+        LEFT JOIN Q3 ON (Q3.partner_id = p.partner_id
+                            AND Q3.currency_id = p.currency_id
+                            AND Q3.sequence = b.sequence)
+        GROUP BY p.partner_id, p.currency_id""" % (
             self._show_buckets_sql_q1(partners, date_end),
-            self._show_buckets_sql_q2(
-                full_dates['date_end'],
-                full_dates['minus_30'],
-                full_dates['minus_60'],
-                full_dates['minus_90'],
-                full_dates['minus_120']),
-            self._show_buckets_sql_q3(company_id),
-            self._show_buckets_sql_q4()))
+            self._show_buckets_sql_q2(company_id),
+            aged_partner_balance._get_aging_buckets_query(buckets),
+            self._show_buckets_sql_q3(date_end)))
         for row in self.env.cr.dictfetchall():
             res[row.pop('partner_id')].append(row)
         return res
@@ -359,9 +262,11 @@ class CustomerActivityStatement(models.AbstractModel):
                     line['date_maturity'], partner_id)
                 lines_to_display[partner_id][currency].append(line)
 
+        aging_buckets = self.env[
+            'report_aged_partner_balance']._get_aging_buckets()
         if data['show_aging_buckets']:
             buckets = self._get_account_show_buckets(
-                company_id, partner_ids, date_end)
+                company_id, partner_ids, date_end, aging_buckets)
             for partner_id in partner_ids:
                 buckets_to_display[partner_id] = {}
                 for line in buckets[partner_id]:
@@ -379,6 +284,7 @@ class CustomerActivityStatement(models.AbstractModel):
             'Balance_forward': balance_start_to_display,
             'Lines': lines_to_display,
             'Buckets': buckets_to_display,
+            'Aging_Buckets': aging_buckets,
             'Currencies': currency_to_display,
             'Show_Buckets': data['show_aging_buckets'],
             'Filter_non_due_partners': data['filter_non_due_partners'],
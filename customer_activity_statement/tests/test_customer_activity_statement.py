@@ -40,6 +40,68 @@ class TestCustomerActivityStatement(TransactionCase):
         })
         return user
 
+    def _add_move(self, partner, date, date_maturity, amount):
+        """ Add a posted move of `amount` on the receivable account of
+        `partner` (a payment if negative) and return its receivable line.
+        """
+        receivable_account = self.env['account.account'].search([
+            ('company_id', '=', self.company.id),
+            ('internal_type', '=', 'receivable'),
+        ], limit=1)
+        income_account = self.env['account.account'].search([
+            ('company_id', '=', self.company.id),
+            ('user_type_id.name', '=', 'Income'),
+        ], limit=1)
+        move = self.env['account.move'].create({
+            'journal_id': self.env['account.journal'].search([
+                ('company_id', '=', self.company.id),
+                ('type', '=', 'general'),
+            ], limit=1).id,
+            'partner_id': partner.id,
+            'date': date,
+            'line_ids': [
+                (0, 0, {
+                    'name': 'statement',
+                    'debit': max(amount, 0),
+                    'credit': max(-amount, 0),
+                    'date_maturity': date_maturity,
+                    'partner_id': partner.id,
+                    'account_id': receivable_account.id}),
+                (0, 0, {
+                    'name': 'statement',
+                    'debit': max(-amount, 0),
+                    'credit': max(amount, 0),
+                    'account_id': income_account.id}),
+            ]})
+        move.post()
+        return move.line_ids.filtered(
+            lambda line: line.account_id == receivable_account)
+
+    def _add_open_items(self, partner):
+        """ Add the receivable items of `partner` aged at 2018-06-30. """
+        # 30 days overdue: the last day of the "1 - 30 d." bucket
+        self._add_move(partner, '2018-05-31', '2018-05-31', 100)
+        # 90 days overdue, paid after the statement date
+        invoice = self._add_move(partner, '2018-04-01', '2018-04-01', 200)
+        payment = self._add_move(partner, '2018-07-15', '2018-07-15', -200)
+        (invoice | payment).reconcile()
+        # Not due yet
+        self._add_move(partner, '2018-06-15', '2018-07-31', 50)
+        # Paid before the statement date
+        invoice = self._add_move(partner, '2018-03-01', '2018-03-01', 80)
+        payment = self._add_move(partner, '2018-06-10', '2018-06-10', -80)
+        (invoice | payment).reconcile()
+
+    def _get_aging(self, partner, date_end):
+        buckets = self.env['report_aged_partner_balance']._get_aging_buckets(
+            '30,60,90,120')
+        rows = self.statement_model._get_account_show_buckets(
+            self.company.id, [partner.id], date_end, buckets)[partner.id]
+        return [
+            ([float(amount) for amount in row['aging']], float(row['balance']))
+            for row in rows
+        ]
+
     def test_customer_activity_statement(self):
 
         wiz_id = self.wiz.with_context(
@@ -65,3 +127,14 @@ class TestCustomerActivityStatement(TransactionCase):
                               "There was an error while compiling the report.")
         self.assertIn("Show_Buckets", report,
                       "There was an error while compiling the report.")
+
+    def test_aging(self):
+        partner = self.env['res.partner'].create({'name': 'Statement'})
+        self._add_open_items(partner)
+        self.assertEqual(
+            self._get_aging(partner, '2018-06-30'),
+            [([50.0, 100.0, 0.0, 200.0, 0.0, 0.0], 350.0)])
+        # Once paid, the invoice is no longer aged
+        self.assertEqual(
+            self._get_aging(partner, '2018-07-15'),
+            [([50.0, 0.0, 100.0, 0.0, 0.0, 0.0], 150.0)])